@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "core.User"
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -93,6 +94,44 @@ WSGI_APPLICATION = "LMS.wsgi.application"
 DATABASES = {"default": dj_database_url.config(default=os.getenv("DATABASE_URL"))}
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds a dashboard payload stays cached; entries are also deleted
+# whenever the underlying counters change.
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds a user's groups/permissions stay cached across requests (0 = per
+# request only). Entries are versioned and invalidated on any change.
+ACCESS_CACHE_TIMEOUT = 300
+# Users always belong to the group named by User.role (see assign_user_group),
+# so a matching role is accepted without a group query.
+ROLE_FIELD_IS_AUTHORITATIVE = True
+
+# Token authentication cache (core.authentication): in-process LRU size and
+# TTL, and the timeout of the shared Django cache tier, in seconds.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_LOCAL_TTL = 30
+TOKEN_CACHE_TIMEOUT = 300
+
+# Response cache for course, video and assessment reads
+# (core.response_cache): shared-tier timeout, in-process LRU size and TTL,
+# and how long a recompute may hold the single-flight lock, in seconds.
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LOCAL_SIZE = 1000
+RESPONSE_CACHE_LOCAL_TTL = 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -130,6 +169,15 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Resumable video uploads
+VIDEO_UPLOAD_TEMP_DIR = os.getenv(
+    "VIDEO_UPLOAD_TEMP_DIR", os.path.join(BASE_DIR, "uploads_tmp")
+)
+VIDEO_UPLOAD_CHUNK_SIZE = int(os.getenv("VIDEO_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+VIDEO_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Largest video an upload may declare; its temp file is preallocated
+VIDEO_UPLOAD_MAX_SIZE = int(os.getenv("VIDEO_UPLOAD_MAX_SIZE", 10 * 1024 * 1024 * 1024))
+
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_USE_TLS = True
@@ -138,6 +186,66 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 
+# Rows per INSERT when fanning out notifications
+NOTIFICATION_BATCH_SIZE = 1000
+
+# Server-sent notification stream (GET /async/notifications/stream/,
+# core.events). LocalBackend only reaches streams in the same process; use
+# core.events.DatabaseBackend when running several workers.
+NOTIFICATION_EVENTS_BACKEND = os.getenv(
+    "NOTIFICATION_EVENTS_BACKEND", "core.events.LocalBackend"
+)
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds between keepalive comments
+NOTIFICATION_STREAM_QUEUE_SIZE = 100  # pending events before a slow client is dropped
+NOTIFICATION_STREAM_RETRY_MS = 3000  # client reconnect delay
+NOTIFICATION_STREAM_POLL_INTERVAL = 1  # seconds, DatabaseBackend only
+
+# Email outbox drained by `manage.py send_queued_mail`
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds, doubled after each failed attempt
+# Seconds before a batch claimed by a worker that never finished it is
+# claimed again; longer than a batch takes to send
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600
+
+# Rows fetched per database round trip (and written per chunk) by the
+# streaming /export/ endpoints
+EXPORT_CHUNK_SIZE = 2000
+
+# Bulk user/enrollment import (POST /bulk_import/ queues a job for
+# manage.py run_import_jobs; manage.py bulk_import imports directly)
+IMPORT_BATCH_SIZE = 1000
+# Password hashing processes, in one pool per server process that is
+# started by the first import (1 hashes in the importing thread).
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+IMPORT_MAX_ERRORS = 1000  # errors listed in the response; all are counted
+# Seconds after which a job still "running" (its worker died) is run again
+IMPORT_JOB_TIMEOUT = 3600
+
+# Due-date reminders (manage.py send_due_reminders, core.reminders): days
+# before the due date at which students without a submission are reminded,
+# and reminders written per transaction.
+ASSESSMENT_REMINDER_WINDOWS = (7, 1)
+REMINDER_BATCH_SIZE = 1000
+
+# Video progress heartbeats (POST /progress/, core.progress): events per
+# request, seconds between background flushes (0 writes on every request),
+# buffered (enrollment, video) pairs that force an early flush, and pairs
+# written per transaction.
+PROGRESS_MAX_EVENTS = 1000
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", 2))
+PROGRESS_MAX_PENDING = 10000
+PROGRESS_FLUSH_BATCH_SIZE = 500
+
+# Request profiling (core.profiling): per-view query counts, SQL,
+# serializer and wall time and response sizes, served to admins at
+# /metrics/ in the Prometheus text format. Requests slower than
+# PROFILING_SLOW_REQUEST_SECONDS (0 turns the log off) are logged with
+# their PROFILING_SLOW_REQUEST_STATEMENTS most repeated SQL statements.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_SLOW_REQUEST_SECONDS = float(os.getenv("PROFILING_SLOW_REQUEST_SECONDS", 1))
+PROFILING_SLOW_REQUEST_STATEMENTS = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -146,13 +254,28 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # DRF- django rest framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "core.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": ["core.permissions.CustomModelPermissions"],
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.LMSPagination",
     "PAGE_SIZE": 10,
 }
+
+# Page-number pagination: use the PostgreSQL planner's row estimate instead
+# of COUNT(*) when it is at least PAGINATION_ESTIMATE_THRESHOLD rows.
+# Keyset pagination (?pagination=keyset) never counts.
+PAGINATION_ESTIMATED_COUNT = os.getenv("PAGINATION_ESTIMATED_COUNT", "False") == "True"
+PAGINATION_ESTIMATE_THRESHOLD = 10000
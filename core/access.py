@@ -0,0 +1,154 @@
+"""
+Role and permission resolution for the permission classes.
+
+A user's group names and permission codenames are loaded once per request
+and kept on the user object. When ACCESS_CACHE_TIMEOUT is set they are also
+cached across requests under a key that includes a per-user and a global
+version; the versions are replaced whenever group membership, user
+permissions or group permissions change, which orphans the old entries.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+
+GLOBAL_VERSION_KEY = "access-version:global"
+
+
+def _version_key(user_id):
+    return f"access-version:{user_id}"
+
+
+def bump_user_version(user_id):
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def bump_global_version():
+    cache.set(GLOBAL_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class UserAccess:
+    def __init__(self, user):
+        self.user = user
+        self._groups = None
+        self._perms = None
+
+    @property
+    def groups(self):
+        if self._groups is None:
+            self._load()
+        return self._groups
+
+    @property
+    def perms(self):
+        if self._perms is None:
+            self._load()
+        return self._perms
+
+    def has_role(self, role):
+        if not self.user.is_authenticated:
+            return False
+        # The post_save signal puts every user in the group named by their
+        # role, so a matching role answers without loading groups.
+        if settings.ROLE_FIELD_IS_AUTHORITATIVE and self.user.role == role:
+            return True
+        return role in self.groups
+
+    def has_perms(self, perm_list):
+        if not self.user.is_active:
+            return False
+        if self.user.is_superuser:
+            return True
+        return set(perm_list) <= self.perms
+
+    def _load(self):
+        user = self.user
+        if not user.is_authenticated:
+            self._groups, self._perms = frozenset(), frozenset()
+            return
+
+        key = None
+        if settings.ACCESS_CACHE_TIMEOUT:
+            key = self._cache_key()
+            cached = cache.get(key)
+            if cached is not None:
+                self._groups, self._perms = cached
+                return
+
+        self._groups = frozenset(user.groups.values_list("name", flat=True))
+        self._perms = frozenset(
+            f"{app_label}.{codename}"
+            for app_label, codename in Permission.objects.filter(
+                Q(user=user) | Q(group__user=user)
+            )
+            .values_list("content_type__app_label", "codename")
+            .distinct()
+        )
+        if key:
+            cache.set(key, (self._groups, self._perms), settings.ACCESS_CACHE_TIMEOUT)
+
+    def _cache_key(self):
+        user_key = _version_key(self.user.pk)
+        versions = cache.get_many([user_key, GLOBAL_VERSION_KEY])
+        for version_key in (user_key, GLOBAL_VERSION_KEY):
+            if version_key not in versions:
+                # A lost version must never fall back to an old entry.
+                cache.add(version_key, uuid.uuid4().hex, None)
+                versions[version_key] = cache.get(version_key)
+        return "access:%s:%s:%s" % (
+            self.user.pk,
+            versions[user_key],
+            versions[GLOBAL_VERSION_KEY],
+        )
+
+
+def get_user_access(user):
+    access = getattr(user, "_access", None)
+    if access is None:
+        access = UserAccess(user)
+        if user.is_authenticated:
+            user._access = access
+    return access
+
+
+# Signal handlers
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, User):
+        bump_user_version(instance.pk)
+    elif action == "post_clear" or pk_set is None:
+        # group.user_set.clear(): the affected users are unknown here
+        bump_global_version()
+    else:
+        for user_id in pk_set:
+            bump_user_version(user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_user_version(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_global_version()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def group_changed(sender, **kwargs):
+    bump_global_version()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Course, Enrollment, Assessment, Payment, Sponsorship, Submission, Notification, Videos
+from .models import User, Course, Enrollment, Assessment, Payment, Sponsorship, Submission, Notification, Videos, VideoUpload, VideoProgress, AssessmentReminder
 
 # Register your models here.
 admin.site.register(User)
@@ -11,3 +11,6 @@ admin.site.register(Sponsorship)
 admin.site.register(Submission)
 admin.site.register(Notification)
 admin.site.register(Videos)
+admin.site.register(VideoUpload)
+admin.site.register(VideoProgress)
+admin.site.register(AssessmentReminder)
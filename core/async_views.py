@@ -0,0 +1,185 @@
+"""
+Async (ASGI) versions of the notification and dashboard endpoints.
+
+These are plain Django async views using the async ORM and cache API, so
+under uvicorn they don't hold a worker thread while waiting on the
+database. They accept the same token authentication and role checks as
+the DRF views and render with the same JSON renderer. Under WSGI they
+still work, but Django runs each one in its own event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+
+from . import events, stats
+from .access import get_user_access
+from .authentication import CachedTokenAuthentication
+from .models import Notification
+from .pagination import decode_position, encode_position, seek_filter
+from .renderers import FastJSONRenderer
+from .serializers import NotificationSerializer
+
+NOTIFICATION_ORDERING = ("-created_at", "-id")
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status,
+        content_type="application/json",
+    )
+
+
+async def has_role(user, role):
+    # The role field usually settles it without loading groups.
+    if settings.ROLE_FIELD_IS_AUTHORITATIVE and user.role == role:
+        return True
+    return await sync_to_async(get_user_access(user).has_role)(role)
+
+
+async def authenticate(request, role=None):
+    """
+    (user, None), or (None, error response).
+    """
+    try:
+        user_auth = await CachedTokenAuthentication().aauthenticate(request)
+        if user_auth is None:
+            raise exceptions.NotAuthenticated()
+    except exceptions.APIException as exc:
+        response = json_response({"detail": str(exc.detail)}, exc.status_code)
+        if exc.status_code == 401:
+            response["WWW-Authenticate"] = CachedTokenAuthentication.keyword
+        return None, response
+    user = user_auth[0]
+    if role is not None and not await has_role(user, role):
+        detail = exceptions.PermissionDenied.default_detail
+        return None, json_response({"detail": str(detail)}, 403)
+    return user, None
+
+
+@require_GET
+async def admin_dashboard(request):
+    user, error = await authenticate(request, "admin")
+    if error:
+        return error
+    return json_response(await stats.aadmin_dashboard())
+
+
+@require_GET
+async def sponsor_dashboard(request):
+    user, error = await authenticate(request, "sponsor")
+    if error:
+        return error
+    return json_response(await stats.asponsor_dashboard(user.id))
+
+
+@require_GET
+async def notification_list(request):
+    """
+    The user's own notifications, newest first, with keyset pagination
+    (?cursor=) and ?unread=true to leave out read ones. Items have the
+    same fields as /api/notification/.
+    """
+    user, error = await authenticate(request)
+    if error:
+        return error
+    plan = NotificationSerializer.get_values_plan()
+    queryset = Notification.objects.filter(user=user).order_by(*NOTIFICATION_ORDERING)
+    if request.GET.get("unread") in ("1", "true", "True"):
+        queryset = queryset.filter(is_read=False)
+    cursor = request.GET.get("cursor")
+    if cursor:
+        model_fields = [
+            Notification._meta.get_field(name.lstrip("-"))
+            for name in NOTIFICATION_ORDERING
+        ]
+        try:
+            position, _ = decode_position(cursor, model_fields)
+        except exceptions.NotFound as exc:
+            return json_response({"detail": str(exc.detail)}, exc.status_code)
+        queryset = queryset.filter(seek_filter(NOTIFICATION_ORDERING, position))
+
+    page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    lookups = {lookup for _, lookup, _ in plan} | {"created_at", "id"}
+    rows = [row async for row in queryset.values(*lookups)[: page_size + 1]]
+    next_link = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        query = request.GET.copy()
+        query["cursor"] = encode_position([last["created_at"], last["id"]])
+        next_link = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    return json_response(
+        {"next": next_link, "results": NotificationSerializer.serialize_values(rows, plan)}
+    )
+
+
+@csrf_exempt
+@require_POST
+async def notification_mark_read(request, pk):
+    user, error = await authenticate(request)
+    if error:
+        return error
+    updated = await Notification.objects.filter(pk=pk, user=user).aupdate(is_read=True)
+    if not updated:
+        return json_response({"detail": "Not found."}, 404)
+    return json_response({"status": "Notification marked as read"})
+
+
+@require_GET
+async def notification_stream(request):
+    """
+    Server-sent events for the user's new notifications, as they are
+    created. A client that reconnects with Last-Event-ID (or ?last_event_id=)
+    first gets the notifications it missed, oldest first.
+    """
+    user, error = await authenticate(request)
+    if error:
+        return error
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return json_response({"detail": "Invalid Last-Event-ID."}, 400)
+
+    response = StreamingHttpResponse(
+        event_stream(user.pk, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def event_stream(user_id, last_id):
+    # Subscribe before reading the backlog so nothing created in between
+    # is lost; live events the backlog already covered are dropped.
+    subscription = events.hub.subscribe(user_id)
+    try:
+        yield b"retry: %d\n\n" % settings.NOTIFICATION_STREAM_RETRY_MS
+        replayed_through = last_id
+        while last_id is not None:
+            queryset = events.notification_rows(
+                Notification.objects.filter(user_id=user_id, id__gt=replayed_through)
+            ).order_by("id")[: settings.NOTIFICATION_BATCH_SIZE]
+            rows = [row async for row in queryset]
+            for row in rows:
+                replayed_through = row["id"]
+                yield events.encode_event(row)
+            if len(rows) < settings.NOTIFICATION_BATCH_SIZE:
+                break
+        while True:
+            item = await subscription.get(settings.NOTIFICATION_STREAM_HEARTBEAT)
+            if subscription.overflowed:
+                # Too far behind; the client resumes from its last event.
+                break
+            if item is None:
+                yield b": keepalive\n\n"
+                continue
+            event_id, message = item
+            if replayed_through is None or event_id > replayed_through:
+                yield message
+    finally:
+        events.hub.unsubscribe(subscription)
@@ -0,0 +1,138 @@
+"""
+Token authentication with a two-tier cache.
+
+Token lookups are served from a bounded in-process LRU (short TTL) backed
+by Django's cache framework, so most requests skip the Token/User join.
+Entries are dropped when the token is deleted or the user is saved (which
+covers deactivation). Other processes see such changes once their local
+entry expires (TOKEN_CACHE_LOCAL_TTL).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import User
+from .utils import LRUCache
+
+# The password hash is deliberately left out of the cached copy.
+USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields if field.name != "password"
+]
+
+PK_INDEX = USER_FIELDS.index(User._meta.pk.attname)
+
+_local = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_LOCAL_TTL)
+
+
+def _token_cache_key(key):
+    return f"auth-token:{key}"
+
+
+def _user_token_cache_key(user_id):
+    return f"auth-user-token:{user_id}"
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        entry = _local.get(key)
+        if entry is None:
+            entry = cache.get(_token_cache_key(key))
+            if entry is None:
+                entry = self._load(key)
+            _local.set(key, entry)
+        return self._user_and_token(key, entry)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views; only a cache miss leaves the event
+        loop to query the database.
+        """
+        key = _HeaderKey().authenticate(request)
+        if key is None:
+            return None
+        entry = _local.get(key)
+        if entry is None:
+            entry = await cache.aget(_token_cache_key(key))
+            if entry is None:
+                entry = await sync_to_async(self._load)(key)
+            _local.set(key, entry)
+        return self._user_and_token(key, entry)
+
+    def _user_and_token(self, key, entry):
+        user_values, created = entry
+        # A fresh instance per request so per-request state (e.g. the
+        # permission cache in core.access) never leaks between requests.
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, user_values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        token = Token(key=key, user=user, created=created)
+        return (user, token)
+
+    def _load(self, key):
+        try:
+            token = Token.objects.select_related("user").get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        entry = _cache_entry(token)
+        cache.set(_token_cache_key(key), entry, settings.TOKEN_CACHE_TIMEOUT)
+        return entry
+
+
+class _HeaderKey(TokenAuthentication):
+    # Parses and validates the Authorization header, returning the key.
+    def authenticate_credentials(self, key):
+        return key
+
+
+def _cache_entry(token):
+    user_values = tuple(getattr(token.user, attname) for attname in USER_FIELDS)
+    return (user_values, token.created)
+
+
+def get_token_key(user):
+    """
+    Return the user's token key, creating the token if needed, and warm the
+    authentication cache for it.
+    """
+    key = cache.get(_user_token_cache_key(user.pk))
+    if key is None:
+        token, _ = Token.objects.get_or_create(user=user)
+        key = token.key
+        cache.set_many(
+            {
+                _user_token_cache_key(user.pk): key,
+                _token_cache_key(key): _cache_entry(token),
+            },
+            settings.TOKEN_CACHE_TIMEOUT,
+        )
+    return key
+
+
+def evict_token(key, user_id):
+    _local.delete(key)
+    cache.delete_many([_token_cache_key(key), _user_token_cache_key(user_id)])
+
+
+# Signal handlers
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    evict_token(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    _local.delete_where(lambda key, entry: entry[0][PK_INDEX] == instance.pk)
+    keys = Token.objects.filter(user_id=instance.pk).values_list("key", flat=True)
+    for key in keys:
+        evict_token(key, instance.pk)
@@ -0,0 +1,210 @@
+"""
+API benchmark harness.
+
+``run_benchmarks`` sends requests through the Django test client, so it
+measures the whole request path in-process: middleware, authentication,
+views, serializers and rendering, with no network in between. It covers
+every GET route of the API router (list, detail and extra actions such as
+gradebook and export), plus /admin_dashboard/, /sponsor_dashboard/ and
+POST /login/. Router endpoints are requested as a seeded admin and the
+sponsor dashboard as a seeded sponsor, all with token authentication (see
+core.seed).
+
+Each endpoint gets one cold request, then ``warmup`` unmeasured requests,
+then ``iterations`` measured ones. The results report throughput and
+p50/p95/p99 latency of the measured requests, and their highest query
+count. Queries are counted with connection.execute_wrapper(). Endpoints
+whose cold request does not succeed (e.g. a detail route with no rows to
+show) are reported as skipped.
+
+``compare`` checks results against a saved baseline. A p50 or p95 latency
+that grew by more than ``threshold`` (a fraction) and by at least
+``min_delta_ms`` counts as a regression. So does a query count that grew
+by more than ``threshold``.
+"""
+import platform
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import User
+from .renderers import FastJSONRenderer
+from .seed import SEED_EMAIL_DOMAIN, seed_email
+from .urls import router
+
+LATENCY_METRICS = ("p50_ms", "p95_ms")
+
+
+class Endpoint:
+    def __init__(self, name, method, path, user=None, data=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+
+
+def endpoints(password):
+    """
+    Every endpoint to benchmark, requested as seeded users.
+    """
+    admin = _seeded_user("admin")
+    sponsor = _seeded_user("sponsor")
+    found = []
+    for prefix, viewset, basename in router.registry:
+        # Detail routes are requested for the first row, if there is one.
+        pk = viewset.queryset.order_by("pk").values_list("pk", flat=True).first()
+        for route in router.get_routes(viewset):
+            # Extra actions map methods with a MethodMapper, whose .get()
+            # is a decorator.
+            action = dict.get(route.mapping, "get")
+            if action is None or not hasattr(viewset, action):
+                continue
+            if "{lookup}" in route.url and pk is None:
+                continue
+            path = "/api/" + route.url.format(
+                prefix=prefix, lookup=pk, trailing_slash=router.trailing_slash,
+            ).strip("^$")
+            found.append(Endpoint(route.name.format(basename=basename), "GET", path, admin))
+    found += [
+        Endpoint("admin_dashboard", "GET", "/admin_dashboard/", admin),
+        Endpoint("sponsor_dashboard", "GET", "/sponsor_dashboard/", sponsor),
+        Endpoint("login", "POST", "/login/",
+                 data={"email": seed_email("student", 0), "password": password}),
+    ]
+    return found
+
+
+def _seeded_user(role):
+    user = User.objects.filter(
+        role=role, email__endswith="@" + SEED_EMAIL_DOMAIN).order_by("pk").first()
+    if user is None:
+        raise LookupError(f"No seeded {role}; run `manage.py seed_data` first.")
+    return user
+
+
+def run_benchmarks(endpoints, iterations, warmup=0, log=None):
+    """
+    Benchmark each endpoint. Returns {"meta": {...}, "results": {name: {...}}}.
+    """
+    # The test client's host, as allowed by Django's test runner.
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        results = {
+            endpoint.name: _benchmark(endpoint, iterations, warmup, log)
+            for endpoint in endpoints
+        }
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        },
+        "results": results,
+    }
+
+
+def _benchmark(endpoint, iterations, warmup, log):
+    client = Client(raise_request_exception=False)
+    headers = {}
+    if endpoint.user is not None:
+        token, _ = Token.objects.get_or_create(user=endpoint.user)
+        headers["HTTP_AUTHORIZATION"] = f"Token {token.key}"
+    status, _, first_queries = _request(client, endpoint, headers)
+    if not 200 <= status < 300:
+        result = {"path": endpoint.path, "skipped": f"status {status}"}
+    else:
+        for _ in range(warmup):
+            _request(client, endpoint, headers)
+        latencies = []
+        queries = 0
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            status, seconds, count = _request(client, endpoint, headers)
+            latencies.append(seconds)
+            queries = max(queries, count)
+            errors += not 200 <= status < 300
+        duration = time.perf_counter() - started
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result = {
+            "method": endpoint.method,
+            "path": endpoint.path,
+            "requests": iterations,
+            "errors": errors,
+            "throughput_rps": round(iterations / duration, 1),
+            "mean_ms": round(1000 * statistics.fmean(latencies), 3),
+            "p50_ms": round(1000 * cuts[49], 3),
+            "p95_ms": round(1000 * cuts[94], 3),
+            "p99_ms": round(1000 * cuts[98], 3),
+            "queries": queries,
+            "first_queries": first_queries,
+        }
+    if log is not None:
+        log(endpoint.name, result)
+    return result
+
+
+def _request(client, endpoint, headers):
+    """
+    (status, seconds, queries) of one request, with the body read in full.
+    """
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        response = client.generic(
+            endpoint.method, endpoint.path,
+            "" if endpoint.data is None else FastJSONRenderer().render(endpoint.data),
+            content_type="application/json", **headers,
+        )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        seconds = time.perf_counter() - start
+    return response.status_code, seconds, queries
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.0):
+    """
+    The regressions of ``results`` against ``baseline`` (both as returned
+    by run_benchmarks), as a list of {"endpoint", "metric", "baseline",
+    "current"}. Endpoints skipped or missing in either run are ignored.
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or "skipped" in before or "skipped" in current:
+            continue
+        for metric in LATENCY_METRICS:
+            if (
+                current[metric] > before[metric] * (1 + threshold)
+                and current[metric] - before[metric] >= min_delta_ms
+            ):
+                regressions.append(_regression(name, metric, before, current))
+        if current["queries"] > before["queries"] * (1 + threshold):
+            regressions.append(_regression(name, "queries", before, current))
+    return regressions
+
+
+def _regression(name, metric, before, current):
+    return {
+        "endpoint": name,
+        "metric": metric,
+        "baseline": before[metric],
+        "current": current[metric],
+    }
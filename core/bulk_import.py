@@ -0,0 +1,420 @@
+"""
+Bulk import of users and enrollments from CSV or NDJSON.
+
+Each row describes one user and optionally a course to enroll them in::
+
+    email,username,role,password,course,progress
+    ann@example.com,ann,student,s3cret,12,0
+
+``role`` defaults to "student". When ``email`` already belongs to a user
+the row only enrolls that user, so the same file format covers both
+"onboard a cohort" and "enroll existing students". Rows are read one at a
+time from the upload and processed in batches: each batch is validated
+against ids fetched with one query per table, passwords are hashed in a
+shared process pool, and users, group memberships and enrollments are written
+with bulk_create inside one transaction per batch. A failing row never
+stops the import; its errors are collected and returned with its row
+number.
+
+bulk_create skips the post_save handlers, so group assignment, the
+dashboard counters, sponsor totals and the gradebook cache generations
+are updated here explicitly.
+
+Uploads to POST /bulk_import/ are not imported during the request:
+``queue_import`` stores the file as an ImportJob and ``run_next_import``
+(the run_import_jobs command) claims and runs queued jobs one at a time,
+saving the result for GET /bulk_import/<id>/. A job is claimed in a short
+transaction of its own, like the mail outbox, and one left "running" by a
+worker that died is run again after IMPORT_JOB_TIMEOUT; rows it had
+already imported are then reported as errors. manage.py bulk_import still
+imports a file directly.
+"""
+import codecs
+import csv
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import stats
+from .models import Course, Enrollment, ImportJob, User
+from .response_cache import bump_generation
+
+FORMATS = ("csv", "ndjson")
+ROLES = {role for role, _ in User.ROLE_CHOICES}
+MAX_LENGTHS = {
+    "email": User._meta.get_field("email").max_length,
+    "username": User._meta.get_field("username").max_length,
+}
+
+
+class BulkImportError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.created_users = 0
+        self.created_enrollments = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created_users": self.created_users,
+            "created_enrollments": self.created_enrollments,
+            "error_count": self.error_count,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+def detect_format(filename, file_format=None):
+    file_format = (file_format or os.path.splitext(filename or "")[1][1:]).lower()
+    if file_format == "jsonl":
+        file_format = "ndjson"
+    if file_format not in FORMATS:
+        raise BulkImportError(f"Unsupported format, expected one of: {', '.join(FORMATS)}")
+    return file_format
+
+
+def read_rows(binary_file, file_format):
+    """
+    Yield (row_number, dict) pairs from a binary file object without
+    reading it into memory. Unparseable lines yield an error string
+    instead of a dict.
+    """
+    lines = codecs.iterdecode(binary_file, "utf-8-sig")
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Invalid JSON: {exc}"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _hash_password(password):
+    return make_password(password or None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _hash_pool(workers):
+    """
+    The process pool shared by every import in this process, started on
+    first use. Workers come from a forkserver (or are spawned where there
+    is none) rather than forked from a threaded server, and set Django up
+    from the settings module, so they hash with its PASSWORD_HASHERS.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=django.setup,
+            )
+    return _pool
+
+
+def hash_passwords(passwords, workers):
+    if workers < 2 or len(passwords) < 2:
+        return [_hash_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(_hash_pool(workers).map(_hash_password, passwords, chunksize=chunksize))
+
+
+def _clean(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _validate(row):
+    """
+    Normalise one row, returning (data, errors).
+    """
+    errors = {}
+    data = {
+        "email": User.objects.normalize_email(_clean(row.get("email"))),
+        "username": _clean(row.get("username")),
+        "role": _clean(row.get("role")).lower() or "student",
+        "password": _clean(row.get("password")),
+        "course": None,
+        "progress": 0.0,
+    }
+    try:
+        validate_email(data["email"])
+    except ValidationError:
+        errors["email"] = "Enter a valid email address."
+    for field, max_length in MAX_LENGTHS.items():
+        if len(data[field]) > max_length:
+            errors[field] = f"Ensure this field has no more than {max_length} characters."
+    if data["role"] not in ROLES:
+        errors["role"] = f'"{data["role"]}" is not a valid choice.'
+
+    course = _clean(row.get("course"))
+    if course:
+        try:
+            data["course"] = int(course)
+        except ValueError:
+            errors["course"] = "A valid integer is required."
+    progress = _clean(row.get("progress"))
+    if progress:
+        try:
+            data["progress"] = float(progress)
+        except ValueError:
+            errors["progress"] = "A valid number is required."
+    return data, errors
+
+
+class Importer:
+    def __init__(self, batch_size=None, workers=None, max_errors=None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.workers = workers or settings.IMPORT_HASH_WORKERS
+        self.result = ImportResult(max_errors or settings.IMPORT_MAX_ERRORS)
+        # Emails created earlier in this import, so later rows can enroll them.
+        self.imported = {}
+        self.known_courses = set()
+        self.groups = {}
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.result.rows += len(batch)
+            self._import_batch(batch)
+        return self.result
+
+    def _import_batch(self, batch):
+        valid = []
+        for row_number, row in batch:
+            if isinstance(row, str):
+                self.result.add_error(row_number, {"non_field_errors": row})
+                continue
+            data, errors = _validate(row)
+            if errors:
+                self.result.add_error(row_number, errors)
+            else:
+                valid.append((row_number, data))
+        if not valid:
+            return
+
+        existing = self._existing_users({data["email"] for _, data in valid})
+        self._load_courses({data["course"] for _, data in valid} - {None})
+
+        new_users, enrollments = {}, []
+        for row_number, data in valid:
+            email = data["email"]
+            user = existing.get(email) or new_users.get(email)
+            if user is not None and data["course"] is None:
+                self.result.add_error(row_number, {"email": "A user with this email already exists."})
+                continue
+            role = user["role"] if user is not None else data["role"]
+            if data["course"] is not None:
+                if data["course"] not in self.known_courses:
+                    self.result.add_error(row_number, {"course": "Course does not exist."})
+                    continue
+                if role != "student":
+                    self.result.add_error(row_number, {"course": "Only students can be enrolled."})
+                    continue
+            if user is None:
+                user = new_users[email] = {
+                    "row": row_number,
+                    "role": data["role"],
+                    "instance": User(
+                        email=email,
+                        username=data["username"],
+                        role=data["role"],
+                        password=data["password"],
+                    ),
+                }
+            if data["course"] is not None:
+                enrollments.append((row_number, user, data))
+
+        enrollments = self._drop_duplicate_enrollments(enrollments)
+        if new_users:
+            instances = [user["instance"] for user in new_users.values()]
+            hashes = hash_passwords([user.password for user in instances], self.workers)
+            for user, password in zip(instances, hashes):
+                user.password = password
+
+        for user in new_users.values():
+            self._group_id(user["role"])
+        try:
+            with transaction.atomic():
+                self._write(new_users, enrollments)
+        except IntegrityError as exc:
+            # Lost a race with a concurrent writer; report the whole batch.
+            rows = {user["row"] for user in new_users.values()}
+            rows.update(row_number for row_number, _, _ in enrollments)
+            for row_number in sorted(rows):
+                self.result.add_error(row_number, {"non_field_errors": f"Conflicting write, retry this row: {exc}"})
+            return
+        for email, user in new_users.items():
+            self.imported[email] = {"id": user["instance"].pk, "role": user["role"]}
+        self.result.created_users += len(new_users)
+        self.result.created_enrollments += len(enrollments)
+
+    def _existing_users(self, emails):
+        users = {email: self.imported[email] for email in emails if email in self.imported}
+        missing = emails - users.keys()
+        if missing:
+            for pk, email, role in User.objects.filter(email__in=missing).values_list("pk", "email", "role"):
+                users[email] = {"id": pk, "role": role}
+        return users
+
+    def _load_courses(self, course_ids):
+        missing = course_ids - self.known_courses
+        if missing:
+            self.known_courses.update(
+                Course.objects.filter(pk__in=missing).values_list("pk", flat=True)
+            )
+
+    def _drop_duplicate_enrollments(self, enrollments):
+        student_ids = {user["id"] for _, user, _ in enrollments if "id" in user}
+        taken = set()
+        if student_ids:
+            taken = set(
+                Enrollment.objects.filter(
+                    student_id__in=student_ids,
+                    course_id__in={data["course"] for _, _, data in enrollments},
+                ).values_list("student_id", "course_id")
+            )
+        kept, seen = [], set()
+        for row_number, user, data in enrollments:
+            key = (data["email"], data["course"])
+            if key in seen or (user.get("id"), data["course"]) in taken:
+                self.result.add_error(row_number, {"course": "Already enrolled in this course."})
+                continue
+            seen.add(key)
+            kept.append((row_number, user, data))
+        return kept
+
+    def _write(self, new_users, enrollments):
+        if new_users:
+            instances = User.objects.bulk_create(
+                [user["instance"] for user in new_users.values()]
+            )
+            if any(user.pk is None for user in instances):
+                # Backends that can't return ids from a bulk insert.
+                ids = dict(
+                    User.objects.filter(email__in=new_users).values_list("email", "pk")
+                )
+                for user in instances:
+                    user.pk = ids[user.email]
+            memberships = [
+                User.groups.through(user_id=user.pk, group_id=self._group_id(user.role))
+                for user in instances
+            ]
+            User.groups.through.objects.bulk_create(memberships)
+            stats.bump("users", len(instances))
+
+        if enrollments:
+            rows = []
+            progress = {}
+            for _, user, data in enrollments:
+                student_id = user["id"] if "id" in user else user["instance"].pk
+                rows.append(
+                    Enrollment(
+                        student_id=student_id,
+                        course_id=data["course"],
+                        progress=data["progress"],
+                    )
+                )
+                total, count = progress.get(student_id, (0.0, 0))
+                progress[student_id] = (total + data["progress"], count + 1)
+            Enrollment.objects.bulk_create(rows)
+            stats.bump("enrollments", len(rows))
+            stats.apply_progress_deltas(progress)
+            for course_id in {row.course_id for row in rows}:
+                bump_generation(Enrollment, course_id)
+
+    def _group_id(self, role):
+        if role not in self.groups:
+            group, _ = Group.objects.get_or_create(name=role)
+            self.groups[role] = group.pk
+        return self.groups[role]
+
+
+def import_file(binary_file, file_format, **options):
+    return Importer(**options).run(read_rows(binary_file, file_format))
+
+
+def queue_import(upload, file_format, user):
+    """
+    Store ``upload`` as a queued ImportJob for run_next_import.
+    """
+    job = ImportJob(uploaded_by=user, file_format=file_format)
+    job.file.save(upload.name, upload, save=True)
+    return job
+
+
+def run_next_import(**options):
+    """
+    Claim the oldest queued job, import its file and save the result.
+    Returns the job, or None when there was nothing to run.
+    """
+    now = timezone.now()
+    abandoned = now - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="queued") | Q(status="running", started_at__lte=abandoned))
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = now
+        job.save(update_fields=["status", "started_at"])
+
+    try:
+        with job.file.open("rb") as f:
+            result = import_file(f, job.file_format, **options)
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc)
+    else:
+        job.status = "done"
+        job.result = result.as_dict()
+    job.finished_at = timezone.now()
+    job.file.delete(save=False)
+    job.save(update_fields=["status", "result", "error", "finished_at", "file"])
+    return job
@@ -0,0 +1,79 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode())
+    return '"%s"' % digest.hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for list and detail GETs, checked
+    before anything is serialized so a matching request costs one small
+    query and gets a 304.
+
+    List validators come from Max() of ``conditional_fields`` and Count()
+    over the filtered queryset (the count catches deletions). Lists only
+    send an ETag: a Last-Modified would not change when a row is deleted.
+    Detail validators use the same fields for the one object, and also
+    send Last-Modified. Query string and Accept header are part of every ETag, since they
+    change the representation.
+    """
+
+    conditional_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = self.get_state(queryset, Count("pk"))
+        etag = make_etag(*state, *self.representation_key(request))
+        not_modified = self.check_conditions(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if any("__" in field for field in self.conditional_fields):
+            state = self.get_state(self.get_queryset().filter(pk=instance.pk))
+        else:
+            state = [getattr(instance, field) for field in self.conditional_fields]
+        etag = make_etag(instance.pk, *state, *self.representation_key(request))
+        last_modified = int(max(value for value in state if value).timestamp())
+        not_modified = self.check_conditions(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, etag, last_modified)
+
+    def get_state(self, queryset, *extra):
+        aggregates = [Max(field) for field in self.conditional_fields]
+        aggregates.extend(extra)
+        state = queryset.order_by().aggregate(
+            **{f"v{i}": aggregate for i, aggregate in enumerate(aggregates)}
+        )
+        return [state[f"v{i}"] for i in range(len(aggregates))]
+
+    def representation_key(self, request):
+        return request.get_full_path(), request.META.get("HTTP_ACCEPT", "")
+
+    def check_conditions(self, request, etag, last_modified=None):
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified=None):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # Let clients keep the body but revalidate before reusing it.
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
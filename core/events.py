@@ -0,0 +1,240 @@
+"""
+Server-sent notification events.
+
+``create_notification(s)`` publish the ids of new rows once the
+transaction commits. Publishing goes through a backend
+(``settings.NOTIFICATION_EVENTS_BACKEND``), which gets the ids to the
+``hub`` of every worker process. Each hub loads the rows for the users
+with an open stream in that process and puts the events on their queues.
+
+- LocalBackend hands the ids straight to this process's hub. That is
+  enough for a single worker, and for tests.
+- DatabaseBackend lets several workers share events with no broker. Each
+  process polls the notification table for rows newer than the last one
+  it saw, for users that have a stream open there.
+
+Any other transport, such as Redis pub/sub, only needs to implement
+``publish`` and feed what it receives into ``hub.dispatch``.
+
+Event ids are notification ids, so a client that reconnects with
+Last-Event-ID gets what it missed from the database (see
+``async_views.notification_stream``). Queues are bounded. A client that
+falls ``NOTIFICATION_STREAM_QUEUE_SIZE`` events behind is disconnected
+rather than buffered, and catches up the same way when it reconnects.
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import Notification
+from .renderers import FastJSONRenderer
+from .serializers import NotificationSerializer
+
+
+def notification_rows(queryset):
+    """
+    ``queryset`` as values() rows with the columns events are built from.
+    """
+    plan = NotificationSerializer.get_values_plan()
+    lookups = {lookup for _, lookup, _ in plan} | {"id", "user_id"}
+    return queryset.values(*lookups)
+
+
+def encode_event(row):
+    """
+    One SSE message for a notification row.
+    """
+    plan = NotificationSerializer.get_values_plan()
+    data = FastJSONRenderer().render(
+        NotificationSerializer.serialize_values([row], plan)[0])
+    return b"id: %d\nevent: notification\ndata: %s\n\n" % (row["id"], data)
+
+
+class Subscription:
+    """
+    One open stream. Created and consumed inside the stream's event loop;
+    ``offer`` is only ever scheduled onto that loop.
+    """
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """
+        Next (id, message), or None after ``timeout`` seconds without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """
+    The open streams of this process, by user id.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        get_backend().start()
+        subscription = Subscription(user_id, settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def user_ids(self):
+        with self._lock:
+            return set(self._subscriptions)
+
+    def dispatch(self, notification_ids):
+        """
+        Load and deliver the given notifications to the local streams of
+        their users. Runs in a sync context; safe from any thread.
+        """
+        user_ids = self.user_ids()
+        if not user_ids or not notification_ids:
+            return
+        rows = notification_rows(
+            Notification.objects.filter(pk__in=notification_ids, user_id__in=user_ids)
+        ).order_by("id")
+        self.deliver(rows)
+
+    def deliver(self, rows):
+        for row in rows:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(row["user_id"], ()))
+            if not subscriptions:
+                continue
+            event = (row["id"], encode_event(row))
+            for subscription in subscriptions:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                except RuntimeError:
+                    # The stream's loop has already closed.
+                    self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+class BaseBackend:
+    """
+    Carries notification ids from the process that created them to the
+    hub of every process.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        """
+        Called whenever a stream opens; must be cheap after the first call.
+        """
+
+    def publish(self, notification_ids):
+        raise NotImplementedError
+
+
+class LocalBackend(BaseBackend):
+    def publish(self, notification_ids):
+        self.hub.dispatch(notification_ids)
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Polls the notification table every
+    ``NOTIFICATION_STREAM_POLL_INTERVAL`` seconds, from a thread started
+    with the first stream of the process. It follows the highest id seen. On databases where
+    concurrent transactions can commit ids out of order, a row can be
+    skipped by the poller; the client still gets it when it next
+    reconnects with Last-Event-ID.
+    """
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run, name="notification-events", daemon=True)
+                self._thread.start()
+
+    def publish(self, notification_ids):
+        # The rows themselves are the messages.
+        pass
+
+    def run(self):
+        last_id = None
+        while True:
+            time.sleep(settings.NOTIFICATION_STREAM_POLL_INTERVAL)
+            close_old_connections()
+            try:
+                last_id = self.poll(last_id)
+            except DatabaseError:
+                # Try again on the next pass with a fresh connection.
+                close_old_connections()
+
+    def poll(self, last_id):
+        newest = Notification.objects.aggregate(newest=Max("id"))["newest"] or 0
+        user_ids = self.hub.user_ids()
+        if last_id is not None and user_ids:
+            rows = notification_rows(
+                Notification.objects.filter(
+                    id__gt=last_id, id__lte=newest, user_id__in=user_ids)
+            ).order_by("id")
+            self.hub.deliver(rows.iterator(chunk_size=settings.NOTIFICATION_BATCH_SIZE))
+        return newest
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.NOTIFICATION_EVENTS_BACKEND)(hub)
+        return _backend
+
+
+def publish(notification_ids):
+    """
+    Push the given notifications to open streams after the current
+    transaction commits.
+    """
+    notification_ids = [pk for pk in notification_ids if pk is not None]
+    if notification_ids:
+        transaction.on_commit(partial(get_backend().publish, notification_ids))
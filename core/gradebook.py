@@ -0,0 +1,259 @@
+"""
+Course and assessment gradebooks.
+
+The scores of a course come out of one values_list() query as NumPy
+arrays, and everything else is computed with vectorized operations:
+- the student x assessment score matrix,
+- per-assessment mean, median, standard deviation, percentiles,
+  histograms and late-submission counts,
+- per-student averages.
+
+A submission is late when it was made on a day after the assessment's
+due date, in the current time zone. Submission times are read as epoch
+seconds and compared in NumPy, since a per-row date cast in SQL is a
+Python function call per row on SQLite.
+
+Rendered responses are cached under the course's submission and
+enrollment generations (see core.response_cache), so they are recomputed
+only after a submission or enrollment in that course changes, or an
+assessment is edited.
+
+Fetching the submissions row by row is most of the cost of a recompute
+(about 2 s for 10k students x 200 assessments on SQLite), so each
+assessment's columns are also kept packed in a GradebookColumn row. A
+recompute reads those and fetches rows only for the assessments whose
+column was dropped by a save or whose submission count has changed.
+"""
+import datetime
+
+import numpy as np
+from django.db.models import Count, FloatField, Func
+from django.utils import timezone
+
+from .models import Assessment, Enrollment, GradebookColumn, Submission
+from .renderers import FastJSONRenderer
+from .response_cache import generation_label, get_generations, get_or_compute
+
+PERCENTILES = (10, 25, 50, 75, 90)
+DEFAULT_BINS = 10
+MAX_BINS = 100
+FETCH_CHUNK_SIZE = 100000
+# One record per submission in a GradebookColumn
+COLUMN_DTYPE = np.dtype([("student", "<i8"), ("score", "<f8"), ("submitted", "<f8")])
+
+
+def cached_gradebook(course_id, assessment_id=None, bins=DEFAULT_BINS):
+    """
+    Rendered JSON for ``gradebook``, cached until its data changes.
+    """
+    generations = get_generations([
+        generation_label(Submission, course_id),
+        generation_label(Enrollment, course_id),
+        generation_label(Assessment),
+    ])
+    key = "gradebook:%s:%s:%s:%s" % (
+        course_id, assessment_id or "", bins, ":".join(map(str, generations)))
+    return get_or_compute(
+        key,
+        lambda: FastJSONRenderer().render(gradebook(course_id, assessment_id, bins)),
+    )
+
+
+def gradebook(course_id, assessment_id=None, bins=DEFAULT_BINS):
+    assessments = Assessment.objects.filter(course_id=course_id)
+    if assessment_id is not None:
+        assessments = assessments.filter(pk=assessment_id)
+    assessments = list(assessments.order_by("id").values("id", "title", "due_date"))
+    assessment_ids = np.array([a["id"] for a in assessments], dtype=np.int64)
+
+    parts = submission_columns(assessment_ids.tolist())
+    columns = np.concatenate(parts) if parts else np.empty(0, dtype=COLUMN_DTYPE)
+    student_col = columns["student"]
+    assessment_col = np.repeat(assessment_ids, [len(part) for part in parts])
+    score_col = columns["score"]
+
+    # Rows are the enrolled students plus anyone else who submitted.
+    enrolled = np.fromiter(
+        Enrollment.objects.filter(course_id=course_id).values_list("student_id", flat=True),
+        dtype=np.int64,
+    )
+    student_ids = np.union1d(enrolled, student_col)
+    rows = np.searchsorted(student_ids, student_col)
+    cols = np.searchsorted(assessment_ids, assessment_col)
+
+    # Best score when a student submitted more than once.
+    scores = np.full((len(student_ids), len(assessment_ids)), np.nan)
+    np.fmax.at(scores, (rows, cols), score_col)
+    submitted = np.bincount(cols, minlength=len(assessment_ids))
+    # Late from the first second of the day after the due date.
+    deadlines = np.array([
+        timezone.make_aware(datetime.datetime.combine(
+            a["due_date"] + datetime.timedelta(days=1), datetime.time.min)).timestamp()
+        for a in assessments
+    ])
+    late = np.bincount(
+        cols[columns["submitted"] >= deadlines[cols]], minlength=len(assessment_ids))
+
+    scored = ~np.isnan(scores)
+    scored_counts = scored.sum(axis=0)
+    has_scores = scored_counts > 0
+    stats = {
+        name: np.full(len(assessment_ids), np.nan)
+        for name in ("mean", "median", "std", "min", "max")
+    }
+    percentiles = np.full((len(PERCENTILES), len(assessment_ids)), np.nan)
+    if has_scores.any():
+        with_scores = scores[:, has_scores]
+        stats["mean"][has_scores] = np.nanmean(with_scores, axis=0)
+        stats["median"][has_scores] = np.nanmedian(with_scores, axis=0)
+        stats["std"][has_scores] = np.nanstd(with_scores, axis=0)
+        stats["min"][has_scores] = np.nanmin(with_scores, axis=0)
+        stats["max"][has_scores] = np.nanmax(with_scores, axis=0)
+        percentiles[:, has_scores] = np.nanpercentile(with_scores, PERCENTILES, axis=0)
+    edges, histograms = _histograms(scores, scored, bins)
+
+    student_scored = scored.sum(axis=1)
+    student_means = np.full(len(student_ids), np.nan)
+    student_means[student_scored > 0] = np.nanmean(scores[student_scored > 0], axis=1)
+
+    return {
+        "course": course_id,
+        "students": [
+            {"id": student_id, "average": average, "scored": count}
+            for student_id, average, count in zip(
+                student_ids.tolist(), _nullable(student_means), student_scored.tolist())
+        ],
+        "assessments": [
+            {
+                "id": assessment["id"],
+                "title": assessment["title"],
+                "due_date": assessment["due_date"],
+                "submitted": int(submitted[i]),
+                "scored": int(scored_counts[i]),
+                "late": int(late[i]),
+                **{name: _nullable(values[i]) for name, values in stats.items()},
+                "percentiles": dict(zip(map(str, PERCENTILES), _nullable(percentiles[:, i]))),
+                "histogram": histograms[:, i].tolist(),
+            }
+            for i, assessment in enumerate(assessments)
+        ],
+        "histogram_edges": edges.tolist(),
+        # scores[i][j]: student i, assessment j; null if not submitted or not scored
+        "scores": _nullable(scores),
+    }
+
+
+def submission_columns(assessment_ids):
+    """
+    A COLUMN_DTYPE array of submissions for each of ``assessment_ids``,
+    read from their GradebookColumn rows. Missing or outdated rows are
+    rebuilt from one query over the submissions of just those assessments.
+    """
+    counts = dict(
+        Submission.objects.filter(assessment_id__in=assessment_ids)
+        .order_by().values_list("assessment_id").annotate(Count("id")))
+    parts = {
+        pk: np.frombuffer(data, dtype=COLUMN_DTYPE)
+        for pk, submissions, data in GradebookColumn.objects.filter(
+            assessment_id__in=assessment_ids).values_list("assessment_id", "submissions", "data")
+        if submissions == counts.get(pk, 0)
+    }
+    stale = [pk for pk in assessment_ids if pk not in parts]
+    if stale:
+        parts.update(_build_columns(stale))
+    return [parts[pk] for pk in assessment_ids]
+
+
+def _build_columns(assessment_ids):
+    rows = _fetch_columns(
+        Submission.objects.filter(assessment_id__in=assessment_ids)
+        .annotate(submitted=EpochSeconds("submitted_at"))
+        .order_by("assessment_id")
+        .values_list("assessment_id", "student_id", "score", "submitted"),
+        4,
+    )
+    bounds = np.searchsorted(rows[:, 0], assessment_ids + [np.inf])
+    parts = {}
+    for pk, start, end in zip(assessment_ids, bounds, bounds[1:]):
+        part = np.empty(end - start, dtype=COLUMN_DTYPE)
+        part["student"] = rows[start:end, 1]
+        part["score"] = rows[start:end, 2]
+        part["submitted"] = rows[start:end, 3]
+        parts[pk] = part
+    GradebookColumn.objects.bulk_create(
+        [
+            GradebookColumn(assessment_id=pk, submissions=len(part), data=part.tobytes())
+            for pk, part in parts.items()
+        ],
+        batch_size=50,
+        update_conflicts=True,
+        unique_fields=["assessment"],
+        update_fields=["submissions", "data"],
+    )
+    return parts
+
+
+class EpochSeconds(Func):
+    """
+    Seconds since the Unix epoch of a datetime column.
+    """
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Datetimes are stored as UTC text.
+        return self.as_sql(
+            compiler, connection,
+            template="((JULIANDAY(%(expressions)s) - 2440587.5) * 86400.0)",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def _fetch_columns(queryset, width):
+    """
+    Run a values_list() queryset and return its rows as a float array,
+    with NULLs as NaN. Rows are read straight from the cursor in chunks,
+    skipping per-row converters and never holding every row as tuples.
+    """
+    compiler = queryset.query.get_compiler(queryset.db)
+    sql, params = compiler.as_sql()
+    chunks = []
+    with compiler.connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(FETCH_CHUNK_SIZE):
+            chunks.append(np.array(rows, dtype=np.float64))
+    if not chunks:
+        return np.empty((0, width))
+    return np.concatenate(chunks)
+
+
+def _histograms(scores, scored, bins):
+    """
+    Shared bin edges over the scores of every assessment, and a
+    (bins x assessments) array of counts.
+    """
+    values = scores[scored]
+    if not len(values):
+        return np.array([]), np.zeros((bins, scores.shape[1]), dtype=np.int64)
+    low, high = values.min(), values.max()
+    if low == high:
+        high = low + 1
+    edges = np.linspace(low, high, bins + 1)
+    rows, cols = np.nonzero(scored)
+    # The top edge is inclusive, as with np.histogram.
+    bin_index = np.clip(np.searchsorted(edges, scores[rows, cols], side="right") - 1, 0, bins - 1)
+    counts = np.bincount(bin_index * scores.shape[1] + cols, minlength=bins * scores.shape[1])
+    return edges, counts.reshape(bins, scores.shape[1])
+
+
+def _nullable(values):
+    """
+    ``values`` (a NumPy scalar or array) as Python floats, with NaN as None.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, values).tolist()
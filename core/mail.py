@@ -0,0 +1,107 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list, batch_size=1000):
+    """
+    Add one outbox row per recipient and return how many were queued.
+    ``recipient_list`` may be any iterable, e.g. a values_list iterator.
+    """
+    recipients = (recipient for recipient in recipient_list if recipient)
+    queued = 0
+    while True:
+        batch = [
+            OutgoingEmail(
+                subject=subject[:255],
+                message=message,
+                from_email=from_email or "",
+                recipient=recipient,
+            )
+            for recipient in islice(recipients, batch_size)
+        ]
+        if not batch:
+            return queued
+        OutgoingEmail.objects.bulk_create(batch)
+        queued += len(batch)
+
+
+def send_queued_mail(batch_size=None, max_attempts=None):
+    """
+    Send one batch of due outbox rows over a single SMTP connection and
+    return the number of rows processed.
+
+    The batch is claimed first: its rows are marked "sending" in a short
+    transaction, with next_attempt_at pushed out by
+    EMAIL_OUTBOX_CLAIM_TIMEOUT. Messages are then sent with no transaction
+    or row locks held, and the results are saved afterwards. Rows left in
+    "sending" by a worker that died are claimed again once their timeout
+    has passed, so a message may be sent twice but is never lost.
+
+    Failed sends are retried with exponential backoff until
+    ``max_attempts`` is reached, then marked as failed.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    now = timezone.now()
+
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=["pending", "sending"], next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not batch:
+            return 0
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            status="sending",
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT),
+        )
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _record_failure(email, e, max_attempts, now)
+    else:
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.message,
+                from_email=email.from_email or None,
+                to=[email.recipient],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                _record_failure(email, e, max_attempts, now)
+            else:
+                email.status = "sent"
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                email.last_error = ""
+        connection.close()
+
+    OutgoingEmail.objects.bulk_update(
+        batch, ["status", "attempts", "last_error", "next_attempt_at", "sent_at"]
+    )
+    return len(batch)
+
+
+def _record_failure(email, error, max_attempts, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = "failed"
+    else:
+        email.status = "pending"
+        delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+        email.next_attempt_at = now + timedelta(seconds=delay)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import User
+from core.utils import create_notification, create_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one create_notification() per student with a batched "
+        "create_notifications() for the same audience"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            User.objects.bulk_create(
+                User(
+                    email=f"bench-notify{i}@example.com",
+                    username=f"bench-notify{i}",
+                    role="student",
+                )
+                for i in range(options["students"])
+            )
+            students = User.objects.filter(email__startswith="bench-notify")
+
+            def one_by_one():
+                for student in students.iterator():
+                    create_notification(student, "Benchmark")
+
+            def batched():
+                create_notifications(
+                    students.values_list("pk", flat=True).iterator(),
+                    "Benchmark",
+                    batch_size=options["batch_size"],
+                )
+
+            for name, run in (
+                ("create_notification", one_by_one),
+                ("create_notifications", batched),
+            ):
+                seconds, queries = self.run(run)
+                self.stdout.write(
+                    f"{name}: {options['students'] / seconds:,.0f} recipients/sec, "
+                    f"{queries} queries"
+                )
+            transaction.set_rollback(True)
+
+    def run(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            function()
+            seconds = time.perf_counter() - start
+        return seconds, len(queries)
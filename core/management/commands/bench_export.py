@@ -0,0 +1,92 @@
+import gc
+import itertools
+import math
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Course, Enrollment, User
+from core.views import EnrollmentViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an enrollment export of a synthetic table and report its "
+        "peak traced memory; fail if the peak exceeds --max-peak-mb"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000)
+        parser.add_argument("--file-format", choices=("csv", "ndjson"), default="csv")
+        parser.add_argument("--max-peak-mb", type=float, default=16.0)
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            admin = self.seed(options["rows"])
+            expected = Enrollment.objects.count()
+            request = APIRequestFactory().get(
+                "/api/enrollment/export/", {"file_format": options["file_format"]})
+            force_authenticate(request, user=admin)
+            view = EnrollmentViewSet.as_view({"get": "export"})
+
+            gc.collect()
+            tracemalloc.start()
+            try:
+                start = time.perf_counter()
+                response = view(request)
+                rows = size = 0
+                for chunk in response.streaming_content:
+                    rows += chunk.count(b"\n")
+                    size += len(chunk)
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            transaction.set_rollback(True)
+
+        if options["file_format"] == "csv":
+            rows -= 1  # header
+        peak_mb = peak / 2**20
+        self.stdout.write(
+            f"{rows:,} rows, {size / 2**20:,.1f} MB of {options['file_format']} "
+            f"in {seconds:.1f}s (traced), peak {peak_mb:.1f} MB"
+        )
+        if rows != expected:
+            raise CommandError(f"Exported {rows:,} rows, expected {expected:,}")
+        if peak_mb > options["max_peak_mb"]:
+            raise CommandError(
+                f"Peak memory {peak_mb:.1f} MB exceeds {options['max_peak_mb']:g} MB")
+
+    def seed(self, rows):
+        admin = User.objects.create(
+            email="bench-export@example.com", role="admin", is_superuser=True)
+        students = min(rows, 1000)
+        User.objects.bulk_create(
+            User(email=f"bench-export{i}@example.com",
+                 username=f"bench-export{i}", role="student")
+            for i in range(students)
+        )
+        Course.objects.bulk_create(
+            Course(instructor=admin, title=f"Export {i}")
+            for i in range(math.ceil(rows / students))
+        )
+        pairs = itertools.islice(
+            itertools.product(
+                Course.objects.filter(title__startswith="Export ")
+                .values_list("pk", flat=True),
+                User.objects.filter(email__startswith="bench-export", role="student")
+                .values_list("pk", flat=True),
+            ),
+            rows,
+        )
+        # bulk_create() builds a list of its input, so feed it in batches.
+        while batch := list(itertools.islice(pairs, 5000)):
+            Enrollment.objects.bulk_create(
+                Enrollment(course_id=course_id, student_id=student_id)
+                for course_id, student_id in batch
+            )
+        return admin
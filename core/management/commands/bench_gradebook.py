@@ -0,0 +1,91 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.gradebook import cached_gradebook, gradebook
+from core.models import Assessment, Course, Enrollment, Submission, User
+from core.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a course gradebook over a synthetic course: the first build, "
+        "an uncached rebuild (which the target applies to) and a cache hit"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=10000)
+        parser.add_argument("--assessments", type=int, default=200)
+        parser.add_argument(
+            "--max-seconds", type=float, default=1.0,
+            help="Fail if the uncached rebuild takes longer than this")
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            course = self.seed(options["students"], options["assessments"])
+
+            def build():
+                return FastJSONRenderer().render(gradebook(course.pk))
+
+            # gradebook() itself never reads the response cache.
+            first = self.time(build)
+            uncached = self.time(build)
+            cached_gradebook(course.pk)
+            hit = self.time(lambda: cached_gradebook(course.pk))
+            self.stdout.write(
+                f"{options['students']:,} students x {options['assessments']} assessments: "
+                f"first build {first:.3f}s, uncached {uncached:.3f}s, "
+                f"cached {hit * 1000:.2f}ms"
+            )
+            transaction.set_rollback(True)
+        if uncached > options["max_seconds"]:
+            raise CommandError(
+                f"Uncached gradebook took {uncached:.3f}s "
+                f"(limit {options['max_seconds']:.3f}s)")
+
+    def seed(self, students, assessments):
+        instructor = User.objects.create(
+            email="bench-gradebook@example.com", role="instructor")
+        course = Course.objects.create(
+            title="Benchmark", description="d", instructor=instructor,
+            difficulty="beginner")
+        User.objects.bulk_create(
+            (
+                User(email=f"bench-grade{i}@example.com",
+                     username=f"bench-grade{i}", role="student")
+                for i in range(students)
+            ),
+            batch_size=2000,
+        )
+        student_ids = list(
+            User.objects.filter(email__startswith="bench-grade")
+            .values_list("pk", flat=True))
+        Enrollment.objects.bulk_create(
+            (Enrollment(student_id=pk, course=course) for pk in student_ids),
+            batch_size=2000,
+        )
+        due = datetime.date.today()
+        rng = random.Random(0)
+        for i in range(assessments):
+            assessment = Assessment.objects.create(
+                course=course, title=f"Assessment {i}", description="d",
+                due_date=due + datetime.timedelta(days=rng.randint(-1, 1)))
+            # One assessment at a time keeps the unsaved rows bounded.
+            Submission.objects.bulk_create(
+                (
+                    Submission(student_id=pk, assessment=assessment,
+                               score=round(rng.gauss(70, 15), 1))
+                    for pk in student_ids
+                ),
+                batch_size=2000,
+            )
+        return course
+
+    def time(self, function):
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
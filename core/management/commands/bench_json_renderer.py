@@ -0,0 +1,111 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Assessment, Payment, Sponsorship, Submission, User
+from core.renderers import FastJSONRenderer
+from core.serializers import (
+    PaymentSerializer,
+    SponsorshipSerializer,
+    SubmissionSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering throughput of DRF's JSONRenderer and "
+        "FastJSONRenderer on large pages of serialized rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Unsaved instances: nothing touches the database.
+        pages = {
+            "payment": PaymentSerializer(
+                self.payments(options["rows"]), many=True).data,
+            "sponsorship": SponsorshipSerializer(
+                self.sponsorships(options["rows"]), many=True).data,
+            "submission": SubmissionSerializer(
+                self.submissions(options["rows"]), many=True).data,
+            # Raw values, as returned by the dashboard views
+            "raw": [
+                {"amount": Decimal("1234.56"), "at": timezone.now(), "n": i}
+                for i in range(options["rows"])
+            ],
+        }
+        for name, data in pages.items():
+            baseline = JSONRenderer().render(data)
+            fast = FastJSONRenderer().render(data)
+            rates = [
+                self.rate(renderer, data, options["rows"], options["repeat"])
+                for renderer in (JSONRenderer(), FastJSONRenderer())
+            ]
+            self.stdout.write(
+                f"{name}: JSONRenderer {rates[0]:,.0f} rows/sec, "
+                f"FastJSONRenderer {rates[1]:,.0f} rows/sec "
+                f"({rates[1] / rates[0]:.1f}x, identical output: {baseline == fast})"
+            )
+
+    def rate(self, renderer, data, rows, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(data)
+            best = min(best, time.perf_counter() - start)
+        return rows / best
+
+    def users(self):
+        sponsor = User(pk=1, email="sponsor@example.com", role="sponsor")
+        student = User(pk=2, email="student@example.com", role="student")
+        return sponsor, student
+
+    def payments(self, rows):
+        sponsor, _ = self.users()
+        now = timezone.now()
+        return [
+            Payment(
+                pk=i,
+                sponsor=sponsor,
+                amount=Decimal("149.99"),
+                transaction_id=f"txn-{i}",
+                status="completed",
+                created_at=now - datetime.timedelta(seconds=i),
+            )
+            for i in range(rows)
+        ]
+
+    def sponsorships(self, rows):
+        sponsor, student = self.users()
+        now = timezone.now()
+        return [
+            Sponsorship(
+                pk=i,
+                sponsor=sponsor,
+                student=student,
+                amount=Decimal("500.00"),
+                funded_at=now - datetime.timedelta(minutes=i),
+            )
+            for i in range(rows)
+        ]
+
+    def submissions(self, rows):
+        _, student = self.users()
+        assessment = Assessment(pk=1, title="Midterm")
+        now = timezone.now()
+        return [
+            Submission(
+                pk=i,
+                student=student,
+                assessment=assessment,
+                submitted_at=now - datetime.timedelta(seconds=i),
+                score=i % 100 + 0.5,
+            )
+            for i in range(rows)
+        ]
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec of DRF TokenAuthentication and "
+        "CachedTokenAuthentication on a trivial view"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            user = User.objects.create(
+                email="bench-token-auth@example.com", role="student"
+            )
+            token = Token.objects.create(user=user)
+            for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+                rate = self.run(auth_class, token.key, options["requests"])
+                self.stdout.write(f"{auth_class.__name__}: {rate:.0f} requests/sec")
+            transaction.set_rollback(True)
+
+    def run(self, auth_class, key, count):
+        class View(APIView):
+            authentication_classes = [auth_class]
+            permission_classes = []
+
+            def get(self, request):
+                return Response({"user": request.user.pk})
+
+        view = View.as_view()
+        factory = APIRequestFactory()
+        request = factory.get("/", HTTP_AUTHORIZATION=f"Token {key}")
+        view(request)  # warm up
+        start = time.perf_counter()
+        for _ in range(count):
+            view(factory.get("/", HTTP_AUTHORIZATION=f"Token {key}"))
+        return count / (time.perf_counter() - start)
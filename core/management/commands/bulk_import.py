@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk_import import BulkImportError, detect_format, import_file
+
+
+class Command(BaseCommand):
+    help = "Import users and enrollments from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--file-format", choices=["csv", "ndjson"], default=None)
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Processes used to hash passwords")
+
+    def handle(self, *args, **options):
+        try:
+            file_format = detect_format(options["path"], options["file_format"])
+        except BulkImportError as exc:
+            raise CommandError(str(exc))
+        with open(options["path"], "rb") as f:
+            result = import_file(
+                f,
+                file_format,
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+            )
+        for error in result.as_dict()["errors"]:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(
+            f"{result.rows} rows: {result.created_users} users and "
+            f"{result.created_enrollments} enrollments created, "
+            f"{result.error_count} rows with errors"
+        )
@@ -0,0 +1,80 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent GET requests to one or more URLs (e.g. the WSGI and "
+        "ASGI dashboards) and report throughput and latency percentiles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", action="append", required=True,
+                            help="May be given several times")
+        parser.add_argument("--token", help="API token sent as Authorization")
+        parser.add_argument("--concurrency", type=int, default=50,
+                            help="Concurrent keep-alive connections")
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        for url in options["url"]:
+            self.run(url, headers, options["concurrency"], options["requests"])
+
+    def run(self, url, headers, concurrency, total):
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        latencies, errors = [], []
+        lock = threading.Lock()
+        remaining = iter(range(total))
+
+        def worker():
+            connection = connection_class(parts.netloc, timeout=30)
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = connection_class(parts.netloc, timeout=30)
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    (latencies if ok else errors).append(elapsed)
+            connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        if len(latencies) < 2:
+            self.stdout.write(f"{url}: {len(errors)} errors, not enough successful requests")
+            return
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{url}: {len(latencies) / duration:.0f} req/s, "
+            f"p50 {cuts[49] * 1000:.1f} ms, p95 {cuts[94] * 1000:.1f} ms, "
+            f"p99 {cuts[98] * 1000:.1f} ms, {len(errors)} errors "
+            f"({concurrency} connections)"
+        )
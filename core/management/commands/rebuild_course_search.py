@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Course
+from core.search import index_courses
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course full-text search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ids = list(Course.objects.values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        for start in range(0, len(ids), batch_size):
+            index_courses(ids[start : start + batch_size])
+        self.stdout.write(f"Indexed {len(ids)} courses")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters and per-sponsor totals from the tables"
+
+    def handle(self, *args, **options):
+        rebuild_stats()
+        self.stdout.write("Dashboard stats rebuilt")
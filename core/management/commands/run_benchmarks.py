@@ -0,0 +1,86 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import compare, endpoints, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API endpoints in-process against seeded data "
+        "(manage.py seed_data) and report latency, throughput and query "
+        "counts as JSON; with --baseline, fail on regressions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50,
+                            help="Measured requests per endpoint")
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="names",
+            help="Only run endpoints with this name, e.g. course-list (repeatable)",
+        )
+        parser.add_argument("--password", default="password",
+                            help="Password of the seeded users, for /login/")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--baseline", help="JSON report of an earlier run to compare with")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed growth of p50/p95 latency and query counts over the baseline",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=1.0,
+            help="Ignore latency growth smaller than this",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 2:
+            raise CommandError("--iterations must be at least 2")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+        try:
+            selected = endpoints(options["password"])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+        if options["names"]:
+            unknown = set(options["names"]) - {endpoint.name for endpoint in selected}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            selected = [endpoint for endpoint in selected if endpoint.name in options["names"]]
+
+        report = run_benchmarks(
+            selected, options["iterations"], options["warmup"], log=self.log)
+        if baseline is not None:
+            report["regressions"] = compare(
+                report, baseline, options["threshold"], options["min_delta_ms"])
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        if report.get("regressions"):
+            for regression in report["regressions"]:
+                self.stderr.write(
+                    "{endpoint}: {metric} {baseline} -> {current}".format(**regression))
+            raise CommandError(
+                f"{len(report['regressions'])} regressions beyond {options['threshold']:.0%}")
+
+    def log(self, name, result):
+        if "skipped" in result:
+            self.stderr.write(f"{name}: skipped ({result['skipped']})")
+            return
+        self.stderr.write(
+            f"{name}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+            f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+            f"{result['queries']} queries"
+        )
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.bulk_import import run_next_import
+
+
+class Command(BaseCommand):
+    help = "Run bulk imports queued by POST /bulk_import/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Processes used to hash passwords")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for jobs instead of exiting once none are queued",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when --loop is set",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            job = run_next_import(
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+            )
+            if job is not None:
+                total += 1
+                self.stdout.write(f"Import {job.pk}: {job.status}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(f"Ran {total} import jobs")
@@ -0,0 +1,49 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.reminders import send_due_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Notify enrolled students who haven't submitted an assessment that "
+        "is due soon. Safe to rerun: reminders already sent are skipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            type=int,
+            action="append",
+            dest="windows",
+            help="Days before the due date to remind at (repeatable); "
+            "defaults to settings.ASSESSMENT_REMINDER_WINDOWS",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            default=None,
+            help="Run as if today were this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking for due reminders every --interval seconds",
+        )
+        parser.add_argument("--interval", type=float, default=3600.0)
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_due_reminders(
+                windows=options["windows"],
+                today=options["date"],
+                batch_size=options["batch_size"],
+            )
+            for window, count in sent.items():
+                self.stdout.write(f"{window}-day window: sent {count} reminders")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
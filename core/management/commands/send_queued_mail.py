@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Send pending emails from the outbox in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--max-attempts", type=int, default=None)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when --loop is set",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = send_queued_mail(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(f"Processed {total} queued emails")
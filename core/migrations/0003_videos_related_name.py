@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_videos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videos',
+            name='course',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='videos', to='core.course'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model('core', 'DashboardCounter')
+    for name, model_name in [('users', 'User'), ('courses', 'Course'), ('enrollments', 'Enrollment')]:
+        DashboardCounter.objects.create(
+            name=name, value=apps.get_model('core', model_name).objects.count())
+    # SponsorStats rows are built lazily on the first dashboard read.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SponsorStats',
+            fields=[
+                ('sponsor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sponsor_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('students_funded', models.PositiveIntegerField(default=0)),
+                ('total_funds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('progress_sum', models.FloatField(default=0.0)),
+                ('enrollment_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['-enrolled_at', '-id'], name='enrollment_enrolled_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['-created_at', '-id'], name='notification_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at', '-id'], name='payment_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sponsorship',
+            index=models.Index(fields=['-funded_at', '-id'], name='sponsorship_funded_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-submitted_at', '-id'], name='submission_submitted_id_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # Keep the enrollment with the most progress for each (student, course)
+    # so the unique constraint can be created.
+    Enrollment = apps.get_model('core', 'Enrollment')
+    duplicates = (
+        Enrollment.objects.values('student_id', 'course_id')
+        .annotate(rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    removed = 0
+    for pair in duplicates.iterator():
+        ids = list(
+            Enrollment.objects.filter(
+                student_id=pair['student_id'], course_id=pair['course_id'])
+            .order_by('-progress', 'id')
+            .values_list('id', flat=True)
+        )
+        removed += Enrollment.objects.filter(id__in=ids[1:]).delete()[0]
+    if removed:
+        # Dashboard stats were maintained by signals, which don't run here.
+        DashboardCounter = apps.get_model('core', 'DashboardCounter')
+        DashboardCounter.objects.filter(name='enrollments').update(
+            value=models.F('value') - removed)
+        apps.get_model('core', 'SponsorStats').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'student'], name='enrollment_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['progress'], name='enrollment_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', '-created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sponsorship',
+            index=models.Index(fields=['sponsor', 'student'], name='sponsorship_sponsor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_enrollment'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:01
+
+import django.contrib.postgres.search
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX core_course_search_idx ON core_course "
+            "USING GIN (search_vector)")
+        schema_editor.execute(
+            "UPDATE core_course SET search_vector = "
+            "setweight(to_tsvector('simple', coalesce(core_course.title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(core_course.difficulty, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(core_user.username, '')), 'C') "
+            "FROM core_user WHERE core_user.id = core_course.instructor_id")
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE core_course_fts USING "
+                "fts5(title, difficulty, instructor, prefix='2 3')")
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains.
+            return
+        schema_editor.execute(
+            "INSERT INTO core_course_fts (rowid, title, difficulty, instructor) "
+            "SELECT c.id, c.title, c.difficulty, u.username FROM core_course c "
+            "LEFT JOIN core_user u ON u.id = c.instructor_id")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS core_course_search_idx")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_course_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
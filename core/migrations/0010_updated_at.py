@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_course_updated_at(apps, schema_editor):
+    # Existing rows get the migration time; created_at is a closer guess.
+    Course = apps.get_model('core', 'Course')
+    Course.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_course_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='videos',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_course_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watched', models.FloatField(default=0.0)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='video_progress', to='core.enrollment')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.videos')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('enrollment', 'video'), name='unique_video_progress')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_video_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assessment', 'student', 'score', 'submitted_at'], name='submission_gradebook_idx'),
+        ),
+    ]
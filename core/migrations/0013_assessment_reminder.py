@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_submission_gradebook_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.PositiveSmallIntegerField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.assessment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('assessment', 'student', 'window'), name='unique_assessment_reminder')],
+            },
+        ),
+    ]
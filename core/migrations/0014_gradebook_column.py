@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_assessment_reminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradebookColumn',
+            fields=[
+                ('assessment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.assessment')),
+                ('submissions', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+    ]
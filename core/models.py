@@ -1,6 +1,13 @@
+import math
+import os
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.contrib.auth.models import Group
 from django.dispatch import receiver
 
@@ -46,19 +53,139 @@ class Course(models.Model):
     ]
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also bumped when the course's videos change (see touch_course)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by core.search on PostgreSQL (GIN indexed); unused on SQLite,
+    # which keeps a core_course_fts FTS5 table instead.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'],
+                         name='course_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
 class Videos(models.Model):
-    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True)
+    course = models.ForeignKey(
+        Course, on_delete=models.SET_NULL, null=True, related_name='videos')
     title = models.CharField(max_length=255)
     video_file = models.FileField(upload_to="videos/")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} - {self.course.title}"
 
+
+# Course responses embed their videos, so a video change must change the
+# course's validators too: both courses' when a video moves.
+@receiver(pre_save, sender=Videos)
+def remember_video_course(sender, instance, raw=False, **kwargs):
+    instance._previous_course_id = None
+    if not raw and not instance._state.adding:
+        instance._previous_course_id = Videos.objects.filter(
+            pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Videos)
+@receiver(post_delete, sender=Videos)
+def touch_course(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    course_ids = {instance.course_id,
+                  instance.__dict__.pop('_previous_course_id', None)}
+    course_ids.discard(None)
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(
+            updated_at=timezone.now())
+
+
+# Likewise for the instructor's email, which course responses show. The
+# stored email is read before the save, so saves that leave it alone
+# (last_login, password changes) don't touch the courses.
+@receiver(pre_save, sender=User)
+def remember_email_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._email_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    stored = User.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+    instance._email_changed = stored is not None and stored != instance.email
+
+
+@receiver(post_save, sender=User)
+def touch_instructor_courses(sender, instance, created, **kwargs):
+    if not getattr(instance, '_email_changed', False):
+        return
+    instance._email_changed = False
+    if Course.objects.filter(instructor_id=instance.pk).update(
+            updated_at=timezone.now()):
+        from .response_cache import bump_generation
+        bump_generation(Course)
+
+
+# Cached course, video and assessment responses are keyed by these models'
+# generations (see core.response_cache)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Videos)
+@receiver(post_delete, sender=Videos)
+def bump_response_cache(sender, **kwargs):
+    from .response_cache import bump_generation
+    bump_generation(sender)
+
+
+# Resumable chunked upload of a lecture video. Chunks are written straight
+# into a preallocated temp file and the Videos row is created on finalize.
+class VideoUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    video = models.OneToOneField(
+        Videos, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def total_chunks(self):
+        return max(math.ceil(self.size / self.chunk_size), 1)
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.VIDEO_UPLOAD_TEMP_DIR, f"{self.id}.part")
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"Upload {self.filename} - {self.course.title}"
+
+
+class VideoUploadChunk(models.Model):
+    upload = models.ForeignKey(
+        VideoUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['upload', 'index'], name='unique_upload_chunk'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.upload_id}"
+
+
 # Enrollment of Students in new course
 
 
@@ -70,9 +197,55 @@ class Enrollment(models.Model):
     enrolled_at = models.DateTimeField(auto_now_add=True)
     progress = models.FloatField(default=0.0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-enrolled_at', '-id'],
+                         name='enrollment_enrolled_id_idx'),
+            # Assessment fan-out reads student ids by course
+            models.Index(fields=['course', 'student'],
+                         name='enrollment_course_idx'),
+            models.Index(fields=['progress'], name='enrollment_progress_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'course'], name='unique_enrollment'),
+        ]
+
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
 
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # core.stats diffs each save against the values last read.
+        from .stats import remember_refreshed_values
+        remember_refreshed_values(self, fields)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def bump_enrollment_gradebook_cache(sender, instance, **kwargs):
+    from .response_cache import bump_generation
+    bump_generation(sender, instance.course_id)
+
+
+# How far a student has watched each video of an enrolled course, as a
+# fraction from 0 to 1. Written in batches by core.progress, which also
+# rolls it up into Enrollment.progress.
+class VideoProgress(models.Model):
+    enrollment = models.ForeignKey(
+        Enrollment, on_delete=models.CASCADE, related_name='video_progress')
+    video = models.ForeignKey(Videos, on_delete=models.CASCADE)
+    watched = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['enrollment', 'video'], name='unique_video_progress'),
+        ]
+
+    def __str__(self):
+        return f"{self.enrollment} - {self.video.title}: {self.watched:.0%}"
+
 
 # Add assessment for students
 class Assessment(models.Model):
@@ -81,11 +254,19 @@ class Assessment(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     due_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
 
+@receiver(post_save, sender=Assessment)
+@receiver(post_delete, sender=Assessment)
+def bump_assessment_response_cache(sender, **kwargs):
+    from .response_cache import bump_generation
+    bump_generation(sender)
+
+
 # Submitting of the assigned assesment
 class Submission(models.Model):
     student = models.ForeignKey(
@@ -95,10 +276,67 @@ class Submission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     score = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-submitted_at', '-id'],
+                         name='submission_submitted_id_idx'),
+            # Covers the gradebook query, so it reads the index in
+            # assessment order without visiting the table
+            models.Index(fields=['assessment', 'student', 'score', 'submitted_at'],
+                         name='submission_gradebook_idx'),
+        ]
+
     def __str__(self):
         return f"{self.student.username} - {self.assessment.title}"
 
 
+# Gradebooks are cached per course (see core.gradebook). Deletes don't bump:
+# a post_delete handler would stop course and assessment deletes from
+# cascading in bulk, and stale entries expire with RESPONSE_CACHE_TIMEOUT.
+@receiver(post_save, sender=Submission)
+def bump_gradebook_cache(sender, instance, **kwargs):
+    from .response_cache import bump_generation
+    course_id = Assessment.objects.filter(
+        pk=instance.assessment_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        bump_generation(sender, course_id)
+    GradebookColumn.objects.filter(assessment_id=instance.assessment_id).delete()
+
+
+# Packed submission columns of one assessment (see core.gradebook), so a
+# gradebook that is not cached reads a row per assessment rather than one
+# per submission. Saves drop the row; a column whose submission count no
+# longer matches (after a delete) is rebuilt when next read.
+class GradebookColumn(models.Model):
+    assessment = models.OneToOneField(
+        Assessment, on_delete=models.CASCADE, primary_key=True)
+    submissions = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"Gradebook column of {self.assessment_id}"
+
+
+# Ledger of due-date reminders already sent, one row per assessment, student
+# and reminder window (days before the due date), so that reruns of
+# send_due_reminders never notify anyone twice
+class AssessmentReminder(models.Model):
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE)
+    student = models.ForeignKey(User, on_delete=models.CASCADE)
+    window = models.PositiveSmallIntegerField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['assessment', 'student', 'window'],
+                name='unique_assessment_reminder'),
+        ]
+
+    def __str__(self):
+        return f"{self.window}-day reminder for {self.assessment_id} to {self.student_id}"
+
+
 # Sponsorship for student
 class Sponsorship(models.Model):
     sponsor = models.ForeignKey(
@@ -108,9 +346,24 @@ class Sponsorship(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     funded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-funded_at', '-id'],
+                         name='sponsorship_funded_id_idx'),
+            # Sponsor dashboard and stats maintenance
+            models.Index(fields=['sponsor', 'student'],
+                         name='sponsorship_sponsor_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sponsor.username} sponsored {self.student.username}"
 
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # core.stats diffs each save against the values last read.
+        from .stats import remember_refreshed_values
+        remember_refreshed_values(self, fields)
+
 
 # Sends Notification to the user
 class Notification(models.Model):
@@ -120,6 +373,18 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'],
+                         name='notification_created_id_idx'),
+            models.Index(fields=['user', 'is_read'],
+                         name='notification_user_read_idx'),
+            # Small index covering only the unread notifications of a user
+            models.Index(fields=['user', '-created_at'],
+                         condition=models.Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username} - {self.user.email}"
 
@@ -137,5 +402,106 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'],
+                         name='payment_created_id_idx'),
+            models.Index(fields=['status', '-created_at'],
+                         name='payment_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.status}"
+
+
+# Outbox of emails waiting to be sent by the send_queued_mail command.
+# One row per recipient so delivery status is tracked per address.
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, default="")
+    recipient = models.EmailField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='outgoing_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email to {self.recipient} - {self.status}"
+
+
+# Bulk import queued by POST /bulk_import/ and run by the run_import_jobs
+# command (see core.bulk_import). The uploaded file is deleted once the
+# job has finished.
+class ImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    file = models.FileField(upload_to="imports/")
+    file_format = models.CharField(max_length=10)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'],
+                         name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} - {self.status}"
+
+
+# Running totals behind the admin dashboard, kept current by core.stats
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+# Per-sponsor totals behind the sponsor dashboard, kept current by core.stats.
+# progress_sum/enrollment_count cover the enrollments of funded students.
+class SponsorStats(models.Model):
+    sponsor = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='sponsor_stats')
+    students_funded = models.PositiveIntegerField(default=0)
+    total_funds = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    progress_sum = models.FloatField(default=0.0)
+    enrollment_count = models.PositiveIntegerField(default=0)
+
+    @property
+    def avg_progress(self):
+        if not self.enrollment_count:
+            return 0
+        return self.progress_sum / self.enrollment_count
+
+    def __str__(self):
+        return f"Stats for {self.sponsor.email}"
@@ -0,0 +1,223 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Row estimate from the PostgreSQL planner, or None where unavailable.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Uses the planner estimate instead of COUNT(*) once the table is large
+    enough for the estimate to be worth its inaccuracy.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on the view's ``keyset_ordering``, e.g.
+    ("-created_at", "-id"). Each page is a range scan on the matching
+    composite index, so deep pages cost the same as the first one.
+    The last ordering field must be unique. Querysets ordered by an
+    annotation, such as search relevance, are rejected: the keyset would
+    replace that ordering.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if ordered_by_annotation(queryset):
+            raise ValidationError(
+                {self.cursor_query_param: "Ranked results can't be paginated by cursor."})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.fields = [name.lstrip("-") for name in self.ordering]
+        model_fields = [queryset.model._meta.get_field(name) for name in self.fields]
+
+        position, self.reverse = self.decode_cursor(request, model_fields)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(_flip(name) for name in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(seek_filter(ordering, position))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        cursor = encode_position([_row_value(row, name) for name in self.fields], reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model_fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        return decode_position(encoded, model_fields)
+
+
+def ordered_by_annotation(queryset):
+    """
+    Whether ``queryset`` is explicitly ordered by one of its annotations,
+    e.g. core.search's search_rank.
+    """
+    return any(
+        isinstance(name, str) and name.lstrip("-") in queryset.query.annotations
+        for name in queryset.query.order_by
+    )
+
+
+def encode_position(position, reverse=False):
+    payload = json.dumps({"p": position, "r": int(reverse)}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_position(encoded, model_fields):
+    """
+    (position, reverse) from a cursor, with values converted by
+    ``model_fields``. Raises NotFound for a malformed cursor.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        position = [
+            field.to_python(value)
+            for field, value in zip(model_fields, payload["p"], strict=True)
+        ]
+        return position, bool(payload["r"])
+    except (TypeError, ValueError, KeyError):
+        raise NotFound("Invalid cursor")
+
+
+def _flip(name):
+    return name[1:] if name.startswith("-") else f"-{name}"
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def seek_filter(ordering, position):
+    """
+    Rows strictly after ``position`` in ``ordering``:
+    (a > x) OR (a = x AND b > y) ..., plus a leading a >= x bound so the
+    database can use an index range scan.
+    """
+    clauses = []
+    for i, name in enumerate(ordering):
+        field = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        equal = {ordering[j].lstrip("-"): position[j] for j in range(i)}
+        clauses.append(Q(**equal, **{f"{field}__{lookup}": position[i]}))
+    first = ordering[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+    return bound & reduce(or_, clauses)
+
+
+class LMSPagination(PageNumberPagination):
+    """
+    Page-number pagination (with an optional planner-estimated count, see
+    PAGINATION_ESTIMATED_COUNT) unless the request has a ``cursor``, asks
+    for ``?pagination=keyset``, or the view sets ``pagination_mode = "keyset"``.
+    Results ordered by an annotation (search relevance) always use page
+    numbers, so their ordering is kept.
+    """
+
+    mode_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request, view) and not ordered_by_annotation(queryset):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def use_keyset(self, request, view):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return True
+        mode = request.query_params.get(
+            self.mode_query_param, getattr(view, "pagination_mode", "page")
+        )
+        return mode == "keyset"
+
+    @property
+    def django_paginator_class(self):
+        if settings.PAGINATION_ESTIMATED_COUNT:
+            return EstimatedCountPaginator
+        return DjangoPaginator
@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission
 from rest_framework.permissions import DjangoModelPermissions
-from .models import Course, Videos
+from .models import Course, Videos, Enrollment
+from .access import get_user_access
 
 
 class CustomModelPermissions(DjangoModelPermissions):
@@ -14,25 +15,39 @@ class CustomModelPermissions(DjangoModelPermissions):
         'DELETE': ['%(app_label)s.delete_%(model_name)s'],
     }
 
+    def has_permission(self, request, view):
+        if not request.user or (
+                not request.user.is_authenticated and self.authenticated_users_only):
+            return False
+
+        # Workaround to ensure DjangoModelPermissions are not applied
+        # to the root view when using DefaultRouter.
+        if getattr(view, '_ignore_model_permissions', False):
+            return True
+
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return get_user_access(request.user).has_perms(perms)
+
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='admin').exists()
+        return get_user_access(request.user).has_role('admin')
 
 
 class IsInstructor(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='instructor').exists()
+        return get_user_access(request.user).has_role('instructor')
 
 
 class IsStudent(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='student').exists()
+        return get_user_access(request.user).has_role('student')
 
 
 class IsSponsor(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='sponsor').exists()
+        return get_user_access(request.user).has_role('sponsor')
 
 
 class IsInstructorOfCourse(BasePermission):
@@ -43,3 +58,29 @@ class IsInstructorOfCourse(BasePermission):
         if isinstance(obj, Videos):
             return obj.course.instructor == request.user
         return False
+
+
+# Video playback: the course instructor, admins and enrolled students
+class CanWatchVideo(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        if obj.course is not None and obj.course.instructor_id == request.user.id:
+            return True
+        if IsAdmin().has_permission(request, view):
+            return True
+        return obj.course is not None and Enrollment.objects.filter(
+            student=request.user, course=obj.course).exists()
+
+
+# Gradebooks: the course instructor and admins
+class CanViewGradebook(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        course = obj if isinstance(obj, Course) else obj.course
+        if course.instructor_id == request.user.id:
+            return True
+        return IsAdmin().has_permission(request, view)
@@ -0,0 +1,310 @@
+"""
+Per-request profiling, enabled with PROFILING_ENABLED.
+
+ProfilingMiddleware records these for every request, labelled with the
+resolved view name (e.g. "course-list"):
+- wall time,
+- the number of SQL queries and the time spent executing them,
+- the time spent in PrefetchPlanSerializer rendering,
+- the response size.
+
+Queries are counted by a wrapper that sits first in the
+``execute_wrappers`` of every database connection, the same hook that
+``connection.execute_wrapper()`` uses. It is installed once per
+connection and reports to the profile of the current request, which is
+held in a context variable. That makes it work for async views too,
+whose queries run in sync_to_async threads with a copy of the request's
+context. Outside a request, such as in management commands and background
+threads, it only passes the query through.
+
+Serializer time covers each top-level to_representation() call and
+serialize_values(), including any queries they trigger lazily. Query
+time is the time spent in cursor.execute(). Streaming responses are timed
+up to their headers and sized only when they set Content-Length.
+
+The measurements go into in-memory Prometheus histograms. Each process
+keeps its own, and /metrics/ serves them to admins in the Prometheus text
+format. Requests slower than PROFILING_SLOW_REQUEST_SECONDS are logged to
+the "core.profiling" logger with their most repeated SQL statements,
+which is how an N+1 query pattern shows up.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+UNRESOLVED_VIEW = "<unresolved>"
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, collect_statements=False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        # {sql: [executions, seconds]}, only kept for the slow request log
+        self.statements = {} if collect_statements else None
+        self._serializing = False
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if self.statements is not None:
+            stats = self.statements.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+
+    @contextmanager
+    def serializing(self):
+        # Nested serializers are already inside the outer one's time.
+        if self._serializing:
+            yield
+            return
+        self._serializing = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.serializer_seconds += time.perf_counter() - start
+            self._serializing = False
+
+    def duplicate_statements(self, limit):
+        """
+        The ``limit`` statements run more than once, most frequent first,
+        as (sql, executions, seconds).
+        """
+        repeated = [
+            (sql, count, seconds)
+            for sql, (count, seconds) in (self.statements or {}).items()
+            if count > 1
+        ]
+        repeated.sort(key=lambda statement: (-statement[1], -statement[2]))
+        return repeated[:limit]
+
+
+def current_profile():
+    """
+    The profile of the request being handled, or None.
+    """
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def _install_query_recorder(connection, **kwargs):
+    # First in the list, so it also times any other wrappers, and so
+    # execute_wrapper() blocks that are open now still pop their own.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = labelnames
+        # {label values: [per-bucket counts, sum, count]}
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = _format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.series = {}
+
+    def inc(self, labels):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, count in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.labelnames, labels)}}} {count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter(
+                "lms_requests_total", "Requests handled.", ("view", "method", "status"))
+            self.duration = Histogram(
+                "lms_request_duration_seconds", "Wall time of the request.",
+                SECONDS_BUCKETS, ("view", "method"))
+            self.queries = Histogram(
+                "lms_request_queries", "SQL queries run by the request.",
+                QUERY_BUCKETS, ("view", "method"))
+            self.sql = Histogram(
+                "lms_request_sql_seconds", "Time spent executing SQL.",
+                SECONDS_BUCKETS, ("view", "method"))
+            self.serializer = Histogram(
+                "lms_request_serializer_seconds", "Time spent in serializers.",
+                SECONDS_BUCKETS, ("view", "method"))
+            self.size = Histogram(
+                "lms_response_size_bytes", "Size of the response body.",
+                SIZE_BUCKETS, ("view", "method"))
+
+    def observe(self, view, method, status, profile, seconds, size):
+        labels = (view, method)
+        with self._lock:
+            self.requests.inc((view, method, str(status)))
+            self.duration.observe(labels, seconds)
+            self.queries.observe(labels, profile.queries)
+            self.sql.observe(labels, profile.sql_seconds)
+            self.serializer.observe(labels, profile.serializer_seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = []
+            for metric in (
+                self.requests, self.duration, self.queries, self.sql,
+                self.serializer, self.size,
+            ):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _format_labels(names, values):
+    return ",".join(
+        '%s="%s"' % (name, value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""))
+        for name, value in zip(names, values)
+    )
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(
+            _install_query_recorder, dispatch_uid="core.profiling.install_query_recorder")
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile(collect_statements=bool(settings.PROFILING_SLOW_REQUEST_SECONDS))
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile)
+        return response
+
+    async def __acall__(self, request):
+        profile = RequestProfile(collect_statements=bool(settings.PROFILING_SLOW_REQUEST_SECONDS))
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile)
+        return response
+
+    def record(self, request, response, profile):
+        seconds = time.perf_counter() - profile.start
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match is not None else None) or UNRESOLVED_VIEW
+        if response.streaming:
+            length = response.get("Content-Length")
+            size = int(length) if length and length.isdigit() else None
+        else:
+            size = len(response.content)
+        metrics.observe(view, request.method, response.status_code, profile, seconds, size)
+        threshold = settings.PROFILING_SLOW_REQUEST_SECONDS
+        if threshold and seconds >= threshold:
+            log_slow_request(request, view, profile, seconds)
+
+
+def log_slow_request(request, view, profile, seconds):
+    lines = [
+        "Slow request: %s %s (%s) took %.1f ms; %d queries, %.1f ms SQL, "
+        "%.1f ms serializing" % (
+            request.method, request.get_full_path(), view, 1000 * seconds,
+            profile.queries, 1000 * profile.sql_seconds, 1000 * profile.serializer_seconds,
+        )
+    ]
+    for sql, count, statement_seconds in profile.duplicate_statements(
+            settings.PROFILING_SLOW_REQUEST_STATEMENTS):
+        lines.append("  %dx, %.1f ms: %s" % (count, 1000 * statement_seconds, sql))
+    logger.warning("\n".join(lines))
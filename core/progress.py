@@ -0,0 +1,260 @@
+"""
+Batched ingestion of video progress heartbeats.
+
+Players POST batches of events to /progress/:
+
+    {"events": [{"enrollment": 7, "video": 3, "position": 95.0, "duration": 600.0}, ...]}
+
+``position`` and ``duration`` are in seconds. Each worker coalesces the
+events in memory, keeping only the furthest point reached per
+(enrollment, video). The buffer is flushed every PROGRESS_FLUSH_INTERVAL
+seconds by a background thread, or right away once PROGRESS_MAX_PENDING
+pairs are waiting. Each flush batch is one transaction:
+
+1. VideoProgress rows for new pairs are inserted with
+   bulk_create(ignore_conflicts=True). All pairs are then raised with one
+   UPDATE ... SET watched = GREATEST(watched, CASE ...), so a late or
+   out-of-order event can never lower what is stored.
+2. Each affected Enrollment.progress is recomputed as the percentage of
+   its course's videos watched. It is only ever raised, and is written with
+   bulk_update. The sponsor stats get the deltas, since bulk writes skip
+   the signals.
+
+Events still buffered when a worker dies are lost. The player's next
+heartbeat reports the same or a later position, so this only delays the
+update.
+"""
+import atexit
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from . import stats
+from .models import Enrollment, VideoProgress, Videos
+
+
+def parse_events(events):
+    """
+    Validate a list of event dicts, returning ([(index, enrollment_id,
+    video_id, watched fraction)], [{"index": index, "errors": {...}}]).
+    """
+    parsed = []
+    errors = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            errors.append({"index": index, "errors": {"event": "Expected an object."}})
+            continue
+        event_errors = {}
+        values = {}
+        for name in ("enrollment", "video"):
+            value = event.get(name)
+            if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+                values[name] = value
+            else:
+                event_errors[name] = "A valid id is required."
+        for name in ("position", "duration"):
+            value = event.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+                values[name] = float(value)
+            else:
+                event_errors[name] = "A non-negative number is required."
+        if not event_errors and not values["duration"]:
+            event_errors["duration"] = "Must be greater than zero."
+        if event_errors:
+            errors.append({"index": index, "errors": event_errors})
+            continue
+        watched = min(values["position"] / values["duration"], 1.0)
+        parsed.append((index, values["enrollment"], values["video"], watched))
+    return parsed, errors
+
+
+def owned_pairs(student_id, pairs):
+    """
+    The (enrollment_id, video_id) pairs among ``pairs`` where the
+    enrollment belongs to the student and the video to its course.
+    """
+    enrollment_ids = {enrollment_id for enrollment_id, _ in pairs}
+    video_ids = {video_id for _, video_id in pairs}
+    found = Videos.objects.filter(
+        pk__in=video_ids,
+        course__enrollment__id__in=enrollment_ids,
+        course__enrollment__student_id=student_id,
+    ).values_list("course__enrollment__id", "id")
+    return set(found) & set(pairs)
+
+
+def ingest(student_id, events):
+    """
+    Validate ``events`` for the student and queue them. Returns the
+    response payload.
+    """
+    parsed, errors = parse_events(events)
+    allowed = owned_pairs(student_id, {(e, v) for _, e, v, _ in parsed}) if parsed else set()
+    accepted = []
+    for index, enrollment_id, video_id, watched in parsed:
+        if (enrollment_id, video_id) in allowed:
+            accepted.append((enrollment_id, video_id, watched))
+        else:
+            errors.append({
+                "index": index,
+                "errors": {"video": "Not a video of one of your enrollments."},
+            })
+    coalescer.add(accepted)
+    return {
+        "accepted": len(accepted),
+        "rejected": len(errors),
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
+
+
+class Coalescer:
+    """
+    Per-process buffer of the furthest point watched per (enrollment,
+    video), flushed by ``write_progress``.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, events):
+        with self._lock:
+            self._merge(events)
+            pending = len(self._pending)
+        if not settings.PROGRESS_FLUSH_INTERVAL or pending >= settings.PROGRESS_MAX_PENDING:
+            self.flush()
+        elif pending:
+            self._start()
+
+    def _merge(self, events):
+        for enrollment_id, video_id, watched in events:
+            key = (enrollment_id, video_id)
+            if watched > self._pending.get(key, -1.0):
+                self._pending[key] = watched
+
+    def flush(self):
+        """
+        Write everything buffered so far. On a database error the events
+        go back into the buffer and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                write_progress(pending)
+            except DatabaseError:
+                with self._lock:
+                    self._merge((e, v, w) for (e, v), w in pending.items())
+                raise
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="progress-flush", daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.PROGRESS_FLUSH_INTERVAL)
+            close_old_connections()
+            try:
+                self.flush()
+            except DatabaseError:
+                # Kept in the buffer; retried on the next pass.
+                close_old_connections()
+
+
+coalescer = Coalescer()
+
+
+def write_progress(pending):
+    """
+    Store {(enrollment_id, video_id): watched} with max semantics and roll
+    it up into Enrollment.progress.
+    """
+    items = iter(pending.items())
+    while True:
+        batch = dict(islice(items, settings.PROGRESS_FLUSH_BATCH_SIZE))
+        if not batch:
+            return
+        with transaction.atomic():
+            _write_video_progress(batch)
+            _roll_up({enrollment_id for enrollment_id, _ in batch})
+
+
+def _write_video_progress(batch):
+    VideoProgress.objects.bulk_create(
+        [
+            VideoProgress(enrollment_id=enrollment_id, video_id=video_id, watched=watched)
+            for (enrollment_id, video_id), watched in batch.items()
+        ],
+        ignore_conflicts=True,
+    )
+    new_watched = Case(
+        *[
+            When(enrollment_id=enrollment_id, video_id=video_id, then=Value(watched))
+            for (enrollment_id, video_id), watched in batch.items()
+        ],
+        default=F("watched"),
+        output_field=FloatField(),
+    )
+    VideoProgress.objects.filter(
+        enrollment_id__in={enrollment_id for enrollment_id, _ in batch},
+        video_id__in={video_id for _, video_id in batch},
+    ).update(watched=Greatest("watched", new_watched))
+
+
+def _roll_up(enrollment_ids):
+    enrollments = list(
+        Enrollment.objects.select_for_update()
+        .filter(pk__in=enrollment_ids)
+        .only("id", "student_id", "course_id", "progress")
+    )
+    watched = dict(
+        VideoProgress.objects.filter(
+            enrollment_id__in=enrollment_ids,
+            video__course_id=F("enrollment__course_id"),
+        )
+        .values("enrollment_id")
+        .annotate(total=Sum("watched"))
+        .values_list("enrollment_id", "total")
+    )
+    video_counts = dict(
+        Videos.objects.filter(course_id__in={e.course_id for e in enrollments})
+        .values("course_id")
+        .annotate(count=Count("id"))
+        .values_list("course_id", "count")
+    )
+    changed = []
+    deltas = defaultdict(float)
+    for enrollment in enrollments:
+        videos = video_counts.get(enrollment.course_id)
+        if not videos:
+            continue
+        progress = min(100.0, 100.0 * watched.get(enrollment.pk, 0.0) / videos)
+        # Never lower progress, e.g. after videos are added to the course.
+        if progress > enrollment.progress:
+            deltas[enrollment.student_id] += progress - enrollment.progress
+            enrollment.progress = progress
+            changed.append(enrollment)
+    if changed:
+        Enrollment.objects.bulk_update(changed, ["progress"])
+        stats.apply_progress_deltas(
+            {student_id: (delta, 0) for student_id, delta in deltas.items()})
@@ -0,0 +1,121 @@
+"""
+Due-date reminders for assessments.
+
+``ASSESSMENT_REMINDER_WINDOWS`` lists how many days ahead of a due date
+students are reminded, e.g. (7, 1). Each window covers the due dates not
+already covered by a smaller one. With (7, 1), a student is reminded
+once 2-7 days before the deadline and again 0-1 days before it.
+
+For each window, one query pairs the enrollments with the course's
+assessments due in that range, and uses NOT EXISTS anti-joins to drop
+students who have already submitted or have already had this reminder.
+The query is read in keyset pages of REMINDER_BATCH_SIZE rows. Each page
+is written in one transaction: AssessmentReminder ledger rows plus
+bulk-created Notification rows. A rerun therefore skips everything
+already sent. If two runs overlap, the ledger's unique constraint fails
+the duplicate page, and it is picked up again by the next run.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import events
+from .models import AssessmentReminder, Enrollment, Notification, Submission
+
+
+def send_due_reminders(windows=None, today=None, batch_size=None):
+    """
+    Send every reminder that is due. Returns {window: reminders sent}.
+    """
+    windows = sorted(set(windows or settings.ASSESSMENT_REMINDER_WINDOWS))
+    today = today or timezone.localdate()
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    sent = {}
+    previous = -1
+    for window in windows:
+        sent[window] = _send_window(
+            window,
+            today + datetime.timedelta(days=previous + 1),
+            today + datetime.timedelta(days=window),
+            today,
+            batch_size,
+        )
+        previous = window
+    return sent
+
+
+def pending_reminders(window, first_due, last_due, after=None):
+    """
+    (assessment_id, student_id, title, due_date) of the reminders for
+    ``window`` still to be sent, for assessments due from ``first_due`` to
+    ``last_due``, ordered by assessment and student and starting after the
+    (assessment_id, student_id) pair ``after``.
+    """
+    assessment = OuterRef("course__assessment__id")
+    student = OuterRef("student_id")
+    conditions = [
+        ~Exists(Submission.objects.filter(assessment_id=assessment, student_id=student)),
+        ~Exists(AssessmentReminder.objects.filter(
+            assessment_id=assessment, student_id=student, window=window)),
+    ]
+    if after is not None:
+        conditions.append(
+            Q(course__assessment__id__gt=after[0])
+            | Q(course__assessment__id=after[0], student_id__gt=after[1])
+        )
+        # Redundant, but lets the planner seek instead of rescanning.
+        conditions.append(Q(course__assessment__id__gte=after[0]))
+    # A single filter() call, so one assessment join is shared by every
+    # condition, the ordering and the selected columns.
+    return (
+        Enrollment.objects.filter(
+            *conditions,
+            course__assessment__due_date__gte=first_due,
+            course__assessment__due_date__lte=last_due,
+        )
+        .order_by("course__assessment__id", "student_id")
+        .values_list(
+            "course__assessment__id", "student_id", "course__assessment__title",
+            "course__assessment__due_date",
+        )
+    )
+
+
+def _send_window(window, first_due, last_due, today, batch_size):
+    sent = 0
+    last = None
+    while True:
+        rows = list(pending_reminders(window, first_due, last_due, last)[:batch_size])
+        if not rows:
+            return sent
+        last = rows[-1][:2]
+        try:
+            with transaction.atomic():
+                AssessmentReminder.objects.bulk_create([
+                    AssessmentReminder(
+                        assessment_id=assessment_id, student_id=student_id, window=window)
+                    for assessment_id, student_id, _, _ in rows
+                ])
+                notifications = Notification.objects.bulk_create([
+                    Notification(user_id=student_id, message=reminder_message(title, due_date, today))
+                    for _, student_id, title, due_date in rows
+                ])
+                events.publish([notification.pk for notification in notifications])
+        except IntegrityError:
+            # Another run sent (some of) this page; the rest is retried next run.
+            continue
+        sent += len(rows)
+
+
+def reminder_message(title, due_date, today):
+    days = (due_date - today).days
+    if days == 0:
+        when = "today"
+    elif days == 1:
+        when = "tomorrow"
+    else:
+        when = f"in {days} days"
+    return f"Reminder: {title} is due {when} ({due_date:%Y-%m-%d})"
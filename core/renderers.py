@@ -0,0 +1,77 @@
+"""
+JSON renderer and parser backed by orjson.
+
+Output matches DRF's JSONRenderer: values orjson doesn't handle natively
+the same way (datetimes, Decimal, lazy strings, querysets) are passed to
+DRF's own JSONEncoder.default, so e.g. datetimes keep DRF's "Z" suffix and
+millisecond precision. Floats print the same, except that orjson writes
+exponents as 1e-6 where json writes 1e-06; output that may contain one is
+rendered again by JSONRenderer. Without orjson installed, or when an indent,
+ASCII-only output or non-compact separators are requested, both classes
+behave exactly like the DRF ones.
+"""
+import codecs
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_default = encoders.JSONEncoder().default
+
+# The exponent of a float as orjson writes it (a digit must precede it).
+# Matches inside strings only cost a second rendering.
+_EXPONENT = re.compile(rb"e-?[0-9]")
+_DIGITS = b"0123456789"
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        for match in _EXPONENT.finditer(ret):
+            if ret[match.start() - 1] in _DIGITS:
+                return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for JSON embedded in <script> tags.
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
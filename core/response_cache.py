@@ -0,0 +1,240 @@
+"""
+Response cache for read-heavy viewsets.
+
+Serialized response data is cached under a key made of the absolute
+request URL (payload links are absolute), the user's role, the Accept
+header (the cached ETag depends on it) and the current generation of every
+model the response depends on. Each generation is a counter in the Django
+cache, bumped after commit by the post_save/post_delete handlers in
+core.models. A bump makes all older keys unreachable, so nothing has to
+be deleted and entries simply age out.
+
+Lookups go through an in-process LRU first, then the Django cache. On a
+miss, only one caller recomputes a key: threads in the same process wait
+on a lock, and other processes wait for a short-lived lock entry in the
+Django cache, then read what the winner stored.
+"""
+import hashlib
+import pickle
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .utils import LRUCache
+
+GENERATION_PREFIX = "respcache:gen:"
+CACHED_HEADERS = ("ETag", "Last-Modified", "Cache-Control")
+
+_local = LRUCache(settings.RESPONSE_CACHE_LOCAL_SIZE, settings.RESPONSE_CACHE_LOCAL_TTL)
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = dict.fromkeys(
+                ("local_hits", "shared_hits", "misses", "waits"), 0)
+            self.seconds = dict.fromkeys(("hit", "miss"), 0.0)
+
+    def record(self, outcome, seconds):
+        with self._lock:
+            self.counts[outcome] += 1
+            self.seconds["miss" if outcome == "misses" else "hit"] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+            seconds = dict(self.seconds)
+        hits = counts["local_hits"] + counts["shared_hits"] + counts["waits"]
+        lookups = hits + counts["misses"]
+        return {
+            **counts,
+            "hit_ratio": hits / lookups if lookups else None,
+            "avg_hit_ms": 1000 * seconds["hit"] / hits if hits else None,
+            "avg_miss_ms": (
+                1000 * seconds["miss"] / counts["misses"] if counts["misses"] else None
+            ),
+            "local_entries": len(_local),
+        }
+
+
+metrics = Metrics()
+
+
+def _generation_key(label):
+    return GENERATION_PREFIX + label.lower()
+
+
+def generation_label(model, scope=None):
+    """
+    Label of the generation counter for ``model``, or for the part of it
+    named by ``scope`` (e.g. one course's rows).
+    """
+    label = model._meta.label
+    return label if scope is None else f"{label}:{scope}"
+
+
+def bump_generation(model, scope=None):
+    """
+    Invalidate every cached response that depends on ``model``, or only
+    those that depend on its ``scope`` part.
+    """
+    key = _generation_key(generation_label(model, scope))
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Start from the clock so a lost counter never reuses old keys.
+            cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def get_generations(labels):
+    keys = [_generation_key(label) for label in labels]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def _key_lock(key):
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def get_or_compute(key, compute):
+    """
+    Cached value for ``key``, calling ``compute`` on a miss. A None result
+    is returned but not stored.
+    """
+    start = time.perf_counter()
+    value = _local.get(key)
+    if value is not None:
+        metrics.record("local_hits", time.perf_counter() - start)
+        return value
+    value = cache.get(key)
+    if value is not None:
+        _local.set(key, value)
+        metrics.record("shared_hits", time.perf_counter() - start)
+        return value
+
+    try:
+        with _key_lock(key):
+            value = _local.get(key)
+            if value is not None:
+                metrics.record("waits", time.perf_counter() - start)
+                return value
+            lock_key = f"{key}:lock"
+            if not cache.add(lock_key, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+                value = _wait_for(key, lock_key)
+                if value is not None:
+                    _local.set(key, value)
+                    metrics.record("waits", time.perf_counter() - start)
+                    return value
+            try:
+                value = compute()
+                if value is not None:
+                    cache.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+                    _local.set(key, value)
+            finally:
+                cache.delete(lock_key)
+    finally:
+        with _key_locks_guard:
+            _key_locks.pop(key, None)
+    metrics.record("misses", time.perf_counter() - start)
+    return value
+
+
+def _wait_for(key, lock_key):
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return cache.get(key)
+
+
+class ResponseCacheMixin:
+    """
+    Caches list and retrieve responses. ``cache_dependencies`` lists the
+    models (as "app_label.ModelName") whose changes can alter the output.
+    Goes before ConditionalGetMixin, whose validators are cached along
+    with the data.
+    """
+
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, "list", super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, "retrieve", super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, action, handler, *args, **kwargs):
+        key = self.response_cache_key(request, action)
+        response = None
+
+        def compute():
+            nonlocal response
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return None
+            headers = {
+                name: response[name]
+                for name in CACHED_HEADERS
+                if response.has_header(name)
+            }
+            # Stored pickled: requests never share mutable data, and the
+            # serializer behind ReturnDict/ReturnList isn't kept alive.
+            return pickle.dumps((response.data, headers), pickle.HIGHEST_PROTOCOL)
+
+        value = get_or_compute(key, compute)
+        if value is None or response is not None:
+            return response
+        data, headers = pickle.loads(value)
+        # Validators were cached with the data, so conditional requests
+        # are answered without touching the database.
+        not_modified = get_conditional_response(
+            request._request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+        )
+        response = not_modified or Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def response_cache_key(self, request, action):
+        user = request.user
+        role = "superuser" if user.is_superuser else getattr(user, "role", "")
+        generations = get_generations(self.cache_dependencies)
+        raw = "|".join(
+            str(part)
+            for part in (
+                self.basename, action, request.build_absolute_uri(), role,
+                request.META.get("HTTP_ACCEPT", ""), *generations,
+            )
+        )
+        return "respcache:" + hashlib.sha256(raw.encode()).hexdigest()
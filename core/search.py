@@ -0,0 +1,163 @@
+# Full-text course search. PostgreSQL keeps a weighted tsvector in
+# Course.search_vector (GIN indexed); SQLite uses the core_course_fts FTS5
+# table. Anything else falls back to DRF's icontains SearchFilter.
+# Bulk-created courses are not seen by post_save: call index_courses.
+import re
+
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import BooleanField, FloatField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.filters import SearchFilter
+
+from .models import Course, User
+
+FTS_TABLE = "core_course_fts"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_vector():
+    username = User.objects.filter(pk=OuterRef("instructor_id")).values("username")
+    return (
+        SearchVector("title", weight="A", config="simple")
+        + SearchVector("difficulty", weight="B", config="simple")
+        + SearchVector(Subquery(username), weight="C", config="simple")
+    )
+
+
+_backends = {}
+
+
+def backend(using):
+    """
+    "postgresql", "sqlite" or None (no full-text index), looked up once per
+    database alias.
+    """
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == "postgresql":
+            _backends[using] = "postgresql"
+        elif connection.vendor == "sqlite":
+            tables = connection.introspection.table_names()
+            _backends[using] = "sqlite" if FTS_TABLE in tables else None
+        else:
+            _backends[using] = None
+    return _backends[using]
+
+
+@receiver(post_migrate)
+def reset_backend(sender, **kwargs):
+    _backends.clear()
+
+
+def index_courses(course_ids, using="default"):
+    """
+    Refresh the search index for the given course ids.
+    """
+    course_ids = list(course_ids)
+    if not course_ids:
+        return
+    kind = backend(using)
+    if kind == "postgresql":
+        Course.objects.using(using).filter(pk__in=course_ids).update(
+            search_vector=search_vector()
+        )
+    elif kind == "sqlite":
+        placeholders = ", ".join(["%s"] * len(course_ids))
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", course_ids
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, difficulty, instructor) "
+                "SELECT c.id, c.title, c.difficulty, u.username "
+                "FROM core_course c LEFT JOIN core_user u ON u.id = c.instructor_id "
+                f"WHERE c.id IN ({placeholders})",
+                course_ids,
+            )
+
+
+def search_courses(queryset, terms):
+    tokens = [token for term in terms for token in TOKEN_RE.findall(term)]
+    if not tokens:
+        return queryset.none()
+    kind = backend(queryset.db)
+    if kind == "postgresql":
+        query = " & ".join(f"{token}:*" for token in tokens)
+        return (
+            queryset.filter(
+                RawSQL(
+                    "core_course.search_vector @@ to_tsquery('simple', %s)",
+                    [query],
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    "ts_rank(core_course.search_vector, to_tsquery('simple', %s))",
+                    [query],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-id")
+        )
+    # SQLite FTS5: quoted tokens with a prefix star, all required
+    query = " AND ".join('"%s"*' % token for token in tokens)
+    return (
+        queryset.filter(
+            RawSQL(
+                f"core_course.id IN (SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s)",
+                [query],
+                output_field=BooleanField(),
+            )
+        )
+        .annotate(
+            search_rank=RawSQL(
+                f"(SELECT bm25({FTS_TABLE}, 10.0, 5.0, 2.0) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = core_course.id)",
+                [query],
+                output_field=FloatField(),
+            )
+        )
+        .order_by("search_rank", "-id")
+    )
+
+
+class CourseSearchFilter(SearchFilter):
+    """
+    ?search= backed by the full-text index, ranked best match first.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or backend(queryset.db) is None:
+            return super().filter_queryset(request, queryset, view)
+        return search_courses(queryset, terms)
+
+
+# Signal handlers
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, raw=False, using="default", **kwargs):
+    if not raw:
+        index_courses([instance.pk], using)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, using="default", **kwargs):
+    if backend(using) == "sqlite":
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def instructor_saved(sender, instance, created, raw=False, using="default", **kwargs):
+    if not created and not raw and instance.role == "instructor":
+        course_ids = Course.objects.using(using).filter(
+            instructor_id=instance.pk
+        ).values_list("pk", flat=True)
+        index_courses(course_ids, using)
@@ -0,0 +1,259 @@
+"""
+Synthetic data for benchmarks and local development.
+
+``seed_database`` fills the tables with users of every role, courses,
+videos, assessments, enrollments, submissions, sponsorships, payments and
+notifications. The number of users of each role in SEED_COUNTS is
+multiplied by ``scale``, and everything else is counted per user or per
+course, so it grows with them. Every choice comes from
+``random.Random(seed)``, so the same seed on an empty database gives the
+same rows and ids. Only timestamps differ, and due dates, which are
+relative to today.
+
+Rows are written with bulk_create in batches of SEED_BATCH_SIZE, in one
+transaction. bulk_create skips the post_save handlers, so group
+memberships, the dashboard counters, sponsor totals, the course search
+index and the response cache generations are updated here explicitly.
+
+Seeded users have emails ending in SEED_EMAIL_DOMAIN, e.g.
+student0@seed.example.com, and all share one password. Admins are
+superusers.
+"""
+import datetime
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from . import search, stats
+from .models import (
+    Assessment,
+    Course,
+    Enrollment,
+    Notification,
+    Payment,
+    Sponsorship,
+    Submission,
+    User,
+    Videos,
+)
+from .response_cache import bump_generation
+
+SEED_EMAIL_DOMAIN = "seed.example.com"
+SEED_BATCH_SIZE = 1000
+
+# Volumes at scale 1
+SEED_COUNTS = {
+    "admins": 5,
+    "instructors": 50,
+    "students": 2000,
+    "sponsors": 100,
+    "courses_per_instructor": 4,
+    "videos_per_course": 5,
+    "assessments_per_course": 4,
+    "enrollments_per_student": 5,
+    "payments_per_sponsor": 5,
+    "notifications_per_user": 10,
+}
+SUBMISSION_RATE = 0.6  # of (enrollment, assessment) pairs
+UNSCORED_RATE = 0.1  # of submissions
+SPONSORED_RATE = 0.3  # of students
+
+TOPICS = (
+    "Python", "Django", "SQL", "Statistics", "Linear Algebra", "Networking",
+    "Algorithms", "Web Design", "Machine Learning", "Cloud Computing",
+)
+LEVELS = ("Introduction to", "Practical", "Advanced", "Applied", "Foundations of")
+FIRST_NAMES = ("Ann", "Bikash", "Chen", "Dana", "Emil", "Fatima", "Gita", "Hugo", "Ines", "Jon")
+LAST_NAMES = ("Adhikari", "Berg", "Costa", "Dahl", "Evans", "Fischer", "Gurung", "Horvat")
+MESSAGES = (
+    "New video added to {course}",
+    "Your submission for {course} was graded",
+    "{course} has a new assessment",
+    "Reminder: keep up with {course}",
+)
+
+
+def seed_email(role, index):
+    return f"{role}{index}@{SEED_EMAIL_DOMAIN}"
+
+
+def already_seeded():
+    return User.objects.filter(email__endswith="@" + SEED_EMAIL_DOMAIN).exists()
+
+
+def seed_database(scale=1.0, seed=0, password="password"):
+    """
+    Write the synthetic data set. Returns {table: rows created}.
+    """
+    rng = random.Random(seed)
+    # Everything else grows with the number of users.
+    counts = dict(SEED_COUNTS)
+    for name in ("admins", "instructors", "students", "sponsors"):
+        counts[name] = max(1, round(SEED_COUNTS[name] * scale))
+    created = {}
+    with transaction.atomic():
+        users = _seed_users(rng, counts, make_password(password))
+        created["users"] = sum(len(ids) for ids in users.values())
+        courses = _seed_courses(rng, users["instructor"], counts)
+        created["courses"] = len(courses)
+        created["videos"] = _bulk_create(Videos, (
+            Videos(course_id=course_id, title=f"Lesson {n + 1}",
+                   video_file=f"videos/seed/{course_id}-{n + 1}.mp4")
+            for course_id in courses
+            for n in range(counts["videos_per_course"])
+        ))
+        assessments = _seed_assessments(rng, courses, counts)
+        created["assessments"] = sum(len(ids) for ids in assessments.values())
+        enrollments = _seed_enrollments(rng, users["student"], courses, counts)
+        created["enrollments"] = len(enrollments)
+        created["submissions"] = _bulk_create(Submission, (
+            Submission(
+                student_id=student_id, assessment_id=assessment_id,
+                score=None if rng.random() < UNSCORED_RATE else float(rng.randint(35, 100)),
+            )
+            for student_id, course_id in enrollments
+            for assessment_id in assessments[course_id]
+            if rng.random() < SUBMISSION_RATE
+        ))
+        created["sponsorships"] = _bulk_create(Sponsorship, (
+            Sponsorship(
+                sponsor_id=rng.choice(users["sponsor"]), student_id=student_id,
+                amount=Decimal(rng.randrange(5000, 200000)) / 100,
+            )
+            for student_id in users["student"]
+            if rng.random() < SPONSORED_RATE
+        ))
+        created["payments"] = _bulk_create(Payment, (
+            Payment(
+                sponsor_id=sponsor_id,
+                amount=Decimal(rng.randrange(5000, 500000)) / 100,
+                transaction_id=f"SEED-{seed}-{sponsor_id}-{n}",
+                status=rng.choice(("pending", "completed")),
+            )
+            for sponsor_id in users["sponsor"]
+            for n in range(counts["payments_per_sponsor"])
+        ))
+        titles = dict(Course.objects.filter(pk__in=courses).values_list("pk", "title"))
+        created["notifications"] = _bulk_create(Notification, (
+            Notification(
+                user_id=user_id,
+                message=rng.choice(MESSAGES).format(course=titles[rng.choice(courses)]),
+                is_read=rng.random() < 0.5,
+            )
+            for ids in users.values()
+            for user_id in ids
+            for _ in range(counts["notifications_per_user"])
+        ))
+
+        stats.rebuild_stats()
+        for start in range(0, len(courses), SEED_BATCH_SIZE):
+            search.index_courses(courses[start:start + SEED_BATCH_SIZE])
+        for model in (Course, Videos, Assessment):
+            bump_generation(model)
+        for course_id in courses:
+            bump_generation(Enrollment, course_id)
+            bump_generation(Submission, course_id)
+    return created
+
+
+def _bulk_create(model, objs):
+    """
+    bulk_create ``objs`` (any iterable) one batch at a time. Returns the
+    number of rows written.
+    """
+    objs = iter(objs)
+    total = 0
+    while batch := list(islice(objs, SEED_BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _seed_users(rng, counts, password_hash):
+    """
+    Users of every role, with their group memberships. Returns {role: [ids]}.
+    """
+    users = {}
+    for role in ("admin", "instructor", "student", "sponsor"):
+        _bulk_create(User, (
+            User(
+                email=seed_email(role, i), username=f"{role}{i}", role=role,
+                password=password_hash, first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES), is_superuser=role == "admin",
+                is_staff=role == "admin",
+            )
+            for i in range(counts[role + "s"])
+        ))
+        # Read back rather than rely on bulk_create setting pks, which
+        # not every backend does.
+        users[role] = list(
+            User.objects.filter(role=role, email__endswith="@" + SEED_EMAIL_DOMAIN)
+            .order_by("pk").values_list("pk", flat=True)
+        )
+        group, _ = Group.objects.get_or_create(name=role)
+        _bulk_create(User.groups.through, (
+            User.groups.through(user_id=user_id, group_id=group.pk) for user_id in users[role]
+        ))
+    return users
+
+
+def _seed_courses(rng, instructor_ids, counts):
+    _bulk_create(Course, (
+        Course(
+            instructor_id=instructor_id,
+            title=f"{rng.choice(LEVELS)} {rng.choice(TOPICS)}",
+            description=f"A {rng.randint(4, 16)} week course.",
+            difficulty=rng.choice(("beginner", "intermediate", "advanced")),
+        )
+        for instructor_id in instructor_ids
+        for _ in range(counts["courses_per_instructor"])
+    ))
+    return list(
+        Course.objects.filter(instructor_id__in=instructor_ids)
+        .order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def _seed_assessments(rng, courses, counts):
+    """
+    Returns {course_id: [assessment ids]}.
+    """
+    today = timezone.localdate()
+    _bulk_create(Assessment, (
+        Assessment(
+            course_id=course_id, title=f"Assessment {n + 1}", description="Answer every question.",
+            due_date=today + datetime.timedelta(days=rng.randint(-30, 60)),
+        )
+        for course_id in courses
+        for n in range(counts["assessments_per_course"])
+    ))
+    assessments = {course_id: [] for course_id in courses}
+    for assessment_id, course_id in (
+        Assessment.objects.filter(course_id__in=courses).order_by("pk")
+        .values_list("pk", "course_id")
+    ):
+        assessments[course_id].append(assessment_id)
+    return assessments
+
+
+def _seed_enrollments(rng, student_ids, courses, counts):
+    """
+    Returns [(student_id, course_id)].
+    """
+    per_student = min(counts["enrollments_per_student"], len(courses))
+    enrollments = [
+        (student_id, course_id)
+        for student_id in student_ids
+        for course_id in sorted(rng.sample(courses, per_student))
+    ]
+    _bulk_create(Enrollment, (
+        Enrollment(student_id=student_id, course_id=course_id,
+                   progress=round(rng.uniform(0, 100), 1))
+        for student_id, course_id in enrollments
+    ))
+    return enrollments
@@ -1,5 +1,227 @@
 from rest_framework import serializers
-from .models import User, Course, Enrollment, Assessment, Submission, Sponsorship, Notification, Payment, Videos
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.conf import settings
+from .profiling import current_profile
+from .uploads import received_ranges
+from .models import User, Course, Enrollment, Assessment, Submission, Sponsorship, Notification, Payment, Videos, VideoUpload, ImportJob
+
+
+# Base serializer that knows which relations it reads.
+# Meta.select_related lists the forward relations used by dotted sources
+# (e.g. 'student' for source='student.email') and Meta.prefetch_related the
+# nested ones, so viewsets can build a queryset that joins them and loads
+# only the columns being rendered.
+#
+# Clients can ask for a sparse fieldset with ?fields=id,title. Fields listed
+# in Meta.expandable_fields are then left out unless named in ?expand=.
+# The fieldset only shapes the output: writes still accept every field.
+class PrefetchPlanSerializer(serializers.ModelSerializer):
+
+    @property
+    def _readable_fields(self):
+        fields = super()._readable_fields
+        # Only the top-level serializer follows ?fields=; nested ones share
+        # its context but render all of their own fields.
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        if not hasattr(self, '_requested_fields'):
+            # Computed once, not for every row of a list.
+            self._requested_fields = self.get_requested_fields(
+                self.context.get('request'))
+        if self._requested_fields is None:
+            return fields
+        return [field for field in fields if field.field_name in self._requested_fields]
+
+    def to_representation(self, instance):
+        profile = current_profile()
+        if profile is None:
+            return super().to_representation(instance)
+        with profile.serializing():
+            return super().to_representation(instance)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        if request is None or 'fields' not in request.query_params:
+            return None
+        requested = set(_split_param(request.query_params['fields']))
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        requested -= expandable
+        requested |= expandable & set(
+            _split_param(request.query_params.get('expand', '')))
+        return requested
+
+    @classmethod
+    def get_query_plan(cls, requested=None):
+        cache = cls.__dict__.get('_query_plans')
+        if cache is None:
+            cache = cls._query_plans = {}
+        key = frozenset(requested) if requested is not None else None
+        if key in cache:
+            return cache[key]
+
+        meta = cls.Meta
+        declared_select = getattr(meta, 'select_related', ())
+        declared_prefetch = {
+            getattr(lookup, 'prefetch_to', lookup): lookup
+            for lookup in getattr(meta, 'prefetch_related', ())
+        }
+        select_related = []
+        prefetch_related = []
+        only = set()
+        for name, field in cls().fields.items():
+            if requested is not None and not field.write_only and name not in requested:
+                continue
+            if field.source == '*':
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                if field.source in declared_prefetch:
+                    prefetch_related.append(declared_prefetch[field.source])
+                continue
+            path = field.source.replace('.', '__')
+            root = field.source.split('.')[0]
+            if path != root:
+                if root not in declared_select:
+                    # Relation not declared in Meta: let it load lazily
+                    # rather than deferring columns it may need.
+                    continue
+                if root not in select_related:
+                    select_related.append(root)
+                only.add(root)
+            else:
+                try:
+                    meta.model._meta.get_field(root)
+                except FieldDoesNotExist:
+                    continue
+            only.add(path)
+
+        cache[key] = {
+            'select_related': select_related,
+            'prefetch_related': prefetch_related,
+            'only': sorted(only),
+        }
+        return cache[key]
+
+    @classmethod
+    def setup_queryset(cls, queryset, requested=None):
+        plan = cls.get_query_plan(requested)
+        if plan['select_related']:
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan['prefetch_related']:
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        if plan['only']:
+            queryset = queryset.only(*plan['only'])
+        return queryset
+
+
+    @classmethod
+    def get_values_plan(cls, requested=None):
+        """
+        Columns and converters for rendering rows straight from
+        ``queryset.values()``, or None when a readable field can't be
+        rendered from a column (nested serializers, method fields, files,
+        properties, nullable relations in a dotted source).
+
+        Each entry is (field name, values() lookup, to_representation),
+        in the serializer's field order.
+        """
+        cache = cls.__dict__.get('_values_plans')
+        if cache is None:
+            cache = cls._values_plans = {}
+        key = frozenset(requested) if requested is not None else None
+        if key not in cache:
+            cache[key] = cls._build_values_plan(requested)
+        return cache[key]
+
+    @classmethod
+    def _build_values_plan(cls, requested):
+        plan = []
+        for name, field in cls().fields.items():
+            if field.write_only:
+                continue
+            if requested is not None and name not in requested:
+                continue
+            lookup = _column_lookup(cls.Meta.model, field)
+            if lookup is None:
+                return None
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                convert = None
+            else:
+                convert = field.to_representation
+            plan.append((name, lookup, convert))
+        return plan
+
+    @classmethod
+    def serialize_values(cls, rows, plan):
+        """
+        Render values() dicts exactly as ``cls(instances, many=True).data``
+        would render the matching instances.
+        """
+        profile = current_profile()
+        if profile is not None:
+            with profile.serializing():
+                return cls._serialize_values(rows, plan)
+        return cls._serialize_values(rows, plan)
+
+    @classmethod
+    def _serialize_values(cls, rows, plan):
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in plan:
+                value = row[lookup]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+def _column_lookup(model, field):
+    """
+    values() lookup for a serializer field whose output only depends on a
+    column value, or None.
+    """
+    if field.source == '*' or isinstance(field, (
+            serializers.BaseSerializer, serializers.ManyRelatedField,
+            serializers.FileField, serializers.SerializerMethodField,
+            serializers.ModelField)):
+        return None
+    if isinstance(field, serializers.RelatedField) and not isinstance(
+            field, serializers.PrimaryKeyRelatedField):
+        return None
+    parts = field.source.split('.')
+    for i, part in enumerate(parts):
+        try:
+            model_field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        is_last = i == len(parts) - 1
+        if model_field.many_to_many or model_field.one_to_many or not model_field.concrete:
+            return None
+        if model_field.is_relation:
+            if is_last:
+                # Only a primary key field can render a relation's column.
+                if not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    return None
+            elif model_field.null:
+                # A missing related object skips the field instead of
+                # rendering None.
+                return None
+            else:
+                model = model_field.related_model
+        elif not is_last or isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None
+    return '__'.join(parts)
+
+
+def _split_param(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
 
 
 # User serializer
@@ -10,15 +232,49 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # Videos serializer
-class VideoSerializer(serializers.ModelSerializer):
+class VideoSerializer(PrefetchPlanSerializer):
     class Meta:
         model = Videos
         fields = '__all__'
 
-# Course serializer
+
+# Resumable video upload session serializer
+class VideoUploadSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(
+        min_value=0, max_value=settings.VIDEO_UPLOAD_MAX_SIZE)
+    chunk_size = serializers.IntegerField(
+        min_value=1, max_value=settings.VIDEO_UPLOAD_MAX_CHUNK_SIZE, required=False)
+    total_chunks = serializers.IntegerField(read_only=True)
+    received_ranges = serializers.SerializerMethodField()
+
+    class Meta:
+        model = VideoUpload
+        fields = ["id", "course", "title", "filename", "size", "chunk_size",
+                  "total_chunks", "received_ranges", "video", "created_at", "completed_at"]
+        read_only_fields = ["video", "created_at", "completed_at"]
+
+    def get_received_ranges(self, obj):
+        return received_ranges(obj)
+
+    def validate_course(self, course):
+        if course.instructor != self.context['request'].user:
+            raise serializers.ValidationError(
+                "You are not the instructor of this course")
+        return course
+
+    def validate_filename(self, filename):
+        return filename.replace('\\', '/').split('/')[-1]
+
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ["id", "status", "file_format", "result", "error",
+                  "created_at", "started_at", "finished_at"]
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(PrefetchPlanSerializer):
     instructor = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='instructor'), write_only=True)
     instructor_email = serializers.CharField(
@@ -28,11 +284,18 @@ class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ["id", "title", "description",
-                  "instructor", "difficulty", "created_at", "videos", "instructor_email"]
+                  "instructor", "difficulty", "created_at", "updated_at", "videos",
+                  "instructor_email"]
+        select_related = ('instructor',)
+        prefetch_related = (
+            Prefetch('videos', queryset=Videos.objects.only(
+                'id', 'title', 'video_file', 'course', 'updated_at')),
+        )
+        expandable_fields = ('videos',)
 
 
 # Enrollment serializer
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(PrefetchPlanSerializer):
     student = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='student'), write_only=True)
     course = serializers.PrimaryKeyRelatedField(
@@ -46,10 +309,11 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = '__all__'
+        select_related = ('student', 'course')
 
 
 # Assessment serializer
-class AssessmentSerializer(serializers.ModelSerializer):
+class AssessmentSerializer(PrefetchPlanSerializer):
     course = serializers.PrimaryKeyRelatedField(
         queryset=Course.objects.all(), write_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True)
@@ -57,10 +321,11 @@ class AssessmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Assessment
         fields = '__all__'
+        select_related = ('course',)
 
 
 # Submission serializer
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(PrefetchPlanSerializer):
     student = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='student'), write_only=True)
     assessment = serializers.PrimaryKeyRelatedField(
@@ -75,10 +340,11 @@ class SubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = '__all__'
+        select_related = ('student', 'assessment')
 
 
 # Sponsorship serializer
-class SponsorshipSerializer(serializers.ModelSerializer):
+class SponsorshipSerializer(PrefetchPlanSerializer):
     sponsor = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='sponsor'), write_only=True)
     sponsor_email = serializers.CharField(
@@ -91,10 +357,11 @@ class SponsorshipSerializer(serializers.ModelSerializer):
     class Meta:
         model = Sponsorship
         fields = '__all__'
+        select_related = ('sponsor', 'student')
 
 
 # Notification serializer
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(PrefetchPlanSerializer):
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), write_only=True)
     user_email = serializers.CharField(
@@ -103,10 +370,11 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
+        select_related = ('user',)
 
 
 # Payment serializer
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(PrefetchPlanSerializer):
     sponsor = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='sponsor'), write_only=True)
     sponsor_email = serializers.CharField(
@@ -115,3 +383,4 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+        select_related = ('sponsor',)
\ No newline at end of file
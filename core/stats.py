@@ -0,0 +1,385 @@
+"""
+Dashboard statistics.
+
+Global counts (users, courses, enrollments) live in DashboardCounter rows and
+per-sponsor totals in SponsorStats rows. Both are adjusted incrementally with
+F() updates from model signals, so the dashboards read a handful of rows no
+matter how large the tables grow. Results are cached and the cache entry is
+deleted when the underlying row changes. ``rebuild_stats`` recomputes
+everything from scratch (see the rebuild_dashboard_stats command).
+
+Code that writes with bulk_create/update bypasses the signals and must call
+``bump`` / ``apply_progress_deltas`` itself. The ``a``-prefixed functions are
+the read paths for async views.
+"""
+import asyncio
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Course,
+    DashboardCounter,
+    Enrollment,
+    Sponsorship,
+    SponsorStats,
+    User,
+)
+
+COUNTER_MODELS = {
+    "users": User,
+    "courses": Course,
+    "enrollments": Enrollment,
+}
+
+ADMIN_CACHE_KEY = "dashboard:admin"
+
+
+def sponsor_cache_key(sponsor_id):
+    return f"dashboard:sponsor:{sponsor_id}"
+
+
+def _invalidate(key):
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+# Global counters
+
+
+def bump(name, delta=1):
+    updated = DashboardCounter.objects.filter(name=name).update(
+        value=F("value") + delta
+    )
+    if not updated:
+        DashboardCounter.objects.update_or_create(
+            name=name, defaults={"value": COUNTER_MODELS[name].objects.count()}
+        )
+    _invalidate(ADMIN_CACHE_KEY)
+
+
+def admin_dashboard():
+    data = cache.get(ADMIN_CACHE_KEY)
+    if data is None:
+        counters = dict(DashboardCounter.objects.values_list("name", "value"))
+        for name, model in COUNTER_MODELS.items():
+            if name not in counters:
+                counters[name] = model.objects.count()
+                DashboardCounter.objects.update_or_create(
+                    name=name, defaults={"value": counters[name]}
+                )
+        data = _admin_payload(counters)
+        cache.set(ADMIN_CACHE_KEY, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+async def aadmin_dashboard():
+    """
+    admin_dashboard for async views; missing counters are counted
+    concurrently.
+    """
+    data = await cache.aget(ADMIN_CACHE_KEY)
+    if data is None:
+        counters = {
+            name: value
+            async for name, value in DashboardCounter.objects.values_list("name", "value")
+        }
+        missing = [name for name in COUNTER_MODELS if name not in counters]
+        counts = await asyncio.gather(
+            *(COUNTER_MODELS[name].objects.acount() for name in missing)
+        )
+        for name, value in zip(missing, counts):
+            counters[name] = value
+            await DashboardCounter.objects.aupdate_or_create(
+                name=name, defaults={"value": value}
+            )
+        data = _admin_payload(counters)
+        await cache.aset(ADMIN_CACHE_KEY, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def _admin_payload(counters):
+    return {
+        "total_Users": counters["users"],
+        "total_cources": counters["courses"],
+        "total_enrollment": counters["enrollments"],
+    }
+
+
+# Per-sponsor totals
+
+
+def _sponsor_totals(sponsor_id):
+    sponsorships = Sponsorship.objects.filter(sponsor_id=sponsor_id)
+    funding = sponsorships, {"count": Count("id"), "total": Sum("amount")}
+    progress = (
+        Enrollment.objects.filter(student_id__in=sponsorships.values("student_id")),
+        {"total": Sum("progress"), "count": Count("id")},
+    )
+    return funding, progress
+
+
+def _sponsor_defaults(funding, progress):
+    return {
+        "students_funded": funding["count"],
+        "total_funds": funding["total"] or 0,
+        "progress_sum": progress["total"] or 0.0,
+        "enrollment_count": progress["count"],
+    }
+
+
+def rebuild_sponsor(sponsor_id):
+    funding, progress = (
+        queryset.aggregate(**aggregates)
+        for queryset, aggregates in _sponsor_totals(sponsor_id)
+    )
+    stats, _ = SponsorStats.objects.update_or_create(
+        sponsor_id=sponsor_id, defaults=_sponsor_defaults(funding, progress)
+    )
+    _invalidate(sponsor_cache_key(sponsor_id))
+    return stats
+
+
+async def arebuild_sponsor(sponsor_id):
+    # The funding and progress aggregates run concurrently.
+    funding, progress = await asyncio.gather(
+        *(
+            queryset.aaggregate(**aggregates)
+            for queryset, aggregates in _sponsor_totals(sponsor_id)
+        )
+    )
+    stats, _ = await SponsorStats.objects.aupdate_or_create(
+        sponsor_id=sponsor_id, defaults=_sponsor_defaults(funding, progress)
+    )
+    await cache.adelete(sponsor_cache_key(sponsor_id))
+    return stats
+
+
+def _update_sponsors(sponsor_ids, **changes):
+    # Sponsors without a SponsorStats row yet are skipped; the row is
+    # rebuilt from the tables the first time their dashboard is read.
+    expressions = {field: F(field) + delta for field, delta in changes.items()}
+    SponsorStats.objects.filter(sponsor_id__in=sponsor_ids).update(**expressions)
+    for sponsor_id in sponsor_ids:
+        _invalidate(sponsor_cache_key(sponsor_id))
+
+
+def apply_progress_deltas(deltas):
+    """
+    Apply enrollment progress changes to the sponsors of each student.
+
+    ``deltas`` maps student_id -> (progress_delta, enrollment_count_delta).
+    """
+    deltas = {
+        student_id: delta for student_id, delta in deltas.items() if any(delta)
+    }
+    if not deltas:
+        return
+    per_sponsor = defaultdict(lambda: [0.0, 0])
+    pairs = (
+        Sponsorship.objects.filter(student_id__in=deltas)
+        .values_list("sponsor_id", "student_id")
+        .distinct()
+    )
+    for sponsor_id, student_id in pairs:
+        per_sponsor[sponsor_id][0] += deltas[student_id][0]
+        per_sponsor[sponsor_id][1] += deltas[student_id][1]
+    for sponsor_id, (progress, count) in per_sponsor.items():
+        _update_sponsors(
+            [sponsor_id], progress_sum=progress, enrollment_count=count
+        )
+
+
+def _student_progress(student_id):
+    totals = Enrollment.objects.filter(student_id=student_id).aggregate(
+        total=Sum("progress"), count=Count("id")
+    )
+    return totals["total"] or 0.0, totals["count"]
+
+
+def sponsor_dashboard(sponsor_id):
+    key = sponsor_cache_key(sponsor_id)
+    data = cache.get(key)
+    if data is None:
+        stats = SponsorStats.objects.filter(sponsor_id=sponsor_id).first()
+        if stats is None:
+            stats = rebuild_sponsor(sponsor_id)
+        data = _sponsor_payload(stats)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+async def asponsor_dashboard(sponsor_id):
+    key = sponsor_cache_key(sponsor_id)
+    data = await cache.aget(key)
+    if data is None:
+        stats = await SponsorStats.objects.filter(sponsor_id=sponsor_id).afirst()
+        if stats is None:
+            stats = await arebuild_sponsor(sponsor_id)
+        data = _sponsor_payload(stats)
+        await cache.aset(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def _sponsor_payload(stats):
+    return {
+        "total_student_funded": stats.students_funded,
+        "total_funds": stats.total_funds,
+        "avg_progress": stats.avg_progress,
+    }
+
+
+def rebuild_stats():
+    for name, model in COUNTER_MODELS.items():
+        DashboardCounter.objects.update_or_create(
+            name=name, defaults={"value": model.objects.count()}
+        )
+    _invalidate(ADMIN_CACHE_KEY)
+    sponsor_ids = Sponsorship.objects.values_list("sponsor_id", flat=True).distinct()
+    for sponsor_id in sponsor_ids.iterator():
+        rebuild_sponsor(sponsor_id)
+
+
+# Signal handlers
+
+
+@receiver(post_init, sender=Enrollment)
+@receiver(post_init, sender=Sponsorship)
+def remember_loaded_values(sender, instance, **kwargs):
+    # Deferred fields are missing from __dict__; treat them as unknown.
+    instance._stats_loaded = {
+        field: instance.__dict__.get(field)
+        for field in ("student_id", "sponsor_id", "progress", "amount")
+    }
+
+
+def remember_refreshed_values(instance, fields=None):
+    """
+    Called by refresh_from_db(), which reloads fields without post_init.
+    """
+    loaded = getattr(instance, "_stats_loaded", None)
+    if loaded is None:
+        return
+    for field in loaded:
+        if fields is None or field in fields or field.removesuffix("_id") in fields:
+            loaded[field] = instance.__dict__.get(field)
+
+
+def _loaded(instance, field):
+    return getattr(instance, "_stats_loaded", {}).get(field)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Course)
+def count_created(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        bump("users" if sender is User else "courses")
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Course)
+def count_deleted(sender, instance, **kwargs):
+    bump("users" if sender is User else "courses", -1)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, **kwargs):
+    if kwargs.get("raw"):
+        return
+    old_student = _loaded(instance, "student_id")
+    old_progress = _loaded(instance, "progress")
+    if created:
+        bump("enrollments")
+        apply_progress_deltas({instance.student_id: (instance.progress, 1)})
+    elif old_student is None or old_progress is None:
+        # Loaded with deferred fields: we can't tell what changed.
+        for sponsor_id in _sponsor_ids(instance.student_id):
+            rebuild_sponsor(sponsor_id)
+    elif old_student != instance.student_id:
+        apply_progress_deltas({
+            old_student: (-old_progress, -1),
+            instance.student_id: (instance.progress, 1),
+        })
+    elif old_progress != instance.progress:
+        apply_progress_deltas(
+            {instance.student_id: (instance.progress - old_progress, 0)}
+        )
+    remember_loaded_values(sender, instance)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    bump("enrollments", -1)
+    progress = instance.__dict__.get("progress")
+    if progress is None:
+        for sponsor_id in _sponsor_ids(instance.student_id):
+            rebuild_sponsor(sponsor_id)
+    else:
+        apply_progress_deltas({instance.student_id: (-progress, -1)})
+
+
+@receiver(post_save, sender=Sponsorship)
+def sponsorship_saved(sender, instance, created, **kwargs):
+    if kwargs.get("raw"):
+        return
+    old = getattr(instance, "_stats_loaded", {})
+    if created:
+        _add_sponsorship(instance.sponsor_id, instance.student_id, instance.amount)
+    elif None in (old.get("sponsor_id"), old.get("student_id"), old.get("amount")):
+        rebuild_sponsor(instance.sponsor_id)
+    elif (old["sponsor_id"], old["student_id"]) != (
+        instance.sponsor_id,
+        instance.student_id,
+    ):
+        rebuild_sponsor(old["sponsor_id"])
+        rebuild_sponsor(instance.sponsor_id)
+    elif old["amount"] != instance.amount:
+        _update_sponsors(
+            [instance.sponsor_id], total_funds=instance.amount - old["amount"]
+        )
+    remember_loaded_values(sender, instance)
+
+
+@receiver(post_delete, sender=Sponsorship)
+def sponsorship_deleted(sender, instance, **kwargs):
+    amount = instance.__dict__.get("amount")
+    if amount is None:
+        # Drop the row; it is rebuilt on the next dashboard read.
+        SponsorStats.objects.filter(sponsor_id=instance.sponsor_id).delete()
+        _invalidate(sponsor_cache_key(instance.sponsor_id))
+        return
+    changes = {"students_funded": -1, "total_funds": -amount}
+    if not _sponsors_student(instance.sponsor_id, instance.student_id):
+        progress, count = _student_progress(instance.student_id)
+        changes.update(progress_sum=-progress, enrollment_count=-count)
+    _update_sponsors([instance.sponsor_id], **changes)
+
+
+def _add_sponsorship(sponsor_id, student_id, amount):
+    changes = {"students_funded": 1, "total_funds": amount}
+    if Sponsorship.objects.filter(
+        sponsor_id=sponsor_id, student_id=student_id
+    ).count() == 1:
+        # First sponsorship of this student: their enrollments now count
+        # towards this sponsor's average progress.
+        progress, count = _student_progress(student_id)
+        changes.update(progress_sum=progress, enrollment_count=count)
+    _update_sponsors([sponsor_id], **changes)
+
+
+def _sponsors_student(sponsor_id, student_id):
+    return Sponsorship.objects.filter(
+        sponsor_id=sponsor_id, student_id=student_id
+    ).exists()
+
+
+def _sponsor_ids(student_id):
+    return set(
+        Sponsorship.objects.filter(student_id=student_id).values_list(
+            "sponsor_id", flat=True
+        )
+    )
@@ -0,0 +1,148 @@
+import os
+import re
+
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.negotiation import BaseContentNegotiation
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# Media players send Accept headers like video/* that the JSON renderer
+# can't satisfy; file responses bypass rendering anyway.
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class RangedFileResponse(FileResponse):
+    """
+    FileResponse that starts at ``offset`` and sends ``length`` bytes.
+
+    When the range runs to the end of the file the underlying file object is
+    kept as ``file_to_stream`` so the WSGI server can hand it to
+    ``wsgi.file_wrapper`` (sendfile under gunicorn). Bounded ranges are read
+    in blocks so the whole file is never held in memory.
+    """
+
+    block_size = 64 * 1024
+
+    def __init__(self, *args, offset=0, length=None, **kwargs):
+        self.offset = offset
+        self.length = length
+        super().__init__(*args, **kwargs)
+
+    def _set_streaming_content(self, value):
+        if not hasattr(value, "read"):
+            return super()._set_streaming_content(value)
+
+        value.seek(self.offset)
+        super()._set_streaming_content(value)
+        if self.length is None:
+            return
+
+        available = int(self.headers.get("Content-Length", 0))
+        self.headers["Content-Length"] = str(self.length)
+        if self.length < available:
+            # file_wrapper implementations read to EOF, so only bounded
+            # iteration is safe here.
+            self.file_to_stream = None
+            StreamingHttpResponse._set_streaming_content(
+                self, self._read_range(value)
+            )
+
+    def _read_range(self, filelike):
+        remaining = self.length
+        while remaining > 0:
+            chunk = filelike.read(min(self.block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range_header(header, size):
+    """
+    Return (start, end) for a single ``bytes=`` range, inclusive.
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges) and raises ValueError when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or (last and end < start):
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def serve_file(request, fieldfile):
+    """
+    Serve a FileField's file with Range, ETag and Last-Modified support.
+    """
+    request = getattr(request, "_request", request)
+    storage = fieldfile.storage
+    try:
+        filelike = storage.open(fieldfile.name, "rb")
+    except FileNotFoundError:
+        raise Http404("The video file is missing")
+    try:
+        stat = os.fstat(filelike.fileno())
+        size, mtime = stat.st_size, int(stat.st_mtime)
+    except (AttributeError, OSError):
+        size = storage.size(fieldfile.name)
+        mtime = int(storage.get_modified_time(fieldfile.name).timestamp())
+    etag = '"%x-%x"' % (size, mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if response is not None:
+        filelike.close()
+        return response
+
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if range_header and _if_range_matches(request, etag, mtime):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except ValueError:
+            filelike.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = "bytes */%d" % size
+            return response
+
+    if byte_range is None:
+        response = RangedFileResponse(filelike)
+    else:
+        start, end = byte_range
+        response = RangedFileResponse(
+            filelike, offset=start, length=end - start + 1, status=206
+        )
+        response["Content-Range"] = "bytes %d-%d/%d" % (start, end, size)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    return response
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
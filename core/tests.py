@@ -1,3 +1,1973 @@
-from django.test import TestCase
+import csv
+import datetime
+import gc
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.hashers import check_password
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .models import (
+    Assessment,
+    AssessmentReminder,
+    Course,
+    DashboardCounter,
+    Enrollment,
+    GradebookColumn,
+    ImportJob,
+    Notification,
+    OutgoingEmail,
+    Payment,
+    Sponsorship,
+    SponsorStats,
+    Submission,
+    User,
+    VideoProgress,
+    VideoUpload,
+    Videos,
+)
+from . import (
+    access,
+    authentication,
+    benchmarks,
+    bulk_import,
+    events,
+    gradebook,
+    profiling,
+    response_cache,
+    search,
+    stats,
+    uploads,
+)
+from .async_views import event_stream
+from .mail import queue_mail, send_queued_mail
+from .pagination import (
+    EstimatedCountPaginator,
+    KeysetPagination,
+    LMSPagination,
+    encode_position,
+    estimate_count,
+)
+from .permissions import CanWatchVideo
+from .reminders import send_due_reminders
+from .renderers import FastJSONParser, FastJSONRenderer
+from .seed import seed_database
+from .serializers import (
+    CourseSerializer,
+    PrefetchPlanSerializer,
+    VideoSerializer,
+)
+from .utils import create_notification, create_notifications
+from .views import EnrollmentViewSet
+
+
+def clear_response_cache():
+    cache.clear()
+    response_cache._local.clear()
+
+
+# List endpoints must cost the same number of queries whatever the page
+# size, on both the serializer and the values() path.
+class ListQueryCountTests(TestCase):
+    urls = [
+        "/api/course/",
+        "/api/course/?expand=videos",
+        "/api/videos/",
+        "/api/enrollment/",
+        "/api/assessment/",
+        "/api/submission/",
+        "/api/sponsorship/",
+        "/api/notification/",
+        "/api/payment/",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        sponsor = User.objects.create(email="sponsor@example.com", role="sponsor")
+        for i in range(12):
+            instructor = User.objects.create(
+                email=f"instructor{i}@example.com", role="instructor")
+            student = User.objects.create(email=f"student{i}@example.com", role="student")
+            course = Course.objects.create(
+                title=f"Course {i}", description="d", instructor=instructor,
+                difficulty="beginner")
+            for n in range(2):
+                Videos.objects.create(course=course, title=f"Video {n}", video_file=f"v{i}{n}.mp4")
+            assessment = Assessment.objects.create(
+                course=course, title=f"Quiz {i}", description="d",
+                due_date=datetime.date(2030, 1, 1))
+            Enrollment.objects.create(student=student, course=course)
+            Submission.objects.create(student=student, assessment=assessment, score=50)
+            Sponsorship.objects.create(sponsor=sponsor, student=student, amount=Decimal("10"))
+            Notification.objects.create(user=student, message=f"Notice {i}")
+            Payment.objects.create(
+                sponsor=sponsor, amount=Decimal("5"), transaction_id=f"txn-{i}",
+                status="completed")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def query_count(self, url, page_size):
+        clear_response_cache()
+        with mock.patch.object(LMSPagination, "page_size", page_size), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), page_size)
+        return len(queries)
+
+    def test_constant_queries_per_page(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.query_count(url, 2), self.query_count(url, 10))
+
+    def test_constant_queries_per_page_on_serializer_path(self):
+        with mock.patch.object(PrefetchPlanSerializer, "get_values_plan", return_value=None):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    self.assertEqual(self.query_count(url, 2), self.query_count(url, 10))
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        for i in range(3):
+            course = Course.objects.create(
+                title=f"Course {i}", description="d", instructor=instructor,
+                difficulty="beginner")
+            Videos.objects.create(course=course, title="Intro", video_file=f"intro{i}.mp4")
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_fields_match_the_full_output(self):
+        full = self.client.get("/api/course/").data["results"]
+        clear_response_cache()
+        sparse = self.client.get("/api/course/?fields=id,title,instructor_email").data["results"]
+        self.assertEqual(
+            [dict(course) for course in sparse],
+            [{name: course[name] for name in ("id", "title", "instructor_email")}
+             for course in full],
+        )
+
+    def test_videos_only_when_expanded(self):
+        results = self.client.get("/api/course/?fields=id,videos").data["results"]
+        self.assertEqual([set(course) for course in results], [{"id"}] * 3)
+        clear_response_cache()
+        results = self.client.get("/api/course/?fields=id&expand=videos").data["results"]
+        self.assertEqual([len(course["videos"]) for course in results], [1, 1, 1])
+        # Nested serializers render all of their own fields.
+        self.assertEqual(results[0]["videos"][0]["title"], "Intro")
+
+    def test_writes_accept_every_field(self):
+        instructor = User.objects.get(role="instructor")
+        response = self.client.post("/api/course/?fields=id", {
+            "title": "New", "description": "Everything", "instructor": instructor.pk,
+            "difficulty": "advanced",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.data), {"id"})
+        course = Course.objects.get(pk=response.data["id"])
+        self.assertEqual(
+            (course.title, course.description, course.difficulty),
+            ("New", "Everything", "advanced"))
+
+        response = self.client.patch(
+            f"/api/course/{course.pk}/?fields=id,title", {"title": "Renamed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dict(response.data), {"id": course.pk, "title": "Renamed"})
+        course.refresh_from_db()
+        self.assertEqual((course.title, course.difficulty), ("Renamed", "advanced"))
+
+    def test_only_requested_columns_are_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/course/?fields=id,title")
+        select = next(q["sql"] for q in queries if 'FROM "core_course"' in q["sql"]
+                      and "COUNT" not in q["sql"])
+        self.assertIn('"core_course"."title"', select)
+        self.assertNotIn('"core_course"."description"', select)
+
+    def test_nested_videos_are_prefetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/course/")
+        video_queries = [q for q in queries if 'FROM "core_videos"' in q["sql"]]
+        self.assertEqual(len(video_queries), 1)
+
+
+class VideoStreamTests(TestCase):
+    content = bytes(range(256)) * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.student = User.objects.create(email="student@example.com", role="student")
+        cls.outsider = User.objects.create(email="outsider@example.com", role="student")
+        course = Course.objects.create(
+            title="Python 101", description="d", instructor=cls.instructor,
+            difficulty="beginner")
+        Enrollment.objects.create(student=cls.student, course=course)
+        cls.video = Videos.objects.create(course=course, title="Intro", video_file="intro.mp4")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        with open(os.path.join(media_root, "intro.mp4"), "wb") as f:
+            f.write(self.content)
+        self.url = f"/api/videos/{self.video.pk}/stream/"
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+    def test_ranges(self):
+        size = len(self.content)
+        for header, start, end in (
+            ("bytes=100-199", 100, 199),
+            ("bytes=1000-", 1000, size - 1),
+            ("bytes=-10", size - 10, size - 1),
+            ("bytes=0-999999999", 0, size - 1),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{size}")
+                self.assertEqual(response["Content-Length"], str(end - start + 1))
+                self.assertEqual(
+                    b"".join(response.streaming_content), self.content[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A stale If-Range gets the whole file instead of the range.
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_only_enrolled_students(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_missing_file(self):
+        os.remove(os.path.join(settings.MEDIA_ROOT, "intro.mp4"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class VideoUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(
+            title="Python 101", description="d", instructor=cls.instructor,
+            difficulty="beginner")
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=os.path.join(directory, "media"),
+            VIDEO_UPLOAD_TEMP_DIR=os.path.join(directory, "uploads"),
+        ))
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def start(self, size, chunk_size):
+        response = self.client.post("/api/video-uploads/", {
+            "course": self.course.pk, "title": "Lecture 1", "filename": "C:\\videos\\lecture.mp4",
+            "size": size, "chunk_size": chunk_size,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put_chunk(self, upload_id, index, data, checksum=None):
+        return self.client.put(
+            f"/api/video-uploads/{upload_id}/chunks/{index}/", data,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_start(self):
+        upload = self.start(size=25, chunk_size=10)
+        self.assertEqual(upload["filename"], "lecture.mp4")
+        self.assertEqual((upload["total_chunks"], upload["received_ranges"]), (3, []))
+        self.assertEqual(os.path.getsize(VideoUpload.objects.get().temp_path), 25)
+
+    def test_out_of_order_chunks_resume_and_finalize(self):
+        content = bytes(range(25))
+        upload = self.start(size=25, chunk_size=10)
+        for index in (2, 0):
+            response = self.put_chunk(upload["id"], index, content[index * 10:index * 10 + 10])
+            self.assertEqual(response.status_code, 204)
+
+        # A client resuming after a disconnect asks what is missing.
+        response = self.client.get(f"/api/video-uploads/{upload['id']}/")
+        self.assertEqual(response.data["received_ranges"], [[0, 9], [20, 24]])
+        response = self.client.post(f"/api/video-uploads/{upload['id']}/finalize/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["received_ranges"], [[0, 9], [20, 24]])
+
+        self.assertEqual(self.put_chunk(upload["id"], 1, content[10:20]).status_code, 204)
+        response = self.client.post(f"/api/video-uploads/{upload['id']}/finalize/")
+        self.assertEqual(response.status_code, 201)
+        video = Videos.objects.get(pk=response.data["id"])
+        self.assertEqual((video.course, video.title), (self.course, "Lecture 1"))
+        with video.video_file.open("rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(VideoUpload.objects.get().video, video)
+        self.assertEqual(self.put_chunk(upload["id"], 0, content[:10]).status_code, 409)
+
+    def test_concurrent_finalize_creates_one_video(self):
+        upload = self.start(size=5, chunk_size=10)
+        self.assertEqual(self.put_chunk(upload["id"], 0, b"abcde").status_code, 204)
+        # Both requests loaded the upload before either finalized it.
+        first, second = VideoUpload.objects.get(), VideoUpload.objects.get()
+        video = uploads.finalize(first)
+        self.assertEqual(uploads.finalize(second), video)
+        self.assertEqual(Videos.objects.count(), 1)
+        response = self.client.post(f"/api/video-uploads/{upload['id']}/finalize/")
+        self.assertEqual((response.status_code, response.data["id"]), (201, video.pk))
+
+    def test_size_limit(self):
+        response = self.client.post("/api/video-uploads/", {
+            "course": self.course.pk, "title": "t", "filename": "f.mp4",
+            "size": settings.VIDEO_UPLOAD_MAX_SIZE + 1,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("size", response.data)
+        self.assertFalse(VideoUpload.objects.exists())
+
+    def test_bad_chunks_are_rejected(self):
+        upload = self.start(size=25, chunk_size=10)
+        response = self.put_chunk(upload["id"], 0, b"x" * 10, checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Checksum mismatch", response.data["error"])
+        self.assertEqual(self.put_chunk(upload["id"], 0, b"x" * 9).status_code, 400)
+        self.assertEqual(self.put_chunk(upload["id"], 3, b"x" * 5).status_code, 400)
+        response = self.client.get(f"/api/video-uploads/{upload['id']}/")
+        self.assertEqual(response.data["received_ranges"], [])
+
+    def test_only_the_course_instructor(self):
+        student = User.objects.create(email="student@example.com", role="student")
+        self.client.force_authenticate(student)
+        response = self.client.post("/api/video-uploads/", {
+            "course": self.course.pk, "title": "t", "filename": "f.mp4", "size": 1,
+        }, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        other = User.objects.create(email="other@example.com", role="instructor")
+        self.client.force_authenticate(other)
+        response = self.client.post("/api/video-uploads/", {
+            "course": self.course.pk, "title": "t", "filename": "f.mp4", "size": 1,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("course", response.data)
+
+    def test_large_upload_memory_is_bounded(self):
+        chunk_size = 1024 * 1024
+        chunks = 64
+        upload = self.start(size=chunk_size * chunks, chunk_size=chunk_size)
+        tracemalloc.start()
+        try:
+            for index in range(chunks):
+                data = bytes([index]) * chunk_size
+                self.assertEqual(self.put_chunk(upload["id"], index, data).status_code, 204)
+                del data
+                # The test client's request objects are freed by the cycle
+                # collector; don't count them.
+                gc.collect()
+            response = self.client.post(f"/api/video-uploads/{upload['id']}/finalize/")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Videos.objects.get(pk=response.data["id"]).video_file.size, chunk_size * chunks)
+        # A couple of copies of one chunk in the test client and request,
+        # never the 64 MiB file.
+        self.assertLess(peak, 4 * chunk_size)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class AssessmentCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(instructor=instructor, title="Django")
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create(self):
+        return self.client.post("/api/assessment/", {
+            "course": self.course.pk, "title": "Quiz 1",
+            "description": "Models", "due_date": "2030-01-01",
+        }, format="json")
+
+    def test_notifies_and_emails_enrolled_students(self):
+        students = [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(3)
+        ]
+        for student in students:
+            Enrollment.objects.create(student=student, course=self.course)
+
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["assessment"]["title"], "Quiz 1")
+        self.assertTrue(Assessment.objects.filter(title="Quiz 1").exists())
+        self.assertEqual(
+            Notification.objects.filter(message__startswith="New Assessment: Quiz 1").count(), 3)
+        # Nothing is sent during the request; the outbox worker sends it.
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(send_queued_mail(), 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [student.email for student in students],
+        )
+        self.assertEqual({message.subject for message in mail.outbox}, {"New Assessment: Quiz 1"})
+
+    def test_created_without_any_recipients(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Assessment.objects.filter(title="Quiz 1").exists())
+        self.assertEqual(send_queued_mail(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_rolled_back_when_notifying_fails(self):
+        student = User.objects.create(email="student@example.com", role="student")
+        Enrollment.objects.create(student=student, course=self.course)
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(self.admin)
+        with mock.patch("core.views.queue_mail", side_effect=RuntimeError):
+            response = client.post("/api/assessment/", {
+                "course": self.course.pk, "title": "Quiz 1",
+                "description": "Models", "due_date": "2030-01-01",
+            }, format="json")
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Assessment.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class SponsorshipCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.sponsor = User.objects.create(email="sponsor@example.com", role="sponsor")
+        cls.student = User.objects.create(email="student@example.com", role="student")
+
+    def setUp(self):
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(self.admin)
+
+    def create(self):
+        return self.client.post("/api/sponsorship/", {
+            "sponsor": self.sponsor.pk, "student": self.student.pk, "amount": "25.00",
+        }, format="json")
+
+    def test_notifies_and_emails_the_sponsor(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sponsorship.objects.get().amount, Decimal("25.00"))
+        self.assertEqual(Notification.objects.get().user, self.sponsor)
+        self.assertEqual(send_queued_mail(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [[self.sponsor.email]])
+
+    def test_sponsor_without_email(self):
+        User.objects.filter(pk=self.sponsor.pk).update(email="")
+        response = self.create()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sponsorship.objects.exists())
+
+    def test_rolled_back_when_queueing_fails(self):
+        with mock.patch("core.views.queue_mail", side_effect=RuntimeError):
+            response = self.create()
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Sponsorship.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class OutboxTests(TestCase):
+    def queue(self, count=1):
+        queue_mail("Hello", "Body", "lms@example.com",
+                   [f"student{i}@example.com" for i in range(count)])
+
+    def test_sends_after_claiming_the_batch(self):
+        self.queue(2)
+        atomic_depth = len(connection.atomic_blocks)
+        seen = []
+
+        def send_messages(backend, messages):
+            # Claimed and committed, and no transaction is open while sending
+            seen.append((
+                list(OutgoingEmail.objects.values_list("status", flat=True)),
+                len(connection.atomic_blocks),
+            ))
+            return len(messages)
+
+        with mock.patch.object(mail.backends.locmem.EmailBackend, "send_messages", send_messages):
+            self.assertEqual(send_queued_mail(), 2)
+        self.assertEqual(seen, [(["sending", "sending"], atomic_depth)] * 2)
+        self.assertEqual(
+            list(OutgoingEmail.objects.values_list("status", "attempts")),
+            [("sent", 1), ("sent", 1)])
+
+    def test_failed_send_is_retried_later(self):
+        self.queue()
+        with mock.patch.object(
+                mail.backends.locmem.EmailBackend, "send_messages", side_effect=OSError("down")):
+            self.assertEqual(send_queued_mail(), 1)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), ("pending", 1, "down"))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(send_queued_mail(), 0)
+
+    def test_abandoned_claims_are_sent(self):
+        self.queue(2)
+        OutgoingEmail.objects.update(status="sending", next_attempt_at=timezone.now())
+        OutgoingEmail.objects.filter(recipient="student1@example.com").update(
+            next_attempt_at=timezone.now() + datetime.timedelta(minutes=5))
+        self.assertEqual(send_queued_mail(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [["student0@example.com"]])
+
+
+class NotificationFanOutTests(TestCase):
+    def students(self, count):
+        return [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(count)
+        ]
+
+    def test_queries_do_not_grow_with_the_audience(self):
+        query_counts = []
+        for count in (3, 30):
+            Notification.objects.all().delete()
+            ids = [student.pk for student in self.students(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(create_notifications(ids, "Hello"), count)
+            query_counts.append(len(queries))
+            self.assertEqual(
+                sorted(Notification.objects.values_list("user_id", flat=True)), sorted(ids))
+            User.objects.filter(pk__in=ids).delete()
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_batches_a_lazy_iterator(self):
+        students = self.students(5)
+        ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        with self.assertNumQueries(4):
+            # One query to read the ids, then one INSERT per batch of two.
+            self.assertEqual(create_notifications(ids.iterator(), "Hello", batch_size=2), 5)
+        self.assertEqual(
+            list(Notification.objects.order_by("user_id").values_list("user_id", "message")),
+            [(student.pk, "Hello") for student in students],
+        )
+
+    def test_accepts_users(self):
+        students = self.students(2)
+        self.assertEqual(create_notifications(students, "Hello"), 2)
+        self.assertEqual(Notification.objects.filter(message="Hello").count(), 2)
+
+
+# The counters kept by the core.stats signal handlers must always equal
+# what rebuild_stats() computes from the tables.
+class DashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.courses = [
+            Course.objects.create(instructor=cls.instructor, title=f"Course {i}")
+            for i in range(2)
+        ]
+        cls.students = [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(3)
+        ]
+        cls.sponsors = [
+            User.objects.create(email=f"sponsor{i}@example.com", username=f"p{i}", role="sponsor")
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        clear_response_cache()
+        # Build the per-sponsor rows so that they are updated incrementally.
+        for sponsor in self.sponsors:
+            stats.sponsor_dashboard(sponsor.pk)
+
+    def snapshot(self):
+        return (
+            dict(DashboardCounter.objects.values_list("name", "value")),
+            {
+                row.sponsor_id: (
+                    row.students_funded, row.total_funds,
+                    round(row.progress_sum, 6), row.enrollment_count,
+                )
+                for row in SponsorStats.objects.all()
+            },
+        )
+
+    def assertConsistent(self):
+        counters, sponsors = self.snapshot()
+        stats.rebuild_stats()
+        rebuilt_counters, rebuilt_sponsors = self.snapshot()
+        self.assertEqual(counters, rebuilt_counters)
+        # Rows dropped by the handlers are rebuilt on the next read.
+        for sponsor_id, row in sponsors.items():
+            self.assertEqual(row, rebuilt_sponsors[sponsor_id])
+
+    def test_counters_follow_every_change(self):
+        first, second, third = self.students
+        sponsor, other_sponsor = self.sponsors
+        enrollment = Enrollment.objects.create(student=first, course=self.courses[0], progress=40)
+        Enrollment.objects.create(student=second, course=self.courses[1], progress=10)
+        self.assertConsistent()
+
+        funding = Sponsorship.objects.create(sponsor=sponsor, student=first, amount=Decimal("100"))
+        Sponsorship.objects.create(sponsor=sponsor, student=first, amount=Decimal("50"))
+        Sponsorship.objects.create(sponsor=other_sponsor, student=second, amount=Decimal("75.50"))
+        self.assertConsistent()
+
+        Enrollment.objects.create(student=first, course=self.courses[1], progress=90)
+        enrollment.progress = 60
+        enrollment.save()
+        self.assertConsistent()
+
+        # A row loaded with deferred fields
+        deferred = Enrollment.objects.only("id").get(pk=enrollment.pk)
+        deferred.progress = 20
+        deferred.save()
+        self.assertConsistent()
+
+        enrollment.refresh_from_db()
+        enrollment.student = second
+        enrollment.save()
+        self.assertConsistent()
+
+        funding.amount = Decimal("125.25")
+        funding.save()
+        funding.sponsor = other_sponsor
+        funding.student = third
+        funding.save()
+        self.assertConsistent()
+
+        funding.delete()
+        Sponsorship.objects.only("id", "sponsor_id").filter(sponsor=sponsor).first().delete()
+        enrollment.delete()
+        self.assertConsistent()
+
+        Course.objects.create(instructor=self.instructor, title="Course 3")
+        second.delete()  # Cascades to enrollments and sponsorships
+        self.courses[0].delete()
+        self.assertConsistent()
+
+    def test_dashboards_read_the_new_totals_after_commit(self):
+        sponsor = self.sponsors[0]
+        Enrollment.objects.create(student=self.students[0], course=self.courses[0], progress=30)
+        stats.admin_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Sponsorship.objects.create(
+                sponsor=sponsor, student=self.students[0], amount=Decimal("20"))
+            Enrollment.objects.create(
+                student=self.students[0], course=self.courses[1], progress=70)
+        self.assertEqual(stats.sponsor_dashboard(sponsor.pk), {
+            "total_student_funded": 1,
+            "total_funds": Decimal("20"),
+            "avg_progress": 50,
+        })
+        self.assertEqual(stats.admin_dashboard()["total_enrollment"], 2)
+
+
+# Each check loads the user afresh, as a new request would.
+@override_settings(ACCESS_CACHE_TIMEOUT=300)
+class AccessCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="student@example.com", role="student")
+        cls.view_course = Permission.objects.get(
+            content_type__app_label="core", codename="view_course")
+
+    def setUp(self):
+        cache.clear()
+
+    def access(self):
+        return access.get_user_access(User.objects.get(pk=self.user.pk))
+
+    def test_cached_across_requests(self):
+        self.assertEqual(self.access().groups, {"student"})
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(access.get_user_access(user).groups, {"student"})
+            self.assertFalse(access.get_user_access(user).has_perms(["core.view_course"]))
+
+    def test_group_membership_change(self):
+        self.assertFalse(self.access().has_role("admin"))
+        admins = Group.objects.create(name="admin")
+        self.user.groups.add(admins)
+        self.assertTrue(self.access().has_role("admin"))
+        admins.user_set.remove(self.user)
+        self.assertFalse(self.access().has_role("admin"))
+        admins.user_set.add(self.user)
+        self.assertTrue(self.access().has_role("admin"))
+        admins.user_set.clear()
+        self.assertFalse(self.access().has_role("admin"))
+
+    def test_role_change(self):
+        self.assertFalse(self.access().has_role("instructor"))
+        self.user.role = "instructor"
+        self.user.save()
+        self.assertTrue(self.access().has_role("instructor"))
+        with override_settings(ROLE_FIELD_IS_AUTHORITATIVE=False):
+            # The role's group was only assigned when the user was created.
+            self.assertFalse(self.access().has_role("instructor"))
+
+    def test_permission_changes(self):
+        self.assertFalse(self.access().has_perms(["core.view_course"]))
+        self.user.user_permissions.add(self.view_course)
+        self.assertTrue(self.access().has_perms(["core.view_course"]))
+        self.user.user_permissions.remove(self.view_course)
+        self.assertFalse(self.access().has_perms(["core.view_course"]))
+
+        students = Group.objects.get(name="student")
+        students.permissions.add(self.view_course)
+        self.assertTrue(self.access().has_perms(["core.view_course"]))
+        students.permissions.clear()
+        self.assertFalse(self.access().has_perms(["core.view_course"]))
+
+    def test_group_deleted(self):
+        self.assertEqual(self.access().groups, {"student"})
+        with override_settings(ROLE_FIELD_IS_AUTHORITATIVE=False):
+            Group.objects.get(name="student").delete()
+            self.assertFalse(self.access().has_role("student"))
+
+    def test_enrollment_change(self):
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        course = Course.objects.create(instructor=instructor, title="Django")
+        video = Videos.objects.create(course=course, title="Intro", video_file="videos/intro.mp4")
+
+        def can_watch():
+            request = mock.Mock(user=User.objects.get(pk=self.user.pk))
+            return CanWatchVideo().has_object_permission(request, None, video)
+
+        self.assertFalse(can_watch())
+        enrollment = Enrollment.objects.create(student=self.user, course=course)
+        self.assertTrue(can_watch())
+        enrollment.delete()
+        self.assertFalse(can_watch())
+
+
+class TokenCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="student@example.com", role="student")
+
+    def setUp(self):
+        cache.clear()
+        authentication._local.clear()
+        self.auth = authentication.CachedTokenAuthentication()
+        self.key = authentication.get_token_key(self.user)
+
+    def authenticate(self, key):
+        return self.auth.authenticate_credentials(key)[0]
+
+    def test_served_from_the_cache(self):
+        self.assertEqual(self.authenticate(self.key).pk, self.user.pk)
+        authentication._local.clear()
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.key)
+        self.assertEqual(user.email, self.user.email)
+        self.assertNotIn("password", user.__dict__)
+
+    def test_deleted_token_is_evicted(self):
+        self.authenticate(self.key)
+        Token.objects.get(key=self.key).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.key)
+
+    def test_rotated_token(self):
+        self.authenticate(self.key)
+        Token.objects.filter(user=self.user).delete()  # Bulk deletes send post_delete too
+        new_key = authentication.get_token_key(self.user)
+        self.assertNotEqual(new_key, self.key)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.key)
+        self.assertEqual(self.authenticate(new_key).pk, self.user.pk)
+
+    def test_user_changes_are_seen(self):
+        self.authenticate(self.key)
+        self.user.email = "renamed@example.com"
+        self.user.save()
+        self.assertEqual(self.authenticate(self.key).email, "renamed@example.com")
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.key)
+
+    def test_async_path_sees_the_eviction(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {self.key}")
+        user, _ = async_to_sync(self.auth.aauthenticate)(request)
+        self.assertEqual(user.pk, self.user.pk)
+        Token.objects.get(key=self.key).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            async_to_sync(self.auth.aauthenticate)(request)
+
+
+@mock.patch.object(KeysetPagination, "page_size", 3)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        for i in range(8):
+            Course.objects.create(instructor=cls.instructor, title=f"Course {i}")
+        # Ties on created_at are broken by id.
+        Course.objects.filter(title__in=["Course 2", "Course 3", "Course 4"]).update(
+            created_at=timezone.now())
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [course["id"] for course in response.data["results"]], response.data
+
+    def expected(self):
+        return list(Course.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def test_walks_every_row_once(self):
+        expected = self.expected()
+        seen = []
+        url = "/api/course/?pagination=keyset"
+        while url:
+            ids, data = self.page(url)
+            seen += ids
+            url = data["next"]
+        self.assertEqual(seen, expected)
+
+    def test_stable_across_inserts_and_deletes(self):
+        expected = self.expected()
+        first, data = self.page("/api/course/?pagination=keyset")
+        # New rows sort before the cursor; a deleted row just disappears.
+        Course.objects.create(instructor=self.instructor, title="New")
+        Course.objects.filter(pk=expected[4]).delete()
+        second, data = self.page(data["next"])
+        self.assertEqual(first + second, expected[:4] + expected[5:7])
+
+        previous, _ = self.page(data["previous"])
+        self.assertEqual(previous, first)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/course/?cursor=bm9wZQ").status_code, 404)
+
+
+@override_settings(PAGINATION_ESTIMATED_COUNT=True, PAGINATION_ESTIMATE_THRESHOLD=100)
+class EstimatedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        for i in range(3):
+            Course.objects.create(instructor=instructor, title=f"Course {i}")
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def count(self):
+        return self.client.get("/api/course/").data["count"]
+
+    def test_counts_where_there_is_no_estimate(self):
+        # SQLite has no planner estimate.
+        self.assertIsNone(estimate_count(Course.objects.all()))
+        self.assertEqual(self.count(), 3)
+
+    def test_counts_below_the_threshold(self):
+        with mock.patch("core.pagination.estimate_count", return_value=99):
+            self.assertEqual(self.count(), 3)
+
+    def test_uses_the_estimate_above_the_threshold(self):
+        with mock.patch("core.pagination.estimate_count", return_value=5000):
+            self.assertEqual(self.count(), 5000)
+            paginator = EstimatedCountPaginator(Course.objects.order_by("pk"), 2)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 5000)
+
+    @override_settings(PAGINATION_ESTIMATED_COUNT=False)
+    def test_disabled(self):
+        with mock.patch("core.pagination.estimate_count", return_value=5000) as estimate:
+            self.assertEqual(self.count(), 3)
+        estimate.assert_not_called()
+
+
+# The hot filters must be served by the indexes added in
+# 0008_hot_filter_indexes; SQLite's plan names the index it uses. (On
+# PostgreSQL the planner prefers sequential scans of these tiny tables.)
+@skipUnless(connection.vendor == "sqlite", "SQLite query plans")
+class HotFilterIndexTests(TestCase):
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_indexes_in_plans(self):
+        user = User(pk=1)
+        for queryset, index in (
+            # Assessment fan-out
+            (Enrollment.objects.filter(course_id=1).values_list("student_id", flat=True),
+             "enrollment_course_idx"),
+            (Enrollment.objects.filter(progress=100), "enrollment_progress_idx"),
+            (Sponsorship.objects.filter(sponsor_id=1, student_id=2), "sponsorship_sponsor_idx"),
+            # Read/unread totals of a user
+            (Notification.objects.filter(user=user).values("is_read")
+             .annotate(total=Count("id")).order_by(), "notification_user_read_idx"),
+            (Notification.objects.filter(user=user, is_read=False).order_by("-created_at"),
+             "notification_unread_idx"),
+            (Payment.objects.filter(status="pending").order_by("-created_at"),
+             "payment_status_created_idx"),
+        ):
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset, index)
+
+    def test_unique_enrollment_lookup(self):
+        # SQLite builds the unique constraint's index itself, under its own name.
+        self.assertUsesIndex(
+            Enrollment.objects.filter(student_id=1, course_id=2),
+            "(student_id=? AND course_id=?)")
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "Full-text index")
+class CourseSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.instructor = User.objects.create(
+            email="instructor@example.com", username="advancedteacher", role="instructor")
+        other = User.objects.create(
+            email="other@example.com", username="someone", role="instructor")
+        cls.by_title = Course.objects.create(
+            instructor=other, title="Advanced Python", difficulty="beginner")
+        cls.by_difficulty = Course.objects.create(
+            instructor=other, title="Cooking Python", difficulty="advanced")
+        cls.by_instructor = Course.objects.create(
+            instructor=cls.instructor, title="Gardening Python", difficulty="beginner")
+        cls.unrelated = Course.objects.create(
+            instructor=other, title="Statistics", difficulty="intermediate")
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, terms):
+        response = self.client.get("/api/course/", {"search": terms})
+        self.assertEqual(response.status_code, 200)
+        return [course["id"] for course in response.data["results"]]
+
+    def test_ranked_title_then_difficulty_then_instructor(self):
+        self.assertEqual(
+            self.search("advanced"),
+            [self.by_title.pk, self.by_difficulty.pk, self.by_instructor.pk],
+        )
+
+    def test_ranked_results_keep_their_order_under_keyset_requests(self):
+        ranked = [self.by_title.pk, self.by_difficulty.pk, self.by_instructor.pk]
+        for mode in ({"pagination": "keyset"}, {"cursor": encode_position([0])}):
+            with self.subTest(mode=mode):
+                response = self.client.get("/api/course/", {"search": "advanced", **mode})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([course["id"] for course in response.data["results"]], ranked)
+                self.assertEqual(response.data["count"], 3)
+
+        queryset = search.search_courses(Course.objects.all(), "advanced")
+        request = Request(RequestFactory().get("/api/course/"))
+        with self.assertRaises(exceptions.ValidationError):
+            KeysetPagination().paginate_queryset(queryset, request)
+
+    def test_every_term_is_required_as_a_prefix(self):
+        self.assertEqual(self.search("pyth cook"), [self.by_difficulty.pk])
+        self.assertEqual(self.search("statis"), [self.unrelated.pk])
+        self.assertEqual(self.search("python chemistry"), [])
+        # Punctuation is not a query
+        self.assertEqual(self.search('"*'), [])
+
+    def test_index_follows_changes(self):
+        self.unrelated.title = "Gardening"
+        self.unrelated.save()
+        self.assertEqual(self.search("statistics"), [])
+        self.assertEqual(self.search("gardening"), [self.unrelated.pk, self.by_instructor.pk])
+
+        self.instructor.username = "renamed"
+        self.instructor.save()
+        self.assertEqual(self.search("advancedteacher"), [])
+        self.assertEqual(self.search("renamed"), [self.by_instructor.pk])
+
+        self.by_title.delete()
+        self.assertEqual(self.search("advanced"), [self.by_difficulty.pk])
+
+    def test_fallback_without_an_index(self):
+        with mock.patch.object(search, "backend", return_value=None):
+            # icontains, which also matches inside words
+            self.assertEqual(self.search("ook"), [self.by_difficulty.pk])
+
+
+@override_settings(
+    IMPORT_HASH_WORKERS=1,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(instructor=instructor, title="Django")
+        cls.existing = User.objects.create(
+            email="existing@example.com", username="existing", role="student")
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(MEDIA_ROOT=directory))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def queue(self, content, name="users.csv"):
+        response = self.client.post(
+            "/bulk_import/", {"file": SimpleUploadedFile(name, content)},
+            format="multipart")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status_url"], response["Location"])
+        return response
+
+    def upload(self, content, name="users.csv"):
+        response = self.queue(content.encode(), name)
+        bulk_import.run_next_import()
+        job = self.client.get(response["Location"]).data
+        self.assertEqual(job["status"], "done")
+        return job["result"]
+
+    def test_valid_csv(self):
+        result = self.upload(
+            "email,username,role,password,course,progress\n"
+            f"ann@example.com,ann,student,s3cret,{self.course.pk},25\n"
+            "bob@example.com,bob,instructor,pa55,,\n"
+            f"existing@example.com,,,,{self.course.pk},\n"
+        )
+        self.assertEqual(result, {
+            "rows": 3, "created_users": 2, "created_enrollments": 2,
+            "error_count": 0, "errors": [],
+        })
+        ann = User.objects.get(email="ann@example.com")
+        self.assertTrue(check_password("s3cret", ann.password))
+        self.assertEqual(set(ann.groups.values_list("name", flat=True)), {"student"})
+        self.assertEqual(User.objects.get(email="bob@example.com").role, "instructor")
+        self.assertEqual(
+            set(Enrollment.objects.values_list("student__email", "progress")),
+            {("ann@example.com", 25.0), ("existing@example.com", 0.0)},
+        )
+        self.assertEqual(
+            stats.admin_dashboard(),
+            {"total_Users": 5, "total_cources": 1, "total_enrollment": 2},
+        )
+
+    def test_row_errors(self):
+        result = self.upload(
+            '{"email": "ann@example.com", "username": "ann", "password": "x"}\n'
+            "not json\n"
+            '{"email": "not-an-email", "role": "teacher", "course": "abc"}\n'
+            '{"email": "cy@example.com", "course": 999999}\n'
+            f'{{"email": "dee@example.com", "role": "sponsor", "course": {self.course.pk}}}\n',
+            name="users.ndjson",
+        )
+        self.assertEqual(result["rows"], 5)
+        self.assertEqual(result["created_users"], 1)
+        self.assertEqual(result["error_count"], 4)
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3, 4, 5])
+        errors = {error["row"]: error["errors"] for error in result["errors"]}
+        self.assertIn("Invalid JSON", errors[2]["non_field_errors"])
+        self.assertEqual(set(errors[3]), {"email", "role", "course"})
+        self.assertEqual(errors[4], {"course": "Course does not exist."})
+        self.assertEqual(errors[5], {"course": "Only students can be enrolled."})
+        self.assertFalse(User.objects.filter(email__in=["cy@example.com", "dee@example.com"]).exists())
+
+    def test_duplicates_and_reimport(self):
+        content = (
+            "email,username,password,course\n"
+            f"ann@example.com,ann,s3cret,{self.course.pk}\n"
+            f"ann@example.com,ann,s3cret,{self.course.pk}\n"
+            "existing@example.com,existing,pw,\n"
+        )
+        result = self.upload(content)
+        self.assertEqual((result["created_users"], result["created_enrollments"]), (1, 1))
+        self.assertEqual(result["errors"], [
+            {"row": 3, "errors": {"course": "Already enrolled in this course."}},
+            {"row": 4, "errors": {"email": "A user with this email already exists."}},
+        ])
+
+        # Importing the same file again changes nothing.
+        result = self.upload(content)
+        self.assertEqual((result["created_users"], result["created_enrollments"]), (0, 0))
+        self.assertEqual(result["error_count"], 3)
+        self.assertEqual(User.objects.filter(email="ann@example.com").count(), 1)
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_admins_only(self):
+        self.client.force_authenticate(self.existing)
+        response = self.client.post(
+            "/bulk_import/", {"file": SimpleUploadedFile("users.csv", b"email\n")},
+            format="multipart")
+        self.assertEqual(response.status_code, 403)
+
+    def test_queued_until_a_worker_runs(self):
+        response = self.queue(b"email,password\nann@example.com,s3cret\n")
+        self.assertEqual(self.client.get(response["Location"]).data["status"], "queued")
+        self.assertFalse(User.objects.filter(email="ann@example.com").exists())
+
+        job = bulk_import.run_next_import()
+        self.assertEqual((job.pk, job.status), (response.data["id"], "done"))
+        self.assertTrue(User.objects.filter(email="ann@example.com").exists())
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, "imports")), [])
+        self.assertIsNone(bulk_import.run_next_import())
+
+    def test_failed_job(self):
+        response = self.queue(b"email\n\xff\xfe\n")
+        self.assertEqual(bulk_import.run_next_import().status, "failed")
+        job = self.client.get(response["Location"]).data
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("utf-8", job["error"])
+
+    def test_abandoned_job_runs_again(self):
+        response = self.queue(b"email\nann@example.com\n")
+        ImportJob.objects.update(status="running", started_at=timezone.now())
+        self.assertIsNone(bulk_import.run_next_import())
+        ImportJob.objects.update(
+            started_at=timezone.now() - datetime.timedelta(seconds=settings.IMPORT_JOB_TIMEOUT))
+        self.assertEqual(bulk_import.run_next_import().pk, response.data["id"])
+
+    def test_command_imports_directly(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("email,password\nann@example.com,s3cret\n")
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        call_command("bulk_import", f.name, workers=1, stdout=out)
+        self.assertIn("1 users", out.getvalue())
+        self.assertTrue(User.objects.filter(email="ann@example.com").exists())
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_worker_pool(self):
+        passwords = ["one", "two", "three"]
+        with mock.patch.object(bulk_import, "_hash_pool") as pool:
+            pool.return_value.map.side_effect = lambda function, items, chunksize: map(function, items)
+            hashes = bulk_import.hash_passwords(passwords, workers=2)
+        pool.assert_called_once_with(2)
+        self.assertTrue(all(map(check_password, passwords, hashes)))
+        with mock.patch.object(bulk_import, "_hash_pool") as pool:
+            bulk_import.hash_passwords(passwords, workers=1)
+        pool.assert_not_called()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        other_instructor = User.objects.create(email="other@example.com", role="instructor")
+        cls.course = Course.objects.create(instructor=cls.instructor, title="Django")
+        other_course = Course.objects.create(instructor=other_instructor, title="SQL")
+        cls.students = [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(3)
+        ]
+        cls.enrollments = [
+            Enrollment.objects.create(student=student, course=cls.course, progress=10 * i)
+            for i, student in enumerate(cls.students)
+        ]
+        Enrollment.objects.create(student=cls.students[0], course=other_course, progress=100)
+        cls.sponsor = User.objects.create(email="sponsor@example.com", role="sponsor")
+        other_sponsor = User.objects.create(email="sponsor2@example.com", role="sponsor")
+        cls.payments = [
+            Payment.objects.create(
+                sponsor=sponsor, amount=Decimal("10.50"), transaction_id=f"t{i}", status=status)
+            for i, (sponsor, status) in enumerate([
+                (cls.sponsor, "pending"), (cls.sponsor, "completed"), (other_sponsor, "pending"),
+            ])
+        ]
+        for role, models in (
+            ("student", ["enrollment"]), ("instructor", ["enrollment"]), ("sponsor", ["payment"]),
+        ):
+            Group.objects.get(name=role).permissions.add(*Permission.objects.filter(
+                content_type__app_label="core", codename__in=[f"view_{m}" for m in models]))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def export(self, url, user=None):
+        self.client.force_authenticate(user or self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export("/api/enrollment/export/"))))
+        self.assertEqual(rows[0], [
+            "id", "student_id", "student_email", "course_id", "course_title",
+            "enrolled_at", "progress",
+        ])
+        first = self.enrollments[0]
+        self.assertEqual(rows[1], [
+            str(first.pk), str(first.student_id), "student0@example.com", str(self.course.pk),
+            "Django", first.enrolled_at.isoformat(), "0.0",
+        ])
+        self.assertEqual(len(rows), 5)
+
+    def test_ndjson_and_filters(self):
+        lines = self.export("/api/payment/export/?file_format=ndjson&status=pending").splitlines()
+        self.assertEqual([json.loads(line)["transaction_id"] for line in lines], ["t0", "t2"])
+        self.assertEqual(json.loads(lines[0])["amount"], "10.50")
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get("/api/payment/export/?file_format=xml").status_code, 400)
+
+    def test_rows_are_scoped_to_the_user(self):
+        student = self.students[1]
+        rows = list(csv.DictReader(io.StringIO(self.export("/api/enrollment/export/", student))))
+        self.assertEqual([row["student_email"] for row in rows], [student.email])
+
+        rows = list(csv.DictReader(
+            io.StringIO(self.export("/api/enrollment/export/", self.instructor))))
+        self.assertEqual({row["course_title"] for row in rows}, {"Django"})
+        self.assertEqual(len(rows), 3)
+
+        rows = list(csv.DictReader(io.StringIO(self.export("/api/payment/export/", self.sponsor))))
+        self.assertEqual([row["transaction_id"] for row in rows], ["t0", "t1"])
+
+        # Roles without an owner lookup export nothing.
+        with mock.patch.dict(EnrollmentViewSet.export_owner_lookups, clear=True):
+            self.assertEqual(self.export("/api/enrollment/export/", student).splitlines(), [
+                "id,student_id,student_email,course_id,course_title,enrolled_at,progress",
+            ])
+
+    def measure(self, url):
+        self.client.force_authenticate(self.admin)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            response = self.client.get(url)
+            rows = 0
+            for chunk in response.streaming_content:
+                rows += chunk.count(b"\n")
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return rows - 1, peak
+
+    @override_settings(EXPORT_CHUNK_SIZE=500)
+    def test_memory_stays_flat(self):
+        User.objects.bulk_create(
+            User(email=f"bulk{i}@example.com", username=f"bulk{i}", role="student")
+            for i in range(200)
+        )
+        Course.objects.bulk_create(
+            Course(instructor=self.instructor, title=f"Course {i}") for i in range(100))
+        courses = Course.objects.filter(title__startswith="Course ").values_list("pk", flat=True)
+        Enrollment.objects.bulk_create(
+            # 4,000 rows with progress 1, 16,000 with progress 2
+            Enrollment(student_id=student_id, course_id=course_id, progress=1 + (n >= 20))
+            for student_id in User.objects.filter(
+                email__startswith="bulk").values_list("pk", flat=True)
+            for n, course_id in enumerate(courses)
+        )
+        small = self.measure("/api/enrollment/export/?progress=1")
+        large = self.measure("/api/enrollment/export/?progress=2")
+        self.assertEqual((small[0], large[0]), (4000, 16000))
+        # Four times the rows in about the same memory
+        self.assertLess(large[1], small[1] * 1.5)
+
+    def test_bench_export_command(self):
+        # manage.py bench_export runs the same check at 1M rows (the default).
+        out = io.StringIO()
+        call_command("bench_export", rows=5000, max_peak_mb=8, stdout=out)
+        # The seeded rows plus the four enrollments above
+        self.assertIn("5,004 rows", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "Peak memory"):
+            call_command("bench_export", rows=100, max_peak_mb=0.01, stdout=io.StringIO())
+
+
+# FastJSONRenderer must produce byte for byte what JSONRenderer produces.
+class RendererParityTests(TestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimals(self):
+        for value in (
+            Decimal("0"), Decimal("10.50"), Decimal("-0.00"), Decimal("1E+3"),
+            Decimal("12345678901234567890.123456789"), Decimal("0.000001"),
+        ):
+            with self.subTest(value=value):
+                self.assertSameBytes({"amount": value, "list": [value]})
+
+    def test_floats(self):
+        for value in (0.1, 1e-4, 1e-5, -2.5e-7, 1e15, 1e16, 1.5e300, 123456.789):
+            with self.subTest(value=value):
+                self.assertSameBytes({"score": value, "note": "3e4"})
+
+    def test_datetimes(self):
+        aware = datetime.datetime(2026, 3, 4, 5, 6, 7, 891234, tzinfo=datetime.timezone.utc)
+        offset = aware.astimezone(datetime.timezone(datetime.timedelta(hours=5, minutes=45)))
+        for value in (
+            aware, aware.replace(microsecond=0), offset, aware.replace(tzinfo=None),
+            aware.date(), aware.time(), aware.time().replace(microsecond=0),
+            datetime.timedelta(days=1, seconds=3.5), timezone.now(),
+        ):
+            with self.subTest(value=value):
+                self.assertSameBytes({"at": value})
+
+    def test_other_values(self):
+        self.assertSameBytes({
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "lazy": gettext_lazy("Invalid token."),
+            "text": "Ïnstructor \u2028 \u2029 </script>",
+            "numbers": [0, -1, 1.5, 2**63 - 1, True, None],
+            1: "integer key",
+            "tuple": (1, 2),
+            "nested": [{"a": {"b": []}}],
+        })
+        # Falls back to JSONRenderer
+        self.assertSameBytes({"big": 2**70})
+        self.assertEqual(FastJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_api_response(self):
+        admin = User.objects.create(email="admin@example.com", role="admin", is_superuser=True)
+        sponsor = User.objects.create(email="sponsor@example.com", role="sponsor")
+        Payment.objects.create(
+            sponsor=sponsor, amount=Decimal("149.99"), transaction_id="t1", status="pending")
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get("/api/payment/")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertIn(b'"amount":"149.99"', response.content)
+
+    def test_parser(self):
+        body = '{"amount": "10.50", "text": "\u00cfnstructor", "n": [1, 2.5]}'.encode()
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            {"amount": "10.50", "text": "Ïnstructor", "n": [1, 2.5]},
+        )
+
+
+# The values() list path must render exactly what the serializers render.
+class ValuesListParityTests(TestCase):
+    urls = [
+        "/api/course/?fields=id,title,created_at,instructor_email",
+        "/api/course/?fields=id,title&search=pyth",
+        "/api/enrollment/",
+        "/api/enrollment/?progress=12.5",
+        "/api/enrollment/?fields=course_title,progress&pagination=keyset",
+        "/api/assessment/",
+        "/api/submission/",
+        "/api/submission/?pagination=keyset",
+        "/api/sponsorship/",
+        "/api/notification/?page=2",
+        "/api/payment/?status=completed",
+        "/api/payment/?fields=amount,sponsor_email,created_at",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(
+            email="instructor@example.com", username="Ïnstructor", role="instructor")
+        sponsor = User.objects.create(email="sponsor@example.com", role="sponsor")
+        students = [
+            User.objects.create(email=f"student{i}@example.com", role="student")
+            for i in range(3)
+        ]
+        courses = [
+            Course.objects.create(
+                title=title, description="…", instructor=instructor,
+                difficulty=difficulty)
+            for title, difficulty in (
+                ("Python 101", "beginner"), ("Python “Advanced”", "advanced"))
+        ]
+        assessment = Assessment.objects.create(
+            course=courses[0], title="Quiz one", description="d",
+            due_date=datetime.date(2030, 1, 31))
+        for i, student in enumerate(students):
+            for course in courses:
+                Enrollment.objects.create(
+                    student=student, course=course, progress=i * 12.5)
+            Submission.objects.create(
+                student=student, assessment=assessment,
+                score=None if i == 0 else i / 3)
+            Sponsorship.objects.create(
+                sponsor=sponsor, student=student, amount=Decimal("1000.05"))
+        for i in range(15):
+            Notification.objects.create(
+                user=students[i % 3], message=f"Notice {i}", is_read=i % 2 == 0)
+        for i, status in enumerate(("pending", "completed", "completed")):
+            Payment.objects.create(
+                sponsor=sponsor, amount=Decimal("19.90") * (i + 1),
+                transaction_id=f"txn-{i}", status=status)
+        # Microsecond precision on a timestamp the serializers format.
+        Payment.objects.filter(transaction_id="txn-1").update(
+            created_at=timezone.now().replace(microsecond=123456))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_values_path_matches_serializer_output(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                clear_response_cache()
+                fast = self.client.get(url)
+                clear_response_cache()
+                with mock.patch.object(
+                        PrefetchPlanSerializer, "get_values_plan", return_value=None):
+                    regular = self.client.get(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(regular.status_code, 200)
+                self.assertEqual(fast.content, regular.content)
+
+    def test_values_path_is_used(self):
+        with mock.patch.object(
+                PrefetchPlanSerializer, "serialize_values",
+                wraps=PrefetchPlanSerializer.serialize_values) as serialize:
+            self.client.get("/api/submission/")
+        self.assertTrue(serialize.called)
+
+    def test_unsupported_fields_fall_back(self):
+        # Nested videos and file fields need model instances.
+        self.assertIsNone(CourseSerializer.get_values_plan())
+        self.assertIsNone(VideoSerializer.get_values_plan())
+        self.assertIsNotNone(CourseSerializer.get_values_plan({"id", "title"}))
+
+
+# The response cache is cleared before each request so that the
+# validators computed by ConditionalGetMixin are what gets checked.
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.instructor = User.objects.create(
+            email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(
+            title="Python 101", description="d", instructor=cls.instructor,
+            difficulty="beginner")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url, **headers):
+        clear_response_cache()
+        return self.client.get(url, **headers)
+
+    def test_not_modified(self):
+        for url in ("/api/course/", f"/api/course/{self.course.pk}/"):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+
+    def test_instructor_email_change(self):
+        for url in ("/api/course/", f"/api/course/{self.course.pk}/"):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                self.instructor.email = f"renamed{len(url)}@example.com"
+                self.instructor.save()
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+                self.assertIn(self.instructor.email.encode(), response.content)
+
+    def test_other_user_fields_keep_the_etag(self):
+        url = f"/api/course/{self.course.pk}/"
+        etag = self.get(url)["ETag"]
+        self.instructor.last_login = timezone.now()
+        self.instructor.save(update_fields=["last_login"])
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_full_save_without_email_change_keeps_the_etag(self):
+        url = f"/api/course/{self.course.pk}/"
+        etag = self.get(url)["ETag"]
+        self.instructor.last_login = timezone.now()
+        self.instructor.set_password("new-password")
+        self.instructor.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_moving_a_video_changes_both_courses(self):
+        other = Course.objects.create(
+            title="Go 101", description="d", instructor=self.instructor,
+            difficulty="beginner")
+        video = Videos.objects.create(
+            course=self.course, title="Intro", video_file="videos/intro.mp4")
+        urls = (f"/api/course/{self.course.pk}/", f"/api/course/{other.pk}/")
+        etags = [self.get(url)["ETag"] for url in urls]
+        video.course = other
+        video.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        cls.instructor = User.objects.create(
+            email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(
+            title="Python 101", description="d", instructor=cls.instructor,
+            difficulty="beginner")
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_hit_skips_the_database(self):
+        first = self.client.get("/api/course/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/course/")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_cached_validators_answer_conditional_requests(self):
+        etag = self.client.get(f"/api/course/{self.course.pk}/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                f"/api/course/{self.course.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_save_invalidates(self):
+        self.client.get("/api/course/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.title = "Python 102"
+            self.course.save()
+        response = self.client.get("/api/course/")
+        self.assertEqual(response.data["results"][0]["title"], "Python 102")
+
+    def test_instructor_email_change_invalidates(self):
+        url = f"/api/course/{self.course.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.instructor.email = "renamed@example.com"
+            self.instructor.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["instructor_email"], "renamed@example.com")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            self.client.get("/api/course/").data["results"][0]["instructor_email"],
+            "renamed@example.com")
+
+    def test_accept_header_is_part_of_the_key(self):
+        url = f"/api/course/{self.course.pk}/"
+        json_etag = self.client.get(url, HTTP_ACCEPT="application/json")["ETag"]
+        html = self.client.get(url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(html.status_code, 200)
+        self.assertTrue(html["Content-Type"].startswith("text/html"))
+        self.assertNotEqual(html["ETag"], json_etag)
+        # Both are cached now, each with its own validators.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(
+                url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=json_etag,
+            ).status_code, 304)
+            self.assertEqual(self.client.get(
+                url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=html["ETag"],
+            ).status_code, 304)
+
+
+class NotificationStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create(email="student@example.com", role="student")
+        cls.other = User.objects.create(email="other@example.com", role="student")
+        cls.old = [
+            Notification.objects.create(user=cls.student, message=f"Notice {i}")
+            for i in range(3)
+        ]
+
+    def test_publishes_after_commit(self):
+        with mock.patch.object(events.LocalBackend, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_notification(self.student, "Hello")
+                self.assertFalse(publish.called)
+        notification = Notification.objects.latest("id")
+        publish.assert_called_once_with([notification.pk])
+
+    async def test_resumes_then_streams_live(self):
+        stream = event_stream(self.student.pk, self.old[0].pk)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        for notification in self.old[1:]:
+            self.assertTrue(
+                (await anext(stream)).startswith(b"id: %d\n" % notification.pk))
+
+        live = await Notification.objects.acreate(user=self.student, message="Live")
+        ignored = await Notification.objects.acreate(user=self.other, message="Other")
+        await sync_to_async(events.hub.dispatch)([ignored.pk, live.pk])
+        message = await anext(stream)
+        self.assertTrue(message.startswith(b"id: %d\n" % live.pk))
+        self.assertIn(b'"message":"Live"', message)
+        await stream.aclose()
+        self.assertNotIn(self.student.pk, events.hub.user_ids())
+
+    @override_settings(NOTIFICATION_STREAM_QUEUE_SIZE=2)
+    async def test_slow_client_is_dropped(self):
+        stream = event_stream(self.student.pk, None)
+        await anext(stream)
+        rows = await sync_to_async(list)(
+            events.notification_rows(Notification.objects.filter(user=self.student)))
+        await sync_to_async(events.hub.deliver)(rows)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertNotIn(self.student.pk, events.hub.user_ids())
+
+
+@override_settings(PROGRESS_FLUSH_INTERVAL=0)
+class ProgressIngestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.student = User.objects.create(
+            email="student@example.com", username="student", role="student")
+        cls.course = Course.objects.create(
+            title="Python 101", description="d", instructor=instructor,
+            difficulty="beginner")
+        cls.videos = [
+            Videos.objects.create(course=cls.course, title=f"Part {i}", video_file="videos/a.mp4")
+            for i in range(2)
+        ]
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=cls.course)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post(self, *events):
+        return self.client.post("/progress/", {"events": [
+            {"enrollment": self.enrollment.pk, "video": video.pk,
+             "position": position, "duration": 600}
+            for video, position in events
+        ]}, format="json")
+
+    def test_rolls_up_and_never_regresses(self):
+        response = self.post((self.videos[0], 300), (self.videos[0], 600), (self.videos[1], 150))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["accepted"], 3)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, 62.5)
+
+        # A late event for an earlier position changes nothing.
+        self.post((self.videos[0], 60))
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, 62.5)
+        self.assertEqual(VideoProgress.objects.get(video=self.videos[0]).watched, 1.0)
+
+    def test_rejects_other_students_enrollments(self):
+        other = User.objects.create(email="other@example.com", role="student")
+        self.client.force_authenticate(other)
+        response = self.post((self.videos[0], 600))
+        self.assertEqual(response.data["accepted"], 0)
+        self.assertEqual(response.data["errors"][0]["index"], 0)
+        self.assertFalse(VideoProgress.objects.exists())
+
+
+class GradebookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        cls.course = Course.objects.create(
+            title="Python 101", description="d", instructor=cls.instructor,
+            difficulty="beginner")
+        cls.assessments = [
+            Assessment.objects.create(
+                course=cls.course, title=f"Quiz {i}", description="d",
+                due_date=datetime.date(2030, 1, 10))
+            for i in range(2)
+        ]
+        cls.students = [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(4)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, course=cls.course)
+        due = datetime.datetime(2030, 1, 10, 12, tzinfo=datetime.timezone.utc)
+        for student, score, days_late in zip(cls.students[:3], (40, 80, None), (0, 1, 0)):
+            submission = Submission.objects.create(
+                student=student, assessment=cls.assessments[0], score=score)
+            Submission.objects.filter(pk=submission.pk).update(
+                submitted_at=due + datetime.timedelta(days=days_late))
+
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def test_course_gradebook(self):
+        response = self.client.get(f"/api/course/{self.course.pk}/gradebook/?bins=2")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([s["id"] for s in data["students"]], [s.pk for s in self.students])
+        self.assertEqual(data["scores"], [[40.0, None], [80.0, None], [None, None], [None, None]])
+        first, second = data["assessments"]
+        self.assertEqual(
+            (first["submitted"], first["scored"], first["late"]), (3, 2, 1))
+        self.assertEqual((first["mean"], first["median"]), (60.0, 60.0))
+        self.assertEqual(first["histogram"], [1, 1])
+        self.assertEqual(data["histogram_edges"], [40.0, 60.0, 80.0])
+        self.assertEqual((second["submitted"], second["mean"]), (0, None))
+
+    def test_cached_until_a_submission_arrives(self):
+        url = f"/api/assessment/{self.assessments[1].pk}/gradebook/"
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Submission.objects.create(
+                student=self.students[3], assessment=self.assessments[1], score=75)
+        data = self.client.get(url).json()
+        self.assertEqual(data["assessments"][0]["mean"], 75.0)
+
+    def test_only_instructor_and_admins(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get(f"/api/course/{self.course.pk}/gradebook/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_rebuild_reads_the_packed_columns(self):
+        first = gradebook.gradebook(self.course.pk)
+        self.assertEqual(GradebookColumn.objects.count(), 2)
+        with mock.patch.object(
+                gradebook, "_fetch_columns", wraps=gradebook._fetch_columns) as fetch:
+            self.assertEqual(gradebook.gradebook(self.course.pk), first)
+        fetch.assert_not_called()
+
+    def test_outdated_columns_are_rebuilt(self):
+        gradebook.gradebook(self.course.pk)
+        submission = Submission.objects.get(student=self.students[0])
+        submission.score = 60
+        submission.save()
+        self.assertEqual(gradebook.gradebook(self.course.pk)["scores"][0][0], 60.0)
+        # Deletes send no signal; the submission count gives them away.
+        Submission.objects.filter(student=self.students[1]).delete()
+        data = gradebook.gradebook(self.course.pk)
+        self.assertEqual(data["scores"][1], [None, None])
+        self.assertEqual(data["assessments"][0]["submitted"], 2)
+
+
+class DueReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        course = Course.objects.create(
+            title="Python 101", description="d", instructor=instructor, difficulty="beginner")
+        cls.today = datetime.date(2030, 1, 1)
+        cls.next_week, cls.tomorrow = (
+            Assessment.objects.create(
+                course=course, title=title, description="d",
+                due_date=cls.today + datetime.timedelta(days=days))
+            for title, days in (("Project", 5), ("Quiz", 1))
+        )
+        Assessment.objects.create(
+            course=course, title="Exam", description="d",
+            due_date=cls.today + datetime.timedelta(days=30))
+        cls.students = [
+            User.objects.create(email=f"student{i}@example.com", username=f"s{i}", role="student")
+            for i in range(3)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, course=course)
+        Submission.objects.create(student=cls.students[0], assessment=cls.tomorrow)
+
+    def test_reminds_students_who_have_not_submitted(self):
+        sent = send_due_reminders(windows=(7, 1), today=self.today, batch_size=2)
+        self.assertEqual(sent, {1: 2, 7: 3})
+        self.assertEqual(
+            set(AssessmentReminder.objects.values_list("assessment_id", "student_id", "window")),
+            {(self.tomorrow.pk, s.pk, 1) for s in self.students[1:]}
+            | {(self.next_week.pk, s.pk, 7) for s in self.students},
+        )
+        self.assertEqual(
+            list(Notification.objects.filter(user=self.students[1]).order_by("id")
+                 .values_list("message", flat=True)),
+            ["Reminder: Quiz is due tomorrow (2030-01-02)",
+             "Reminder: Project is due in 5 days (2030-01-06)"],
+        )
+
+    def test_rerun_sends_nothing(self):
+        send_due_reminders(windows=(7, 1), today=self.today)
+        with self.assertNumQueries(2):
+            sent = send_due_reminders(windows=(7, 1), today=self.today)
+        self.assertEqual(sent, {1: 0, 7: 0})
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_smaller_window_reminds_again(self):
+        send_due_reminders(windows=(7, 1), today=self.today)
+        later = self.today + datetime.timedelta(days=4)
+        self.assertEqual(send_due_reminders(windows=(7, 1), today=later), {1: 3, 7: 0})
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_REQUEST_SECONDS=0)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com", role="admin", is_superuser=True)
+        instructor = User.objects.create(email="instructor@example.com", role="instructor")
+        Course.objects.create(
+            title="Python 101", description="d", instructor=instructor, difficulty="beginner")
+
+    def setUp(self):
+        clear_response_cache()
+        profiling.metrics.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_records_queries_per_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/course/")
+        labels = ("course-list", "GET")
+        self.assertEqual(profiling.metrics.queries.series[labels][1], len(queries))
+        self.assertEqual(profiling.metrics.requests.series[("course-list", "GET", "200")], 1)
+        self.assertGreater(profiling.metrics.serializer.series[labels][1], 0)
+        self.assertEqual(profiling.metrics.size.series[labels][2], 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/course/")
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn("# TYPE lms_request_queries histogram", text)
+        self.assertIn(
+            'lms_request_duration_seconds_count{view="course-list",method="GET"} 1', text)
+        self.assertIn('lms_requests_total{view="course-list",method="GET",status="200"} 1', text)
+
+        self.client.force_authenticate(User.objects.create(email="s@example.com", role="student"))
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+    @override_settings(PROFILING_SLOW_REQUEST_SECONDS=1e-9)
+    def test_slow_request_lists_repeated_statements(self):
+        def view(request):
+            for _ in range(3):
+                list(User.objects.filter(pk=self.admin.pk))
+            return HttpResponse()
+
+        middleware = profiling.ProfilingMiddleware(view)
+        with self.assertLogs("core.profiling", "WARNING") as logs:
+            middleware(RequestFactory().get("/anything/"))
+        self.assertIn("Slow request: GET /anything/ (<unresolved>)", logs.output[0])
+        self.assertIn("3 queries", logs.output[0])
+        self.assertIn('  3x, ', logs.output[0])
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.client.get("/api/course/")
+        self.assertEqual(profiling.metrics.requests.series, {})
+
+
+class SeedAndBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.created = seed_database(scale=0.005, seed=3)
+
+    def setUp(self):
+        clear_response_cache()
+
+    def test_seeds_every_role_and_maintained_counters(self):
+        self.assertEqual(
+            dict(User.objects.values_list("role").annotate(n=Count("id")).order_by()),
+            {"admin": 1, "instructor": 1, "student": 10, "sponsor": 1},
+        )
+        self.assertEqual(self.created["enrollments"], Enrollment.objects.count())
+        self.assertEqual(self.created["submissions"], Submission.objects.count())
+        self.assertEqual(
+            stats.admin_dashboard()["total_enrollment"], Enrollment.objects.count())
+        self.assertTrue(User.objects.get(email="admin0@seed.example.com").is_superuser)
+
+    def test_benchmarks_and_baseline_comparison(self):
+        selected = [
+            endpoint for endpoint in benchmarks.endpoints("password")
+            if endpoint.name in ("course-list", "course-gradebook", "sponsor_dashboard")
+        ]
+        report = benchmarks.run_benchmarks(selected, iterations=2)
+        self.assertEqual(
+            set(report["results"]), {"course-list", "course-gradebook", "sponsor_dashboard"})
+        result = report["results"]["course-gradebook"]
+        self.assertEqual((result["requests"], result["errors"]), (2, 0))
+        self.assertGreater(result["first_queries"], 0)
+
+        self.assertEqual(benchmarks.compare(report, report, threshold=0.2), [])
+        slower = {"results": {
+            name: {**result, "p95_ms": result["p95_ms"] * 2, "queries": result["queries"] + 1}
+            for name, result in report["results"].items()
+        }}
+        regressions = benchmarks.compare(slower, report, threshold=0.2, min_delta_ms=0)
+        self.assertEqual(
+            {(r["endpoint"], r["metric"]) for r in regressions},
+            {(name, metric) for name in report["results"] for metric in ("p95_ms", "queries")},
+        )
@@ -0,0 +1,113 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Videos, VideoUpload, VideoUploadChunk
+
+BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+# Lets FileSystemStorage move the assembled file into place instead of
+# copying it (see FileSystemStorage._save).
+class AssembledFile(File):
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def allocate(upload):
+    os.makedirs(os.path.dirname(upload.temp_path), exist_ok=True)
+    with open(upload.temp_path, "wb") as f:
+        f.truncate(upload.size)
+
+
+def write_chunk(upload, index, stream, checksum):
+    """
+    Write chunk ``index`` from ``stream`` at its offset in the temp file,
+    verifying its length and SHA-256 ``checksum`` as it is read.
+    """
+    if index >= upload.total_chunks:
+        raise ChunkError(f"Chunk index must be below {upload.total_chunks}")
+    expected = upload.chunk_length(index)
+    digest = hashlib.sha256()
+    written = 0
+    with open(upload.temp_path, "r+b") as f:
+        f.seek(index * upload.chunk_size)
+        while written <= expected:
+            block = stream.read(min(BLOCK_SIZE, expected - written + 1))
+            if not block:
+                break
+            written += len(block)
+            if written > expected:
+                break
+            digest.update(block)
+            f.write(block)
+    error = None
+    if written != expected:
+        error = f"Chunk {index} must be {expected} bytes"
+    elif digest.hexdigest() != checksum.lower():
+        error = f"Checksum mismatch for chunk {index}"
+    if error:
+        # The bytes on disk no longer match any earlier copy of this chunk.
+        VideoUploadChunk.objects.filter(upload=upload, index=index).delete()
+        raise ChunkError(error)
+
+    VideoUploadChunk.objects.update_or_create(
+        upload=upload, index=index, defaults={"checksum": digest.hexdigest()}
+    )
+
+
+def received_ranges(upload):
+    """
+    Byte ranges (inclusive) already stored, merged from the chunk indexes.
+    """
+    ranges = []
+    indexes = upload.chunks.order_by("index").values_list("index", flat=True)
+    for index in indexes.iterator():
+        start = index * upload.chunk_size
+        end = start + upload.chunk_length(index) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def finalize(upload):
+    """
+    Create the upload's video and return it. The upload row is locked
+    first, so a finalize racing another one returns the video that one
+    created instead of creating a second.
+    """
+    with transaction.atomic():
+        upload = (
+            VideoUpload.objects.select_for_update()
+            .select_related("course", "video")
+            .get(pk=upload.pk)
+        )
+        if upload.completed_at is not None:
+            return upload.video
+        if upload.chunks.count() != upload.total_chunks:
+            raise ChunkError("Upload is incomplete")
+
+        video = Videos(course=upload.course, title=upload.title)
+        with open(upload.temp_path, "rb") as f:
+            video.video_file.save(upload.filename, AssembledFile(f), save=True)
+        upload.video = video
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=["video", "completed_at"])
+        upload.chunks.all().delete()
+    return video
+
+
+def discard(upload):
+    try:
+        os.remove(upload.temp_path)
+    except FileNotFoundError:
+        pass
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, PaymentViewSet, AssessmentViewSet, EnrollmentViewSet, SubmissionViewSet, SponsorshipViewSet, NotificationViewSet, register_api_view, login_api_view, sponsor_dashboard_api_view, admin_dashboard_api_view, index, VideoViewset
+from .views import CourseViewSet, PaymentViewSet, AssessmentViewSet, EnrollmentViewSet, SubmissionViewSet, SponsorshipViewSet, NotificationViewSet, register_api_view, bulk_import_api_view, bulk_import_status_api_view, progress_api_view, login_api_view, sponsor_dashboard_api_view, admin_dashboard_api_view, response_cache_metrics_api_view, profiling_metrics_api_view, index, VideoViewset, VideoUploadViewSet
+from . import async_views
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
@@ -25,14 +26,33 @@ router.register('submission', SubmissionViewSet)
 router.register('sponsorship', SponsorshipViewSet)
 router.register('notification', NotificationViewSet)
 router.register('videos', VideoViewset)
+router.register('video-uploads', VideoUploadViewSet)
 
 urlpatterns = [
     path('', index, name='index'),
     path('api/', include(router.urls)),
     path('register/', register_api_view, name='register'),
+    path('bulk_import/', bulk_import_api_view, name='bulk_import'),
+    path('bulk_import/<uuid:job_id>/', bulk_import_status_api_view,
+         name='bulk_import_status'),
+    path('progress/', progress_api_view, name='progress'),
     path('login/', login_api_view, name='login'),
     path('admin_dashboard/', admin_dashboard_api_view, name='admin_dashboard'),
     path('sponsor_dashboard/', sponsor_dashboard_api_view,
          name='sponsor_dashboard'),
+    path('cache_metrics/', response_cache_metrics_api_view,
+         name='cache_metrics'),
+    path('metrics/', profiling_metrics_api_view, name='metrics'),
     path('docs/', schema_view.as_view(), name='api-docs'),
+    # Async variants, for ASGI deployments (see README)
+    path('async/admin_dashboard/', async_views.admin_dashboard,
+         name='async_admin_dashboard'),
+    path('async/sponsor_dashboard/', async_views.sponsor_dashboard,
+         name='async_sponsor_dashboard'),
+    path('async/notifications/', async_views.notification_list,
+         name='async_notifications'),
+    path('async/notifications/stream/', async_views.notification_stream,
+         name='async_notification_stream'),
+    path('async/notifications/<int:pk>/read/', async_views.notification_mark_read,
+         name='async_notification_read'),
 ]
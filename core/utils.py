@@ -1,5 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from django.conf import settings
+
+from . import events
 from .models import Notification
 
 
 def create_notification(user, message):
-    Notification.objects.create(user=user, message=message)
+    notification = Notification.objects.create(user=user, message=message)
+    events.publish([notification.pk])
+
+
+def create_notifications(users_or_ids, message, batch_size=None):
+    """
+    Create the same notification for many users with batched bulk_create.
+
+    ``users_or_ids`` may hold User instances or user ids and may be a lazy
+    iterator such as ``values_list("id", flat=True).iterator()``, so large
+    audiences are never loaded at once. Each batch is pushed to open
+    notification streams after commit. Returns the number created.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    user_ids = (getattr(user, "pk", user) for user in users_or_ids)
+    created = 0
+    while True:
+        batch = [
+            Notification(user_id=user_id, message=message)
+            for user_id in islice(user_ids, batch_size)
+        ]
+        if not batch:
+            return created
+        Notification.objects.bulk_create(batch)
+        # pk is only set on backends that can return ids from bulk inserts.
+        events.publish([notification.pk for notification in batch])
+        created += len(batch)
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU mapping whose entries expire after
+    ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
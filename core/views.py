@@ -1,5 +1,6 @@
 from django.http import HttpResponse
-from rest_framework import viewsets
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import mixins, viewsets
 from .models import (
     User,
     Course,
@@ -10,6 +11,8 @@ from .models import (
     Notification,
     Payment,
     Videos,
+    VideoUpload,
+    ImportJob,
 )
 from .serializers import (
     UserSerializer,
@@ -21,24 +24,38 @@ from .serializers import (
     NotificationSerializer,
     PaymentSerializer,
     VideoSerializer,
+    VideoUploadSerializer,
+    ImportJobSerializer,
 )
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from django.contrib.auth.hashers import make_password
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from django.contrib.auth import authenticate
-from rest_framework.authtoken.models import Token
+from .authentication import get_token_key
 from rest_framework.permissions import AllowAny
 from .permissions import (
     IsAdmin,
     IsSponsor,
+    IsStudent,
+    IsInstructor,
     IsInstructorOfCourse,
+    CanViewGradebook,
+    CanWatchVideo,
     CustomModelPermissions,
 )
-from django.db import models
-from .utils import create_notification
+from .conditional import ConditionalGetMixin
+from .exports import ExportMixin
+from .response_cache import ResponseCacheMixin, metrics as response_cache_metrics
+from .search import CourseSearchFilter
+from .streaming import IgnoreClientContentNegotiation, serve_file
+from . import bulk_import, events, gradebook, profiling, progress, stats, uploads
+from .utils import create_notification, create_notifications
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
+from django.urls import reverse
+from .mail import queue_mail
+from django.conf import settings
+from django.db import transaction
 from dotenv import load_dotenv
 import os
 
@@ -52,21 +69,98 @@ def index(request):
     )
 
 
+# Builds the viewset queryset from the serializer's declared query plan
+# so list endpoints join their relations instead of querying per row.
+class PrefetchPlanMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, "setup_queryset"):
+            queryset = serializer_class.setup_queryset(
+                queryset, serializer_class.get_requested_fields(self.request)
+            )
+        return queryset
+
+
+# List endpoints render straight from queryset.values() when every field
+# the serializer outputs maps to a column (see get_values_plan), skipping
+# model instances and per-row serializer construction. Anything else goes
+# through the regular serializer.
+class ValuesListMixin:
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        plan = None
+        if hasattr(serializer_class, "get_values_plan"):
+            plan = serializer_class.get_values_plan(
+                serializer_class.get_requested_fields(request)
+            )
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        lookups = {lookup for _, lookup, _ in plan}
+        # Keyset pagination reads its cursor position from the rows.
+        for name in getattr(self, "keyset_ordering", ()):
+            lookups.add(name.lstrip("-"))
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .select_related(None)
+            .prefetch_related(None)
+            .values(*lookups)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer_class.serialize_values(page, plan)
+            )
+        return Response(serializer_class.serialize_values(queryset, plan))
+
+
+# Gradebook JSON is rendered once and cached as bytes (see core.gradebook)
+def gradebook_response(request, course_id, assessment_id=None):
+    try:
+        bins = int(request.query_params.get("bins", gradebook.DEFAULT_BINS))
+    except ValueError:
+        bins = 0
+    if not 1 <= bins <= gradebook.MAX_BINS:
+        return Response(
+            {"bins": f"Must be a whole number from 1 to {gradebook.MAX_BINS}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return HttpResponse(
+        gradebook.cached_gradebook(course_id, assessment_id, bins),
+        content_type="application/json",
+    )
+
+
 # Course viewset
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(PrefetchPlanMixin, ResponseCacheMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    keyset_ordering = ("-created_at", "-id")
+    filter_backends = [DjangoFilterBackend, CourseSearchFilter]
+    cache_dependencies = ("core.Course", "core.Videos")
 
     search_fields = ["title", "difficulty", "instructor__username"]
 
+    # Score matrix and statistics for every assessment of the course
+    @action(detail=True, methods=["get"], permission_classes=[CanViewGradebook])
+    def gradebook(self, request, pk=None):
+        course = get_object_or_404(Course.objects.only("id", "instructor_id"), pk=pk)
+        self.check_object_permissions(request, course)
+        return gradebook_response(request, course.pk)
+
 
-class VideoViewset(viewsets.ModelViewSet):
+class VideoViewset(PrefetchPlanMixin, ResponseCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Videos.objects.all()
     serializer_class = VideoSerializer
+    keyset_ordering = ("-id",)
+    cache_dependencies = ("core.Videos",)
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             return [IsInstructorOfCourse()]
+        if self.action == "stream":
+            return [CanWatchVideo()]
         return [CustomModelPermissions()]
 
     def perform_create(self, serializer):
@@ -81,145 +175,250 @@ class VideoViewset(viewsets.ModelViewSet):
             )
         serializer.save(course=course)
 
+    # Streams the video file with HTTP Range support so players can seek
+    @action(
+        detail=True,
+        methods=["get"],
+        content_negotiation_class=IgnoreClientContentNegotiation,
+    )
+    def stream(self, request, pk=None):
+        video = self.get_object()
+        if not video.video_file:
+            return Response(
+                {"error": "This video has no file"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return serve_file(request, video.video_file)
+
+
+# Resumable chunked uploads for lecture videos:
+#   POST   /api/video-uploads/                        start a session
+#   PUT    /api/video-uploads/<id>/chunks/<n>/        raw chunk body, X-Chunk-SHA256 header
+#   GET    /api/video-uploads/<id>/                   received byte ranges
+#   POST   /api/video-uploads/<id>/finalize/          create the Videos row
+class VideoUploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = VideoUpload.objects.all()
+    serializer_class = VideoUploadSerializer
+    permission_classes = [IsInstructor]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(uploaded_by=self.request.user)
+
+    def perform_create(self, serializer):
+        upload = serializer.save(
+            uploaded_by=self.request.user,
+            chunk_size=serializer.validated_data.get(
+                "chunk_size", settings.VIDEO_UPLOAD_CHUNK_SIZE
+            ),
+        )
+        uploads.allocate(upload)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+        instance.delete()
+
+    @action(detail=True, methods=["put"], url_path=r"chunks/(?P<index>\d+)")
+    def chunk(self, request, pk=None, index=None):
+        upload = self.get_object()
+        if upload.completed_at:
+            return Response(
+                {"error": "Upload already finalized"}, status=status.HTTP_409_CONFLICT
+            )
+        checksum = request.headers.get("X-Chunk-SHA256")
+        if not checksum:
+            return Response(
+                {"error": "X-Chunk-SHA256 header is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            uploads.write_chunk(upload, int(index), request.stream, checksum)
+        except uploads.ChunkError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, pk=None):
+        upload = self.get_object()
+        video = upload.video
+        if upload.completed_at is None:
+            try:
+                video = uploads.finalize(upload)
+            except uploads.ChunkError as e:
+                return Response(
+                    {"error": str(e), "received_ranges": uploads.received_ranges(upload)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+        serializer = VideoSerializer(video, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 # Enrollment viewset
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(PrefetchPlanMixin, ValuesListMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    keyset_ordering = ("-enrolled_at", "-id")
     filterset_fields = ["progress"]
+    export_fields = (
+        ("id", "id"),
+        ("student_id", "student_id"),
+        ("student_email", "student__email"),
+        ("course_id", "course_id"),
+        ("course_title", "course__title"),
+        ("enrolled_at", "enrolled_at"),
+        ("progress", "progress"),
+    )
+    export_owner_lookups = {"student": "student", "instructor": "course__instructor"}
 
 
 # Assessment viewset
-class AssessmentViewSet(viewsets.ModelViewSet):
+class AssessmentViewSet(PrefetchPlanMixin, ResponseCacheMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Assessment.objects.all()
     serializer_class = AssessmentSerializer
+    keyset_ordering = ("-id",)
+    # course_title is part of the representation
+    conditional_fields = ("updated_at", "course__updated_at")
+    cache_dependencies = ("core.Assessment", "core.Course")
+
+    @action(detail=True, methods=["get"], permission_classes=[CanViewGradebook])
+    def gradebook(self, request, pk=None):
+        assessments = Assessment.objects.select_related("course").only(
+            "id", "course", "course__instructor_id")
+        assessment = get_object_or_404(assessments, pk=pk)
+        self.check_object_permissions(request, assessment)
+        return gradebook_response(request, assessment.course_id, assessment.pk)
 
     def create(self, request):
         # Step 1: Serialize the incoming data and save the Assessment
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            # Save the assessment and get the object
-            assessment_obj = serializer.save()
-
-            # Step 2: Get the students enrolled in the course related to the assessment
-            enrollments = Enrollment.objects.filter(course=assessment_obj.course)
-
-            # Step 3: Get a list of students by their IDs
-            students = User.objects.filter(
-                id__in=enrollments.values_list("student_id", flat=True)
-            )
-
-            for student in students:
-                # Create a notification for each student
-                create_notification(
-                    student,
+            # The assessment, its notifications and its queued emails are
+            # saved together or not at all.
+            with transaction.atomic():
+                # Save the assessment and get the object
+                assessment_obj = serializer.save()
+
+                # Step 2: Stream the ids of the students enrolled in the course
+                enrollments = Enrollment.objects.filter(course=assessment_obj.course)
+                student_ids = enrollments.values_list("student_id", flat=True)
+
+                # Step 3: Notify every student with batched bulk inserts
+                create_notifications(
+                    student_ids.iterator(chunk_size=settings.NOTIFICATION_BATCH_SIZE),
                     f"New Assessment: {assessment_obj.title} - {assessment_obj.description}",
                 )
 
-            # Step 4: Create a list of student email addresses
-            student_email = [student.email for student in students if student.email]
-
-            # Step 5: Prepare the email content
-            # Email address from your environment settings
-            from_email = os.getenv("EMAIL_HOST_USER")
-            subject = f"New Assessment: {assessment_obj.title}"
-            message = f"""Please submit the assessment before {assessment_obj.due_date}. 
-                          More details: {assessment_obj.description}"""
+                # Step 4: Email addresses of the enrolled students
+                student_email = (
+                    User.objects.filter(enrollment__course=assessment_obj.course)
+                    .exclude(email="")
+                    .values_list("email", flat=True)
+                )
 
-            # Step 6: Send the email to all enrolled students
-            try:
-                if student_email:  # Ensure there are email addresses before sending
-                    send_mail(
-                        subject=subject,
-                        message=message,
-                        from_email=from_email,
-                        recipient_list=student_email,
-                        fail_silently=False,
-                    )
-                    return Response(
-                        {"result": "Email sent successfully"},
-                        status=status.HTTP_201_CREATED,
-                    )
-                else:
-                    return Response(
-                        {"result": "No students have email addresses"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-            except Exception as e:
-                return Response(
-                    {"result": f"Error sending email: {str(e)}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                # Step 5: Prepare the email content
+                # Email address from your environment settings
+                from_email = os.getenv("EMAIL_HOST_USER")
+                subject = f"New Assessment: {assessment_obj.title}"
+                message = f"""Please submit the assessment before {assessment_obj.due_date}. 
+                              More details: {assessment_obj.description}"""
+
+                # Step 6: Queue the email for every enrolled student; the
+                # send_queued_mail worker delivers it outside the request.
+                queued = queue_mail(
+                    subject,
+                    message,
+                    from_email,
+                    student_email.iterator(chunk_size=settings.NOTIFICATION_BATCH_SIZE),
                 )
+
+            # The assessment exists whether or not anyone was emailed.
+            return Response(
+                {
+                    "result": "Email queued successfully" if queued
+                    else "No students have email addresses",
+                    "assessment": serializer.data,
+                },
+                status=status.HTTP_201_CREATED,
+            )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 # Submission viewset
-class SubmissionViewSet(viewsets.ModelViewSet):
+class SubmissionViewSet(PrefetchPlanMixin, ValuesListMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
+    keyset_ordering = ("-submitted_at", "-id")
+    export_fields = (
+        ("id", "id"),
+        ("student_id", "student_id"),
+        ("student_email", "student__email"),
+        ("assessment_id", "assessment_id"),
+        ("assessment_title", "assessment__title"),
+        ("submitted_at", "submitted_at"),
+        ("score", "score"),
+    )
+    export_owner_lookups = {
+        "student": "student", "instructor": "assessment__course__instructor"}
 
 
 # Sponsorship viewset
-class SponsorshipViewSet(viewsets.ModelViewSet):
+class SponsorshipViewSet(PrefetchPlanMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Sponsorship.objects.all()
     serializer_class = SponsorshipSerializer
+    keyset_ordering = ("-funded_at", "-id")
 
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            # Save the assessment and get the object
-            sponsorship_obj = serializer.save()
+            # Nothing is saved when the sponsor can't be emailed
+            if not serializer.validated_data["sponsor"].email:
+                return Response(
+                    {"result": "No email addresses"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            sponsor_email = [sponsorship_obj.sponsor.email]
+            # The sponsorship, its notification and its queued email are
+            # saved together or not at all.
+            with transaction.atomic():
+                # Save the sponsorship and get the object
+                sponsorship_obj = serializer.save()
 
-            sponsor = [sponsorship_obj.sponsor.id]
+                # Step 5: Prepare the email content
+                # Email address from your environment settings
+                from_email = os.getenv("EMAIL_HOST_USER")
+                subject = f"Sponsorship for : {sponsorship_obj.student.email}"
+                message = f"""Thank you for sponsoring {sponsorship_obj.amount}. Funded at {sponsorship_obj.funded_at}"""
 
-            # Step 5: Prepare the email content
-            # Email address from your environment settings
-            from_email = os.getenv("EMAIL_HOST_USER")
-            subject = f"Sponsorship for : {sponsorship_obj.student.email}"
-            message = f"""Thank you for sponsoring {sponsorship_obj.amount}. Funded at {sponsorship_obj.funded_at}"""
+                create_notification(
+                    sponsorship_obj.sponsor,
+                    f"New Sponsorship: {sponsorship_obj.amount} - {sponsorship_obj.student.email}",
+                )
 
-            create_notification(
-                sponsor,
-                f"New Sponsorship: {sponsorship_obj.amount} - {sponsorship_obj.student.email}",
+                # Step 6: Queue the email for the send_queued_mail worker
+                queue_mail(subject, message, from_email, [sponsorship_obj.sponsor.email])
+            return Response(
+                {"result": "Email queued successfully"},
+                status=status.HTTP_201_CREATED,
             )
-
-            # Step 6: Send the email to all enrolled students
-            try:
-                if sponsor_email:  # Ensure there are email addresses before sending
-                    send_mail(
-                        subject=subject,
-                        message=message,
-                        from_email=from_email,
-                        recipient_list=sponsor_email,
-                        fail_silently=False,
-                    )
-                    return Response(
-                        {"result": "Email sent successfully"},
-                        status=status.HTTP_201_CREATED,
-                    )
-                else:
-                    return Response(
-                        {"result": "No email addresses"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-            except Exception as e:
-                return Response(
-                    {"result": f"Error sending email: {str(e)}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 # Notification viewset
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(PrefetchPlanMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    keyset_ordering = ("-created_at", "-id")
+
+    def perform_create(self, serializer):
+        notification = serializer.save()
+        events.publish([notification.pk])
 
     def update(self, request, *args, **kwargs):
         notification = self.get_object()
@@ -229,10 +428,21 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
 
 # Payment viewset
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(PrefetchPlanMixin, ValuesListMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    keyset_ordering = ("-created_at", "-id")
     filterset_fields = ["status"]
+    export_fields = (
+        ("id", "id"),
+        ("sponsor_id", "sponsor_id"),
+        ("sponsor_email", "sponsor__email"),
+        ("amount", "amount"),
+        ("transaction_id", "transaction_id"),
+        ("status", "status"),
+        ("created_at", "created_at"),
+    )
+    export_owner_lookups = {"sponsor": "sponsor"}
 
 
 # Api View for Registering new User
@@ -256,6 +466,52 @@ def register_api_view(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Bulk import of users and enrollments from a CSV or NDJSON upload. The
+# file is queued for the run_import_jobs worker and the response points at
+# the job's status URL.
+@api_view(["POST"])
+@permission_classes([IsAdmin])
+def bulk_import_api_view(request):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"file": "No file was submitted."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        file_format = bulk_import.detect_format(
+            upload.name, request.query_params.get("file_format"))
+    except bulk_import.BulkImportError as exc:
+        return Response({"file_format": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    job = bulk_import.queue_import(upload, file_format, request.user)
+    status_url = request.build_absolute_uri(reverse("bulk_import_status", args=[job.pk]))
+    return Response(
+        {"id": job.pk, "status": job.status, "status_url": status_url},
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": status_url},
+    )
+
+
+# Status of a queued bulk import, with its result once it has run
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def bulk_import_status_api_view(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return Response(ImportJobSerializer(job).data)
+
+
+# Batched video progress heartbeats from players (see core.progress)
+@api_view(["POST"])
+@permission_classes([IsStudent])
+def progress_api_view(request):
+    events = request.data.get("events") if isinstance(request.data, dict) else request.data
+    if not isinstance(events, list):
+        return Response({"events": "Expected a list of events."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > settings.PROGRESS_MAX_EVENTS:
+        return Response(
+            {"events": f"At most {settings.PROGRESS_MAX_EVENTS} events per request."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(progress.ingest(request.user.pk, events), status=status.HTTP_202_ACCEPTED)
+
+
 # Api View for login User
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -275,47 +531,36 @@ def login_api_view(request):
         )
 
     # Get Token If The Token of Logged in user is avaiilable Else Create New Token For The User
-    token, _ = Token.objects.get_or_create(user=user)
+    # (cached, and warms the token authentication cache for the next request)
+    return Response(get_token_key(user))
 
-    return Response(token.key)
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def response_cache_metrics_api_view(request):
+    # Hit ratio and latency of the course/video/assessment response cache,
+    # for this process
+    return Response(response_cache_metrics.snapshot())
 
 
 @api_view(["GET"])
 @permission_classes([IsAdmin])
-def admin_dashboard_api_view(request):
-    total_users = User.objects.count()
-    total_cources = Course.objects.count()
-    total_enrollments = Enrollment.objects.count()
+def profiling_metrics_api_view(request):
+    # Per-view request metrics for this process, for Prometheus to scrape
+    # (empty unless PROFILING_ENABLED)
+    return HttpResponse(
+        profiling.metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-    return Response(
-        {
-            "total_Users": total_users,
-            "total_cources": total_cources,
-            "total_enrollment": total_enrollments,
-        }
-    )
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def admin_dashboard_api_view(request):
+    # Served from maintained counters instead of COUNT(*) (see core.stats)
+    return Response(stats.admin_dashboard())
 
 
 @api_view(["GET"])
 @permission_classes([IsSponsor])
 def sponsor_dashboard_api_view(request):
-    sponsor = request.user
-    sponsorships = Sponsorship.objects.filter(sponsor=sponsor)
-    total_students_funded = sponsorships.count()
-
-    total_funds = (
-        sponsorships.aggregate(total_funded=models.Sum("amount"))["total_funded"] or 0
-    )
-    avg_progress = (
-        Enrollment.objects.all().aggregate(avg_progress=models.Avg("progress"))[
-            "avg_progress"
-        ]
-        or 0
-    )
-    return Response(
-        {
-            "total_student_funded": total_students_funded,
-            "total_funds": total_funds,
-            "avg_progress": avg_progress,
-        }
-    )
+    # Totals cover only the students this sponsor has funded
+    return Response(stats.sponsor_dashboard(request.user.id))